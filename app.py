@@ -1,16 +1,24 @@
-from flask import render_template,Flask,request
+from flask import render_template,Flask,request,Response,jsonify,stream_with_context
 import os,sys,json
 from flask_cors import CORS,cross_origin
 from thyroid.exception import ThyroidException
 from thyroid.logger import logging
-from thyroid.pipeline.pipeline import Pipeline
-from thyroid.entity.artifact_entity import FinalArtifact
-import pandas as pd
-import numpy as np
-from thyroid.util.util import load_object,preprocessing
+from thyroid.pipeline.training_job import TrainingJobManager,get_job_info
+from thyroid.predictor.model_registry import ModelRegistry
+from thyroid.predictor.batch_predictor import BatchPredictor
+from thyroid.predictor.request_reader import iter_request_batches
+from thyroid.predictor.batch_scorer import BatchScorer,iter_csv_chunks,get_scoring_file_path
+from thyroid.constant import PREDICTION_BATCH_SIZE,PREDICTION_CHUNK_SIZE,SCORING_DIR_ENV,SCORING_DIR
 
 app = Flask(__name__)
 
+model_registry = ModelRegistry()
+model_registry.get_bundle()
+
+training_job_manager = TrainingJobManager()
+
+scoring_dir = os.environ.get(SCORING_DIR_ENV,SCORING_DIR)
+
 @app.route('/',methods=['GET'])
 @cross_origin()
 def homepage():
@@ -21,62 +29,124 @@ def homepage():
 def predict():
     try:
         data = [str(x) for x in request.form.values()]
-        df = pd.read_csv(data[0])
-        if not os.path.exists('data.json'):
+        bundle = model_registry.get_bundle()
+        if bundle is None:
             return render_template('index.html',output_text = "No model is trained, please start training")
-        with open('data.json', 'r') as json_file:
-            dict_data = json.loads(json_file.read())
 
-        final_artifact = FinalArtifact(**dict_data)
-        logging.info(f"final artifact : {final_artifact}")
+        batch_predictor = BatchPredictor(bundle=bundle)
+        output = []
+        for df in iter_csv_chunks(input_file_path=data[0],chunk_size=PREDICTION_CHUNK_SIZE):
+            output.extend(batch_predictor.predict_labels(df=df))
 
-        train_df = pd.read_csv(final_artifact.ingested_train_data)
-        train_df = train_df.iloc[:,:-1]
-        columns = train_df.columns
+        return render_template('index.html',output_text = f"Batch output is : {output}")
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
 
-        len_df = len(df)
-        df = pd.concat([df,train_df])
-        df = preprocessing(df=df)
 
-        preprocessing_object = load_object(file_path = final_artifact.preprocessing_dir)
-        columns = df.columns
-        df = df.iloc[:len_df]
-        df = preprocessing_object.transform(df)
-        df = pd.DataFrame(df,columns=columns)
+@app.route('/api/v1/predict',methods=['POST'])
+@cross_origin()
+def api_predict():
+    bundle = model_registry.get_bundle()
+    if bundle is None:
+        return jsonify(error="No model is trained, please start training"),503
 
+    try:
+        batch_size = int(request.args.get('batch_size',PREDICTION_BATCH_SIZE))
+        if batch_size <= 0:
+            raise ValueError(f"batch size must be positive : {batch_size}")
+    except Exception as e:
+        logging.exception(f"prediction request has an invalid batch size")
+        return jsonify(error="batch_size must be a positive integer"),400
 
-        cluster_object = load_object(file_path = final_artifact.cluster_model_path)
-        cluster_number = cluster_object.predict(df)
-        output = []
-        for i in range(len(df)):
-            model_object = load_object(file_path = final_artifact.export_dir_path[cluster_number[i]])
-            x = (np.array(df.iloc[i])).reshape(1, -1)
-            output.append((int(model_object.predict(x))))
-
-        for i in range(len(output)):
-            if output[i]==0:
-                output[i]='negative'
-            elif output[i]==1:
-                output[i]='compensated_hypothyroid'
-            elif output[i]==2:
-                output[i]='primary_hypothyroid'
-            elif output[i]==3:
-                output[i]='secondary_hypothyroid'
-        
-        return render_template('index.html',output_text = f"Batch output is : {output}")
+    try:
+        batch_predictor = BatchPredictor(bundle=bundle)
+        batches = iter_request_batches(content_type=request.mimetype,stream=request.stream,batch_size=batch_size)
+        first_batch = next(batches,None)
     except Exception as e:
-        raise ThyroidException(sys,e) from e
+        logging.exception(f"prediction request could not be read")
+        return jsonify(error="prediction request could not be read, send json records, ndjson or csv"),400
+
+    def generate_predictions():
+        index = 0
+        batch = first_batch
+        try:
+            while batch is not None:
+                labels = batch_predictor.predict_labels(df=batch)
+                lines = [json.dumps({"index":index+number,"prediction":label}) for number,label in enumerate(labels)]
+                index += len(labels)
+                yield "\n".join(lines)+"\n" if lines else ""
+                batch = next(batches,None)
+        except Exception as e:
+            logging.exception(f"prediction failed after {index} rows")
+            yield json.dumps({"index":index,"error":"prediction failed"})+"\n"
+
+    return Response(stream_with_context(generate_predictions()),mimetype='application/x-ndjson')
+
+
+@app.route('/api/v1/score',methods=['POST'])
+@cross_origin()
+def api_score():
+    bundle = model_registry.get_bundle()
+    if bundle is None:
+        return jsonify(error="No model is trained, please start training"),503
+
+    try:
+        #both paths are relative to the scoring directory, the server never reads or writes anywhere else
+        data = request.get_json(force=True)
+        input_file_path = get_scoring_file_path(scoring_dir=scoring_dir,file_path=data["input_file_path"])
+        output_file_path = get_scoring_file_path(scoring_dir=scoring_dir,file_path=data["output_file_path"])
+        chunk_size = int(data.get("chunk_size",PREDICTION_CHUNK_SIZE))
+        predictions_only = bool(data.get("predictions_only",False))
+        if chunk_size <= 0:
+            raise ValueError(f"chunk size must be positive : {chunk_size}")
+    except Exception as e:
+        logging.exception(f"scoring request could not be read")
+        return jsonify(error="scoring request needs input_file_path and output_file_path "
+                             "relative to the scoring directory"),400
+
+    if not os.path.isfile(input_file_path):
+        return jsonify(error="input file not found in the scoring directory"),404
+    try:
+        #the output file is created here so an existing file is never overwritten, even by a concurrent request
+        os.makedirs(os.path.dirname(output_file_path),exist_ok=True)
+        open(output_file_path,'x').close()
+    except FileExistsError:
+        return jsonify(error="output file already exists in the scoring directory"),409
+
+    try:
+        batch_scorer = BatchScorer(bundle=bundle,chunk_size=chunk_size,predictions_only=predictions_only)
+        batch_scoring_artifact = batch_scorer.score_file(input_file_path=input_file_path,output_file_path=output_file_path)
+        #paths are answered relative to the scoring directory, the server layout is not exposed
+        return jsonify(batch_scoring_artifact._replace(
+            input_file_path=os.path.relpath(input_file_path,os.path.realpath(scoring_dir)),
+            output_file_path=os.path.relpath(output_file_path,os.path.realpath(scoring_dir)))._asdict())
+    except Exception as e:
+        logging.exception(f"scoring {input_file_path} failed")
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        return jsonify(error="scoring failed"),500
 
 
 @app.route('/train',methods=['POST'])
 @cross_origin()
 def train():
     try:
-        pipeline = Pipeline()
-        pipeline.run_pipeline()
-        return render_template('index.html',prediction_text = "Model training completed")
+        training_job,created = training_job_manager.submit()
+        if request.accept_mimetypes.best_match(['application/json','text/html']) == 'application/json':
+            return jsonify(job_id=training_job.job_id,status=training_job.status,created=created),202
+        message = "Model training started" if created else "Model training is already running"
+        return render_template('index.html',prediction_text = f"{message}, job id : {training_job.job_id}")
     except Exception as e:
         raise ThyroidException(sys,e) from e
 
+
+@app.route('/train/<job_id>',methods=['GET'])
+@cross_origin()
+def train_status(job_id):
+    training_job = training_job_manager.get_job(job_id)
+    if training_job is None:
+        return jsonify(error=f"unknown training job : {job_id}"),404
+    return jsonify(get_job_info(training_job))
+
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
@@ -4,5 +4,7 @@ from thyroid.pipeline.pipeline import Pipeline
 #config = Configuration()
 #config.get_model_pusher_config()
 
-pipeline = Pipeline()
-pipeline.run_pipeline()
\ No newline at end of file
+#the trainer's worker processes import this module again, the pipeline only runs in the parent
+if __name__ == "__main__":
+    pipeline = Pipeline()
+    pipeline.run_pipeline()
\ No newline at end of file
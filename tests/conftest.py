@@ -0,0 +1,29 @@
+from thyroid.predictor.model_registry import LoadedModelBundle
+from sklearn.cluster import KMeans
+from sklearn.tree import DecisionTreeClassifier
+import pandas as pd
+import numpy as np
+import pytest
+
+FEATURE_COLUMNS = ["a","c"]
+
+
+class NumericPreprocessor:
+
+    #stands in for ThyroidPreprocessor: the feature columns as floats, any text in them fails
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        return df[FEATURE_COLUMNS].astype(float)
+
+
+@pytest.fixture
+def model_bundle():
+    #two clusters split on a, each with a tree predicting the encoded class from c
+    X = pd.DataFrame({"a":np.repeat([0.0,10.0],20),"c":np.tile(np.arange(20.0),2)})
+    cluster_object = KMeans(n_clusters=2,n_init=3,random_state=0).fit(X)
+    model_objects = []
+    for cluster_number in range(2):
+        cluster_X = X[cluster_object.labels_ == cluster_number]
+        model_objects.append(DecisionTreeClassifier(random_state=0).fit(np.array(cluster_X),
+                                                                        (cluster_X["c"] // 5).astype(int)))
+    return LoadedModelBundle(version="test",final_artifact=None,preprocessing_object=NumericPreprocessor(),
+                             cluster_object=cluster_object,model_objects=model_objects)
@@ -0,0 +1,62 @@
+from thyroid.predictor.request_reader import iter_csv_batches
+import app as thyroid_app
+import io,json
+import pytest
+
+
+class StaticModelRegistry:
+
+    def __init__(self,bundle) -> None:
+        self.bundle = bundle
+
+    def get_bundle(self):
+        return self.bundle
+
+
+@pytest.fixture
+def client(model_bundle,monkeypatch):
+    monkeypatch.setattr(thyroid_app,"model_registry",StaticModelRegistry(bundle=model_bundle))
+    return thyroid_app.app.test_client()
+
+def get_lines(response)->list:
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+RECORDS = [{"a":0,"c":1},{"a":10,"c":7},{"a":0,"c":12},{"a":10,"c":18},{"a":0,"c":3}]
+EXPECTED = ["negative","compensated_hypothyroid","primary_hypothyroid","secondary_hypothyroid","negative"]
+
+@pytest.mark.parametrize("content_type,body",[
+    ("application/json",json.dumps(RECORDS)),
+    ("application/json",json.dumps({"records":RECORDS})),
+    ("application/x-ndjson","\n".join(json.dumps(record) for record in RECORDS)+"\n"),
+    ("text/csv","a,c\n"+"".join(f"{record['a']},{record['c']}\n" for record in RECORDS)),
+])
+@pytest.mark.parametrize("batch_size",[1,2,1000])
+def test_predict_streams_one_line_per_row(client,content_type,body,batch_size):
+    response = client.post(f"/api/v1/predict?batch_size={batch_size}",data=body,content_type=content_type)
+    assert response.status_code == 200
+    assert get_lines(response) == [{"index":index,"prediction":label} for index,label in enumerate(EXPECTED)]
+
+@pytest.mark.parametrize("batch_size",["0","-1","two"])
+def test_predict_rejects_invalid_batch_size(client,batch_size):
+    response = client.post(f"/api/v1/predict?batch_size={batch_size}",data=json.dumps(RECORDS),
+                           content_type="application/json")
+    assert response.status_code == 400
+
+def test_predict_rejects_unreadable_body(client):
+    response = client.post("/api/v1/predict",data="not json",content_type="application/json")
+    assert response.status_code == 400
+
+def test_predict_writes_an_error_line_mid_stream(client):
+    #the second batch can not be converted, the rows of the first batch are already sent
+    body = "a,c\n0,1\n10,7\nabc,12\n0,3\n"
+    response = client.post("/api/v1/predict?batch_size=2",data=body,content_type="text/csv")
+    assert response.status_code == 200
+    lines = get_lines(response)
+    assert lines[:2] == [{"index":0,"prediction":"negative"},{"index":1,"prediction":"compensated_hypothyroid"}]
+    assert lines[2] == {"index":2,"error":"prediction failed"}
+    assert len(lines) == 3
+
+def test_csv_batches_keep_values_as_text():
+    batches = list(iter_csv_batches(stream=io.BytesIO(b"a,c\n1,2\nx,3\n"),batch_size=1))
+    assert [batch["a"].tolist() for batch in batches] == [["1"],["x"]]
@@ -0,0 +1,95 @@
+from thyroid.predictor.batch_scorer import BatchScorer,PredictionWriter,get_shard_ranges,iter_csv_range_chunks,\
+    get_part_file_path
+from thyroid.constant import PREDICTION_COLUMN_NAME
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def write_input_file(file_path,n_rows:int=10):
+    #column b is empty in the first rows and text afterwards
+    df = pd.DataFrame({"a":np.where(np.arange(n_rows) % 2,10.0,0.0),
+                       "b":[None]*(n_rows//2)+["note"]*(n_rows-n_rows//2),
+                       "c":np.arange(n_rows,dtype=float)})
+    df.to_csv(file_path,index=False)
+    return df
+
+
+def test_parquet_scoring_with_an_all_missing_column_in_a_chunk(tmp_path,model_bundle):
+    input_file_path = tmp_path/"input.csv"
+    write_input_file(input_file_path)
+    output_file_path = tmp_path/"output.parquet"
+    batch_scorer = BatchScorer(bundle=model_bundle,chunk_size=3)
+    batch_scoring_artifact = batch_scorer.score_file(input_file_path=str(input_file_path),
+                                                     output_file_path=str(output_file_path))
+    assert batch_scoring_artifact.row_count == 10
+    assert batch_scoring_artifact.chunk_count == 4
+    output_df = pd.read_parquet(output_file_path)
+    assert list(output_df.columns) == ["a","b","c",PREDICTION_COLUMN_NAME]
+    assert output_df["b"].isna().sum() == 5 and (output_df["b"].dropna() == "note").all()
+
+    csv_output_file_path = tmp_path/"output.csv"
+    batch_scorer.score_file(input_file_path=str(input_file_path),output_file_path=str(csv_output_file_path))
+    assert output_df[PREDICTION_COLUMN_NAME].tolist() == pd.read_csv(csv_output_file_path)[PREDICTION_COLUMN_NAME].tolist()
+
+def test_parquet_part_files_are_appended_in_order(tmp_path):
+    part_file_paths = []
+    for number,b_values in enumerate([[None,None],["x","y"]]):
+        part_file_path = str(tmp_path/f"part{number}.parquet")
+        prediction_writer = PredictionWriter(output_file_path=part_file_path)
+        prediction_writer.write(df=pd.DataFrame({"b":b_values,PREDICTION_COLUMN_NAME:["negative"]*2},dtype=object))
+        prediction_writer.close()
+        part_file_paths.append(part_file_path)
+
+    output_file_path = str(tmp_path/"output.parquet")
+    prediction_writer = PredictionWriter(output_file_path=output_file_path)
+    for part_file_path in part_file_paths:
+        prediction_writer.write_file(file_path=part_file_path,chunk_count=1)
+    prediction_writer.close()
+    assert prediction_writer.chunk_count == 2
+    assert pd.read_parquet(output_file_path)["b"].tolist() == [None,None,"x","y"]
+
+
+def read_shards(file_path:str,n_shards:int,chunk_size:int=3):
+    #the byte ranges of the shards and the rows read from each of them, None for an empty shard
+    columns = list(pd.read_csv(file_path,nrows=0,dtype=str).columns)
+    shard_ranges = get_shard_ranges(input_file_path=file_path,n_shards=n_shards)
+    shards = []
+    for start,end in shard_ranges:
+        chunks = list(iter_csv_range_chunks(input_file_path=file_path,columns=columns,start=start,end=end,
+                                            chunk_size=chunk_size))
+        shards.append(pd.concat(chunks) if chunks else None)
+    return shard_ranges,shards
+
+@pytest.mark.parametrize("n_shards",[1,2,3,7,50])
+@pytest.mark.parametrize("line_end,final_line_end",[("\n","\n"),("\n",""),("\r\n","\r\n")])
+def test_shards_cover_every_row_once_in_order(tmp_path,n_shards,line_end,final_line_end):
+    #rows of very different lengths so the byte targets of the shards fall inside rows
+    rows = [f"{number},{'x'*(number*7 % 23)},{number*0.5}" for number in range(20)]
+    file_path = tmp_path/"input.csv"
+    with open(file_path,'w',newline='') as input_file:
+        input_file.write(line_end.join(["a,b,c"]+rows)+final_line_end)
+
+    shard_ranges,shards = read_shards(file_path=str(file_path),n_shards=n_shards)
+    assert len(shard_ranges) == n_shards
+    assert shard_ranges[-1][1] == file_path.stat().st_size
+    with open(file_path,'rb') as input_file:
+        content = input_file.read()
+    for start,end in shard_ranges:
+        #every non empty range starts right after a line break and ends on one or at the end of the file
+        if end > start:
+            assert content[start-1:start] == b"\n"
+            assert content[end-1:end] == b"\n" or end == len(content)
+    shard_df = pd.concat([df for df in shards if df is not None],ignore_index=True)
+    pd.testing.assert_frame_equal(shard_df,pd.read_csv(file_path,dtype=str))
+
+def test_header_only_file_has_empty_shards(tmp_path):
+    file_path = tmp_path/"input.csv"
+    file_path.write_text("a,b,c\n")
+    shard_ranges,shards = read_shards(file_path=str(file_path),n_shards=3)
+    assert all(start == end for start,end in shard_ranges)
+    assert shards == [None,None,None]
+
+def test_part_files_are_hidden_next_to_the_output():
+    assert get_part_file_path(output_file_path="/scoring/out/scored.parquet",shard=3) == \
+        "/scoring/out/.scored.part0003.parquet"
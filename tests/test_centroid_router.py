@@ -0,0 +1,60 @@
+from thyroid.entity.centroid_router import CentroidRouter,export_centroid_router
+from sklearn.cluster import KMeans,MiniBatchKMeans
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def get_cluster_data(n_rows:int=2000,n_features:int=6,random_state:int=0):
+    random_state = np.random.RandomState(random_state)
+    centers = random_state.normal(scale=5.0,size=(4,n_features))
+    X = centers[random_state.randint(len(centers),size=n_rows)]+random_state.normal(size=(n_rows,n_features))
+    return pd.DataFrame(X,columns=[f"feature_{index}" for index in range(n_features)])
+
+def get_near_tie_rows(centroids:np.ndarray,n_rows:int=500,random_state:int=0)->np.ndarray:
+    #midpoints of every pair of centroids moved by a few ulps, the distances to both centroids of
+    #a pair differ only in the last bits so the rows land on whichever side rounding puts them
+    random_state = np.random.RandomState(random_state)
+    first,second = np.triu_indices(len(centroids),k=1)
+    midpoints = (centroids[first]+centroids[second])/2
+    rows = midpoints[random_state.randint(len(midpoints),size=n_rows)]
+    return rows+rows*np.finfo(np.float64).eps*random_state.randint(-4,5,size=rows.shape)
+
+
+@pytest.mark.parametrize("cluster_class",[KMeans,MiniBatchKMeans])
+@pytest.mark.parametrize("random_state",[0,1,2])
+def test_router_matches_cluster_model_on_random_data(cluster_class,random_state):
+    X = get_cluster_data(random_state=random_state)
+    cluster_model = cluster_class(n_clusters=4,n_init=3,random_state=random_state).fit(X)
+    router = CentroidRouter.from_cluster_model(cluster_model=cluster_model)
+    np.testing.assert_array_equal(router.predict(X),cluster_model.predict(X))
+    np.testing.assert_array_equal(router.predict(X.to_numpy()),cluster_model.predict(X.to_numpy()))
+
+def test_router_reorders_frame_columns():
+    X = get_cluster_data()
+    cluster_model = KMeans(n_clusters=4,n_init=3,random_state=0).fit(X)
+    router = CentroidRouter.from_cluster_model(cluster_model=cluster_model)
+    shuffled_X = X[list(reversed(X.columns))]
+    np.testing.assert_array_equal(router.predict(shuffled_X),cluster_model.predict(X))
+
+@pytest.mark.parametrize("as_frame",[True,False])
+def test_router_matches_cluster_model_on_near_tie_rows(as_frame):
+    X = get_cluster_data()
+    cluster_model = KMeans(n_clusters=4,n_init=3,random_state=0).fit(X)
+    router = CentroidRouter.from_cluster_model(cluster_model=cluster_model)
+    tie_rows = get_near_tie_rows(centroids=cluster_model.cluster_centers_)
+    tie_X = pd.DataFrame(tie_rows,columns=X.columns) if as_frame else tie_rows
+    np.testing.assert_array_equal(router.predict(tie_X),cluster_model.predict(tie_X))
+
+def test_exported_router_loads_and_matches(tmp_path):
+    X = get_cluster_data()
+    cluster_model = KMeans(n_clusters=4,n_init=3,random_state=0).fit(X)
+    check_X = pd.concat([X,pd.DataFrame(get_near_tie_rows(cluster_model.cluster_centers_),columns=X.columns)])
+    assert export_centroid_router(cluster_model=cluster_model,X=check_X,cluster_model_dir=str(tmp_path))
+    router = CentroidRouter.load(cluster_model_dir=str(tmp_path))
+    assert router.feature_names == list(X.columns)
+    np.testing.assert_array_equal(router.predict(check_X),cluster_model.predict(check_X))
+    np.testing.assert_array_equal(router.predict(check_X.to_numpy()),cluster_model.predict(check_X.to_numpy()))
+
+def test_load_returns_none_without_export(tmp_path):
+    assert CentroidRouter.load(cluster_model_dir=str(tmp_path)) is None
@@ -0,0 +1,81 @@
+from thyroid.pipeline.dag import DagScheduler,PipelineTask,TASK_RUNNING,TASK_COMPLETED,TASK_FAILED,TASK_SKIPPED
+import threading
+import pytest
+
+
+def get_error_messages(error:BaseException)->str:
+    messages = []
+    while error is not None:
+        messages.append(str(error))
+        error = error.__context__
+    return " | ".join(messages)
+
+def fail(**inputs):
+    raise ValueError("task failed")
+
+
+def test_tasks_get_the_outputs_of_their_inputs():
+    tasks = [PipelineTask(name="total",function=lambda a,b:a+b,inputs=["a","b"],critical=True),
+             PipelineTask(name="a",function=lambda:1,inputs=[],critical=True),
+             PipelineTask(name="b",function=lambda a:a*10,inputs=["a"],critical=True)]
+    assert DagScheduler(tasks=tasks).run() == {"a":1,"b":10,"total":11}
+
+def test_task_starts_only_after_its_inputs_completed():
+    events = []
+    def record(name):
+        def function(**inputs):
+            events.append(name)
+            return name
+        return function
+    tasks = [PipelineTask(name=name,function=record(name),inputs=inputs,critical=True)
+             for name,inputs in [("train",["transform"]),("ingest",[]),("transform",["validate","ingest"]),
+                                 ("validate",["ingest"])]]
+    DagScheduler(tasks=tasks).run()
+    assert events == ["ingest","validate","transform","train"]
+
+def test_side_task_runs_next_to_the_critical_path():
+    #the side task only finishes once the last critical task has started, which deadlocks without concurrency
+    trained = threading.Event()
+    def report(ingest):
+        assert trained.wait(timeout=10)
+        return "report"
+    def train(ingest):
+        trained.set()
+        return "model"
+    tasks = [PipelineTask(name="ingest",function=lambda:"data",inputs=[],critical=True),
+             PipelineTask(name="report",function=report,inputs=["ingest"],critical=False),
+             PipelineTask(name="train",function=train,inputs=["ingest"],critical=True)]
+    assert DagScheduler(tasks=tasks,max_workers=2).run()["report"] == "report"
+
+def test_failed_side_task_does_not_fail_the_pipeline():
+    states = []
+    tasks = [PipelineTask(name="ingest",function=lambda:"data",inputs=[],critical=True),
+             PipelineTask(name="report",function=fail,inputs=["ingest"],critical=False),
+             PipelineTask(name="publish_report",function=lambda report:report,inputs=["report"],critical=False),
+             PipelineTask(name="train",function=lambda ingest:"model",inputs=["ingest"],critical=True)]
+    scheduler = DagScheduler(tasks=tasks,task_listener=states.append)
+    assert scheduler.run() == {"ingest":"data","train":"model"}
+    assert {name:task_state.status for name,task_state in scheduler.task_states.items()} == \
+        {"ingest":TASK_COMPLETED,"report":TASK_FAILED,"publish_report":TASK_SKIPPED,"train":TASK_COMPLETED}
+    assert scheduler.task_states["report"].error == "task failed"
+    assert [task_state.status for task_state in states if task_state.name == "report"] == [TASK_RUNNING,TASK_FAILED]
+
+def test_failed_critical_task_stops_the_pipeline():
+    tasks = [PipelineTask(name="ingest",function=lambda:"data",inputs=[],critical=True),
+             PipelineTask(name="transform",function=fail,inputs=["ingest"],critical=True),
+             PipelineTask(name="train",function=lambda transform:"model",inputs=["transform"],critical=True)]
+    scheduler = DagScheduler(tasks=tasks)
+    with pytest.raises(BaseException) as error:
+        scheduler.run()
+    assert "task failed" in get_error_messages(error.value)
+    assert scheduler.task_states["train"].status == TASK_SKIPPED
+
+@pytest.mark.parametrize("tasks,message",[
+    ([PipelineTask(name="a",function=lambda b:b,inputs=["b"],critical=True),
+      PipelineTask(name="b",function=lambda a:a,inputs=["a"],critical=True)],"form a cycle"),
+    ([PipelineTask(name="a",function=lambda b:b,inputs=["b"],critical=True)],"reads unknown tasks"),
+    ([PipelineTask(name="a",function=lambda:1,inputs=[],critical=True)]*2,"not unique")])
+def test_invalid_graph_is_rejected(tasks,message):
+    with pytest.raises(BaseException) as error:
+        DagScheduler(tasks=tasks).run()
+    assert message in get_error_messages(error.value)
@@ -0,0 +1,71 @@
+from thyroid.entity.drift_detector import DataDriftDetector,get_psi,get_psi_bins,get_numeric_values
+import pandas as pd
+import numpy as np
+import pytest
+
+SCHEMA_FILE_DATA = {"columns":{"age":"int64","sex":"object","TSH":"object"},"numerical_columns":["age"],
+                    "column_constraints":{"TSH":{"min_value":0},"sex":{"allowed_values":["F","M"]}}}
+
+
+def write_csv(file_path,df:pd.DataFrame)->str:
+    df.to_csv(file_path,index=False)
+    return str(file_path)
+
+def get_data(n_rows:int,age_shift:float=0,male_share:float=0.5,seed:int=0)->pd.DataFrame:
+    random_state = np.random.RandomState(seed)
+    tsh = np.round(random_state.lognormal(size=n_rows),3).astype(str)
+    tsh[random_state.rand(n_rows) < 0.1] = '?'
+    return pd.DataFrame({"age":np.round(random_state.normal(50+age_shift,10,size=n_rows)).astype(int),
+                         "sex":np.where(random_state.rand(n_rows) < male_share,"M","F"),"TSH":tsh})
+
+def get_report(tmp_path,reference:pd.DataFrame,current:pd.DataFrame)->dict:
+    detector = DataDriftDetector(schema_file_data=SCHEMA_FILE_DATA,chunk_size=700)
+    return detector.get_drift_report(reference_file_path=write_csv(tmp_path/"train.csv",reference),
+                                     current_file_path=write_csv(tmp_path/"test.csv",current))
+
+
+def test_psi():
+    assert get_psi(np.array([50,50]),np.array([50,50])) == 0
+    expected = 0.4*np.log(0.9/0.5)+0.4*np.log(0.5/0.1)
+    assert get_psi(np.array([50,50]),np.array([90,10])) == pytest.approx(expected)
+    #an empty bin is clipped instead of giving an infinite psi
+    assert np.isfinite(get_psi(np.array([100,0]),np.array([0,100])))
+
+def test_psi_bins_hold_equal_reference_shares():
+    assert get_psi_bins(np.ones(10),n_bins=5).tolist() == [0,2,4,6,8]
+    assert get_psi_bins(np.array([0,0,5,0,0]),n_bins=4).tolist() == [0,3]
+    reference_counts = np.random.RandomState(0).randint(1,50,size=1000)
+    bin_starts = get_psi_bins(reference_counts,n_bins=10)
+    shares = np.add.reduceat(reference_counts,bin_starts)/reference_counts.sum()
+    assert len(shares) == 10 and np.all(np.abs(shares-0.1) < 0.01)
+
+def test_numeric_values_of_text():
+    values = get_numeric_values(pd.Series(["1.5","?",None,"1.5","2"]))
+    assert np.array_equal(values,[1.5,np.nan,np.nan,1.5,2.0],equal_nan=True)
+
+def test_same_distribution_has_no_drift(tmp_path):
+    report = get_report(tmp_path,reference=get_data(2000,seed=0),current=get_data(1000,seed=1))
+    assert (report["reference_rows"],report["current_rows"]) == (2000,1000)
+    assert [column_drift["column_type"] for column_drift in report["columns"].values()] == ["numeric","categorical","numeric"]
+    assert report["number_of_drifted_columns"] == 0 and not report["dataset_drift"]
+    assert all(column_drift["psi"] < 0.05 for column_drift in report["columns"].values())
+
+def test_identical_files_have_zero_statistics(tmp_path):
+    data = get_data(500)
+    for column_drift in get_report(tmp_path,reference=data,current=data)["columns"].values():
+        assert column_drift["statistic"] == 0 and column_drift["p_value"] == pytest.approx(1.0)
+        assert column_drift["psi"] == pytest.approx(0.0)
+
+def test_shifted_distribution_drifts(tmp_path):
+    report = get_report(tmp_path,reference=get_data(2000,seed=0),current=get_data(1000,age_shift=15,male_share=0.8,seed=1))
+    age,sex,tsh = report["columns"]["age"],report["columns"]["sex"],report["columns"]["TSH"]
+    assert age["drift_detected"] and age["p_value"] < 1e-6 and age["statistic"] > 0.4 and age["psi"] > 0.25
+    assert sex["drift_detected"] and sex["psi"] > 0.1
+    assert not tsh["drift_detected"]
+    assert report["number_of_drifted_columns"] == 2 and report["dataset_drift"]
+
+def test_missing_values_are_a_category(tmp_path):
+    reference,current = get_data(1000,seed=0),get_data(1000,seed=1)
+    current.loc[current.index[:300],"sex"] = np.nan
+    report = get_report(tmp_path,reference=reference,current=current)
+    assert report["columns"]["sex"]["categories"] == 3 and report["columns"]["sex"]["drift_detected"]
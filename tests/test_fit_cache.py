@@ -0,0 +1,62 @@
+from thyroid.entity.fit_cache import FitCache,get_array_fingerprint
+from thyroid.entity.model_bundle import get_manifest_file_path
+from thyroid.constant import MODEL_BUNDLE_KEY_FILE_ENV
+from sklearn.tree import DecisionTreeClassifier
+import numpy as np
+import json,os
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def bundle_key(tmp_path,monkeypatch):
+    monkeypatch.setenv(MODEL_BUNDLE_KEY_FILE_ENV,str(tmp_path/"keys"/"bundle.key"))
+
+@pytest.fixture
+def fit_cache(tmp_path):
+    return FitCache(cache_dir=str(tmp_path/"fit_cache"))
+
+def get_key(max_depth:int)->str:
+    X = np.arange(20.0).reshape(10,2)
+    return FitCache.get_key(get_array_fingerprint(X),DecisionTreeClassifier(),{"max_depth":max_depth},"fold0")
+
+
+def test_keys_change_with_the_parameters():
+    assert get_key(max_depth=2) == get_key(max_depth=2)
+    assert get_key(max_depth=2) != get_key(max_depth=3)
+
+def test_miss_then_hit(fit_cache):
+    key = get_key(max_depth=2)
+    assert fit_cache.get(key=key) == (False,None)
+    fit_cache.put(key=key,value=0.75)
+    assert fit_cache.get(key=key) == (True,0.75)
+    model = DecisionTreeClassifier(max_depth=2).fit(np.arange(20.0).reshape(10,2),np.arange(10) % 2)
+    fit_cache.put(key=get_key(max_depth=3),value=model)
+    found,cached_model = fit_cache.get(key=get_key(max_depth=3))
+    assert found and cached_model.get_params() == model.get_params()
+    assert (fit_cache.hits,fit_cache.misses) == (2,1)
+
+def test_unsigned_or_edited_entries_are_misses(fit_cache):
+    key = get_key(max_depth=2)
+    fit_cache.put(key=key,value=0.75)
+    file_path = fit_cache.get_file_path(key=key)
+    manifest_file_path = get_manifest_file_path(file_path)
+    with open(manifest_file_path) as json_file:
+        manifest = json.load(json_file)
+    manifest["signature"] = "0"*64
+    with open(manifest_file_path,'w') as json_file:
+        json.dump(manifest,json_file)
+    assert fit_cache.get(key=key) == (False,None)
+
+    os.remove(manifest_file_path)
+    assert fit_cache.get(key=key) == (False,None)
+
+def test_evict_removes_least_recently_used(fit_cache):
+    keys = [get_key(max_depth=max_depth) for max_depth in range(1,5)]
+    for number,key in enumerate(keys):
+        fit_cache.put(key=key,value=np.zeros(50000))
+        manifest_file_path = get_manifest_file_path(fit_cache.get_file_path(key=key))
+        os.utime(manifest_file_path,ns=(number*10**9,number*10**9))
+    fit_cache.max_size_mb = 0.8
+    fit_cache.evict()
+    assert [os.path.exists(fit_cache.get_file_path(key=key)) for key in keys] == [False,False,True,True]
+    assert not os.path.exists(get_manifest_file_path(fit_cache.get_file_path(key=keys[0])))
@@ -0,0 +1,39 @@
+from thyroid.entity.indexed_knn_imputer import IndexedKNNImputer
+from sklearn.impute import KNNImputer
+import numpy as np
+import pytest
+
+
+def get_missing_data(n_rows:int=600,n_features:int=6,missing_rate:float=0.15,random_state:int=0)->np.ndarray:
+    #continuous values so no two donors are at exactly the same distance from a row
+    random_state = np.random.RandomState(random_state)
+    X = random_state.normal(size=(n_rows,n_features))
+    X[random_state.rand(n_rows,n_features) < missing_rate] = np.nan
+    return X
+
+
+@pytest.mark.parametrize("random_state",[0,1,2])
+@pytest.mark.parametrize("chunk_size",[1,64,1024])
+def test_transform_matches_knn_imputer(random_state,chunk_size):
+    X_fit = get_missing_data(random_state=random_state)
+    X_new = get_missing_data(n_rows=200,random_state=random_state+100)
+    knn_imputer = KNNImputer(n_neighbors=3).fit(X_fit)
+    imputer = IndexedKNNImputer(n_neighbors=3,chunk_size=chunk_size).fit(X_fit)
+    np.testing.assert_allclose(imputer.transform(X_fit),knn_imputer.transform(X_fit),rtol=1e-12,atol=1e-12)
+    np.testing.assert_allclose(imputer.transform(X_new),knn_imputer.transform(X_new),rtol=1e-12,atol=1e-12)
+
+def test_transform_without_index_matches_knn_imputer():
+    #a zero index budget sends every pattern through the search without an index
+    X = get_missing_data()
+    imputer = IndexedKNNImputer(n_neighbors=3,max_index_bytes=0).fit(X)
+    np.testing.assert_allclose(imputer.transform(X),KNNImputer(n_neighbors=3).fit(X).transform(X),rtol=1e-12,atol=1e-12)
+
+def test_tied_rows_do_not_depend_on_the_batch():
+    #every donor of a row is at the same distance, the imputed value must not change with the chunk size
+    X = np.repeat(np.arange(10,dtype=float)[:,np.newaxis],2,axis=1)
+    X[::3,1] = np.nan
+    X = np.concatenate([X,np.array([[4.5,np.nan]]*5)])
+    results = [IndexedKNNImputer(n_neighbors=3,chunk_size=chunk_size).fit(X).transform(X) for chunk_size in [1,2,7,100]]
+    for result in results[1:]:
+        np.testing.assert_array_equal(result,results[0])
+    assert not np.isnan(results[0]).any()
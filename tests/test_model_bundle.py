@@ -0,0 +1,104 @@
+from thyroid.entity import model_bundle
+from thyroid.entity.model_bundle import save_bundle,load_bundle,get_manifest_file_path,get_signing_key
+from thyroid.util.util import load_object
+from thyroid.constant import MODEL_BUNDLE_KEY_FILE_ENV
+from sklearn.tree import DecisionTreeClassifier
+import numpy as np
+import os,json,dill
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def bundle_key(tmp_path,monkeypatch):
+    #every test signs with its own key, never the key in the home directory
+    monkeypatch.setenv(MODEL_BUNDLE_KEY_FILE_ENV,str(tmp_path/"keys"/"bundle.key"))
+
+@pytest.fixture
+def saved_model(tmp_path):
+    model = DecisionTreeClassifier(random_state=0).fit(np.arange(20.0).reshape(10,2),np.arange(10) % 2)
+    file_path = str(tmp_path/"model"/"model.joblib")
+    save_bundle(obj=model,file_path=file_path)
+    return model,file_path
+
+
+def test_saved_bundle_loads(saved_model):
+    model,file_path = saved_model
+    loaded_model = load_bundle(file_path=file_path)
+    np.testing.assert_array_equal(loaded_model.tree_.threshold,model.tree_.threshold)
+
+def test_payload_is_hashed_once_per_version(saved_model,monkeypatch):
+    _,file_path = saved_model
+    model_bundle._verified_payloads.clear()
+    digests = []
+    get_file_digest = model_bundle.get_file_digest
+    monkeypatch.setattr(model_bundle,"get_file_digest",lambda file_path:digests.append(file_path) or get_file_digest(file_path))
+    for _ in range(3):
+        load_bundle(file_path=file_path,mmap_mode='r')
+    assert len(digests) == 1
+
+    #a payload written again is hashed again
+    stat = os.stat(file_path)
+    os.utime(file_path,ns=(stat.st_atime_ns,stat.st_mtime_ns+1000))
+    load_bundle(file_path=file_path)
+    assert len(digests) == 2
+
+
+def get_error_messages(error:BaseException)->str:
+    #pipeline errors are re-raised through ThyroidException, the original error is down the context chain
+    messages = []
+    while error is not None:
+        messages.append(str(error))
+        error = error.__context__
+    return " | ".join(messages)
+
+def assert_rejected(file_path:str,message:str,load=load_bundle):
+    with pytest.raises(BaseException) as excinfo:
+        load(file_path=file_path)
+    assert message in get_error_messages(excinfo.value)
+
+
+class SystemCall:
+
+    def __reduce__(self):
+        return (os.system,("echo payload executed",))
+
+
+def test_tampered_payload_is_rejected(saved_model):
+    _,file_path = saved_model
+    with open(file_path,'r+b') as payload_file:
+        payload_file.seek(200)
+        value = payload_file.read(1)
+        payload_file.seek(200)
+        payload_file.write(bytes([value[0]^1]))
+    assert_rejected(file_path=file_path,message="does not match the digest")
+
+def test_tampered_manifest_is_rejected(saved_model):
+    _,file_path = saved_model
+    manifest_file_path = get_manifest_file_path(file_path)
+    with open(manifest_file_path) as json_file:
+        manifest = json.load(json_file)
+    #any field changed after signing, here to describe a swapped in payload
+    manifest["object_type"] = "sklearn.dummy.DummyClassifier"
+    with open(manifest_file_path,'w') as json_file:
+        json.dump(manifest,json_file)
+    assert_rejected(file_path=file_path,message="not signed with the bundle key")
+
+def test_manifest_signed_with_another_key_is_rejected(saved_model,tmp_path,monkeypatch):
+    _,file_path = saved_model
+    monkeypatch.setenv(MODEL_BUNDLE_KEY_FILE_ENV,str(tmp_path/"other_keys"/"bundle.key"))
+    get_signing_key(create=True)
+    assert_rejected(file_path=file_path,message="not signed with the bundle key")
+
+def test_disallowed_global_is_not_unpickled(tmp_path,capfd):
+    #a correctly signed payload still only resolves the allowed classes
+    file_path = str(tmp_path/"system_call"/"payload.joblib")
+    save_bundle(obj=SystemCall(),file_path=file_path)
+    assert_rejected(file_path=file_path,message="is not allowed in a model bundle")
+    assert "payload executed" not in capfd.readouterr().out
+
+def test_legacy_pickle_needs_opt_in(tmp_path):
+    file_path = str(tmp_path/"legacy.pkl")
+    with open(file_path,'wb') as legacy_file:
+        dill.dump({"legacy":True},legacy_file)
+    assert_rejected(file_path=file_path,message="legacy pickles are not loaded",load=load_object)
+    assert load_object(file_path=file_path,allow_legacy_pickle=True) == {"legacy":True}
@@ -0,0 +1,65 @@
+from thyroid.entity.schema_validator import SchemaValidator
+import pandas as pd
+import pytest
+
+SCHEMA_FILE_DATA = {"columns":{"age":"int64","sex":"object","TSH":"float64"},
+                    "column_constraints":{"age":{"min_value":0,"max_value":130},
+                                          "sex":{"allowed_values":["F","M"],"missing_values":["?"]}}}
+
+
+def write_csv(tmp_path,rows:list,header:str="age,sex,TSH")->str:
+    file_path = tmp_path/"data.csv"
+    file_path.write_text("\n".join([header]+rows)+"\n")
+    return str(file_path)
+
+def validate(file_path:str,chunk_size:int=2):
+    return SchemaValidator(schema_file_data=SCHEMA_FILE_DATA,chunk_size=chunk_size).validate(file_path=file_path)
+
+
+def test_valid_csv(tmp_path):
+    result = validate(write_csv(tmp_path,["41,F,1.3","70,?,","23,M,0.5"]))
+    assert result.is_valid and result.errors == []
+    assert result.row_count == 3
+
+@pytest.mark.parametrize("header,message",[("age,sex","column count is 2, schema has 3"),
+                                           ("age,sex,T3","columns missing : ['TSH']"),
+                                           ("age,sex,T3","columns not in schema : ['T3']")])
+def test_header_errors_end_the_scan(tmp_path,header,message):
+    result = validate(write_csv(tmp_path,["41,F,1.3"],header=header))
+    assert not result.is_valid and message in result.errors
+    assert result.row_count == 0
+
+def test_type_error_ends_the_scan(tmp_path):
+    #the bad age is in the second chunk, the third chunk is not read
+    result = validate(write_csv(tmp_path,["41,F,1.3","70,M,2","4x,F,1.0","33,F,high","50,F,1","60,F,1"]))
+    assert not result.is_valid
+    assert result.row_count == 4
+    assert result.errors == ["age has values that are not int64 in 1 rows, e.g. ['4x']",
+                             "TSH has values that are not float64 in 1 rows, e.g. ['high']"]
+
+def test_missing_integer_is_a_type_error(tmp_path):
+    result = validate(write_csv(tmp_path,["41,F,1.3",",M,2"]))
+    assert result.errors == ["age has values that are not int64 in 1 rows, e.g. ['<missing>']"]
+
+def test_constraint_violations_are_counted_over_the_whole_file(tmp_path):
+    rows = [f"{age},{sex},1.0" for age,sex in [(41,"F"),(140,"X"),(-1,"M"),(20,"X"),(150,"m"),(20,"f"),(20,"U"),
+                                               (20,"V"),(20,"W"),(20,"?")]]
+    result = validate(write_csv(tmp_path,rows))
+    assert not result.is_valid
+    assert result.row_count == 10
+    assert result.errors == ["age has values outside [0, 130] in 3 rows, e.g. ['140', '-1', '150']",
+                             "sex has values outside ['F', 'M'] in 7 rows, e.g. ['X', 'm', 'f', 'U', 'V']"]
+
+def test_typed_file_is_checked_from_its_schema(tmp_path):
+    file_path = str(tmp_path/"data.parquet")
+    pd.DataFrame({"age":[41,200],"sex":["F","M"],"TSH":[1.3,None]}).to_parquet(file_path,index=False)
+    result = validate(file_path)
+    assert result.row_count == 2
+    assert result.errors == ["age has values outside [0, 130] in 1 rows, e.g. [200]"]
+
+    pd.DataFrame({"age":[41.5],"sex":["F"],"TSH":[1.3]}).to_parquet(file_path,index=False)
+    assert validate(file_path).errors == ["data type for age is float64, schema has int64"]
+
+def test_missing_file(tmp_path):
+    result = validate(str(tmp_path/"missing.csv"))
+    assert not result.is_valid and result.errors == ["file is not available"]
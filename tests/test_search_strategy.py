@@ -0,0 +1,118 @@
+from thyroid.entity import model_factory
+from thyroid.entity.model_factory import ModelFactory
+from thyroid.entity.search_strategy import SearchStrategy,SearchBudget,SearchCandidate,GridSearchStrategy,\
+    RandomSearchStrategy,HalvingSearchStrategy,EarlyStopSearchStrategy
+from sklearn.model_selection import ParameterGrid
+from sklearn.datasets import make_classification
+import numpy as np
+import pytest
+
+PARAM_GRIDS = [{"max_depth":[1,2,3],"min_samples_leaf":[1,2,4]},{"n_neighbors":[1,3,5,7]}]
+
+
+def get_candidates(n_per_model:list)->list:
+    return [SearchCandidate(model_index=model_index,parameters={"position":position},resource=1.0)
+            for model_index,n_candidates in enumerate(n_per_model) for position in range(n_candidates)]
+
+
+def test_search_strategy_is_abstract():
+    with pytest.raises(TypeError):
+        SearchStrategy(param_grids=PARAM_GRIDS)
+
+def test_grid_proposes_every_grid_point_once():
+    strategy = GridSearchStrategy(param_grids=PARAM_GRIDS)
+    candidates = strategy.propose()
+    assert [(candidate.model_index,candidate.parameters) for candidate in candidates] == \
+        [(model_index,parameters) for model_index,param_grid in enumerate(PARAM_GRIDS) for parameters in ParameterGrid(param_grid)]
+    assert strategy.propose() == []
+
+def test_random_proposes_n_iter_per_model_in_batches():
+    strategy = RandomSearchStrategy(param_grids=PARAM_GRIDS,random_state=0,n_iter=5,batch_size=2)
+    rounds = []
+    while True:
+        candidates = strategy.propose()
+        if not candidates:
+            break
+        rounds.append(candidates)
+    assert [len(candidates) for candidates in rounds] == [4,4,1]
+    assert sum(candidate.model_index == 1 for candidates in rounds for candidate in candidates) == 4
+
+def test_halving_keeps_the_best_third_on_more_data():
+    strategy = HalvingSearchStrategy(param_grids=PARAM_GRIDS[:1],factor=3)
+    resources = []
+    while True:
+        candidates = strategy.propose()
+        if not candidates:
+            break
+        resources.append((len(candidates),candidates[0].resource))
+        #max_depth 3 and min_samples_leaf 1 scores best, equal scores keep the earlier candidate
+        scores = [candidate.parameters["max_depth"]-candidate.parameters["min_samples_leaf"]/10 for candidate in candidates]
+        strategy.update(candidates=candidates,scores=scores)
+    assert resources == [(9,pytest.approx(1/3)),(3,1.0)]
+    assert strategy.get_best(model_index=0).parameters == {"max_depth":3,"min_samples_leaf":1}
+
+def run_early_stop(get_score)->list:
+    strategy = EarlyStopSearchStrategy(param_grids=[{"n_neighbors":list(range(1,9))}],random_state=0,
+                                       n_initial=1,n_best=8,patience=2)
+    rounds = []
+    while True:
+        candidates = strategy.propose()
+        if not candidates:
+            break
+        rounds.append([candidate.parameters["n_neighbors"] for candidate in candidates])
+        strategy.update(candidates=candidates,scores=[get_score(candidate.parameters["n_neighbors"]) for candidate in candidates])
+    return rounds
+
+def test_early_stop_stops_after_patience_rounds_without_improvement():
+    #the first round sets the best score, two rounds without a better score stop the search
+    rounds = run_early_stop(get_score=lambda n_neighbors:0.5)
+    assert len(rounds) == 3
+    seen = [n_neighbors for candidates in rounds for n_neighbors in candidates]
+    assert len(seen) == len(set(seen)) < 8
+
+def test_early_stop_walks_the_grid_neighbours_while_improving():
+    rounds = run_early_stop(get_score=lambda n_neighbors:n_neighbors)
+    for round_number in range(1,len(rounds)):
+        seen = [n_neighbors for candidates in rounds[:round_number] for n_neighbors in candidates]
+        assert all(min(abs(n_neighbors-value) for value in seen) == 1 for n_neighbors in rounds[round_number])
+    #the best grid point ends the improvements, patience rounds later the search stops
+    best_round = next(round_number for round_number,candidates in enumerate(rounds) if 8 in candidates)
+    assert len(rounds) == best_round+1+2
+
+def test_trim_shares_a_fit_budget_between_models():
+    budget = SearchBudget(max_fits=12)
+    trimmed = budget.trim(candidates=get_candidates([5,2]),n_folds=3)
+    assert [(candidate.model_index,candidate.parameters["position"]) for candidate in trimmed] == [(0,0),(1,0),(0,1),(1,1)]
+    budget.spend(fits=12)
+    assert budget.is_exhausted()
+    assert len(budget.trim(candidates=get_candidates([5,2]),n_folds=3,keep_one_per_model=True)) == 2
+
+def test_batches_only_with_a_time_limit():
+    candidates = get_candidates([3,2])
+    assert SearchBudget().get_batches(candidates=candidates,n_folds=2,batch_fits=4) == [candidates]
+    batches = SearchBudget(max_seconds=60).get_batches(candidates=candidates,n_folds=2,batch_fits=4)
+    assert [[(candidate.model_index,candidate.parameters["position"]) for candidate in batch] for batch in batches] == \
+        [[(0,0),(1,0)],[(0,1),(1,1)],[(0,2)]]
+
+
+def get_search_config(max_seconds)->dict:
+    return {"grid_search":{"class":"GridSearchCV","module":"sklearn.model_selection","params":{"cv":2},
+                           "strategy":{"name":"grid"},"budget":{"max_seconds":max_seconds}},
+            "search_pool":{"n_jobs":1},
+            "model_selection":{"module_0":{"class":"DecisionTreeClassifier","module":"sklearn.tree",
+                                           "search_param_grid":{"max_depth":[1,2,3,4]}},
+                               "module_1":{"class":"KNeighborsClassifier","module":"sklearn.neighbors",
+                                           "search_param_grid":{"n_neighbors":[1,3,5]}}}}
+
+@pytest.mark.parametrize("max_seconds,expected_fits",[(None,14),(0,4)])
+def test_time_budget_stops_the_grid_between_batches(monkeypatch,max_seconds,expected_fits):
+    #with no time left the round stops as soon as every model has one scored candidate
+    fits = []
+    fit_and_score = model_factory.fit_and_score
+    monkeypatch.setattr(model_factory,"fit_and_score",lambda *args:fits.append(args[1]) or fit_and_score(*args))
+    X,y = make_classification(n_samples=80,n_features=4,random_state=0)
+    factory = ModelFactory(config=get_search_config(max_seconds=max_seconds))
+    best_models = factory.initite_best_parameter_search_for_initlized_models(
+        intlized_model_list=factory.get_intlized_model_list(),input_feature=X,output_feature=y)
+    assert len(fits) == expected_fits
+    assert len(best_models) == 2 and all(best_model.best_model is not None for best_model in best_models)
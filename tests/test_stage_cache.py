@@ -0,0 +1,80 @@
+from thyroid.pipeline.stage_cache import StageCache,get_source_files,get_file_fingerprint,get_output_files
+from thyroid.entity.model_bundle import get_bundle_file_paths
+from collections import namedtuple
+import os
+
+StageArtifact = namedtuple("StageArtifact",["file_path","dir_path","accuracy"])
+
+
+class CountingStage:
+
+    def __init__(self,artifact_dir:str) -> None:
+        self.artifact_dir = artifact_dir
+        self.runs = 0
+
+    def __call__(self)->StageArtifact:
+        self.runs += 1
+        file_path = os.path.join(self.artifact_dir,"stage","data.csv")
+        dir_path = os.path.join(self.artifact_dir,"stage","parts")
+        os.makedirs(dir_path,exist_ok=True)
+        for path in (file_path,os.path.join(dir_path,"part0.csv"),os.path.join(dir_path,"part1.csv")):
+            with open(path,'w') as output_file:
+                output_file.write("a\n1\n")
+        return StageArtifact(file_path=file_path,dir_path=dir_path,accuracy=0.9)
+
+
+def run_stage(artifact_dir:str,stage:CountingStage,fingerprint:str="fingerprint")->StageArtifact:
+    #a new cache each run, like a new pipeline process reading the cache file
+    stage_cache = StageCache(artifact_dir=artifact_dir)
+    return stage_cache.run_stage(stage_name="stage",fingerprint=fingerprint,artifact_class=StageArtifact,
+                                 stage_function=stage)
+
+def test_unchanged_stage_is_reused(tmp_path):
+    stage = CountingStage(artifact_dir=str(tmp_path))
+    artifact = run_stage(artifact_dir=str(tmp_path),stage=stage)
+    assert run_stage(artifact_dir=str(tmp_path),stage=stage) == artifact
+    assert stage.runs == 1
+
+def test_changed_fingerprint_runs_the_stage_again(tmp_path):
+    stage = CountingStage(artifact_dir=str(tmp_path))
+    run_stage(artifact_dir=str(tmp_path),stage=stage)
+    run_stage(artifact_dir=str(tmp_path),stage=stage,fingerprint="changed")
+    assert stage.runs == 2
+
+def test_missing_output_file_runs_the_stage_again(tmp_path):
+    stage = CountingStage(artifact_dir=str(tmp_path))
+    artifact = run_stage(artifact_dir=str(tmp_path),stage=stage)
+    #a file inside an output directory counts as an output too
+    os.remove(os.path.join(artifact.dir_path,"part1.csv"))
+    run_stage(artifact_dir=str(tmp_path),stage=stage)
+    assert stage.runs == 2
+    os.remove(artifact.file_path)
+    run_stage(artifact_dir=str(tmp_path),stage=stage)
+    assert stage.runs == 3
+    run_stage(artifact_dir=str(tmp_path),stage=stage)
+    assert stage.runs == 3
+
+def test_saved_object_outputs_include_the_manifest(tmp_path):
+    payload_file_path = str(tmp_path/"model.joblib")
+    for path in get_bundle_file_paths(payload_file_path):
+        open(path,'w').close()
+    assert get_output_files(paths=[payload_file_path]) == sorted(get_bundle_file_paths(payload_file_path))
+
+def test_source_files_follow_thyroid_imports_transitively():
+    source_files = [os.path.relpath(path).replace(os.sep,'/') for path in get_source_files("thyroid.pipeline.stage_cache")]
+    #stage_cache imports model_bundle, which imports the constants, third party modules are left out
+    assert "thyroid/pipeline/stage_cache.py" in source_files
+    assert "thyroid/entity/model_bundle.py" in source_files
+    assert "thyroid/constant/__init__.py" in source_files
+    assert "thyroid/pipeline/__init__.py" in source_files
+    assert all(path.startswith("thyroid/") for path in source_files)
+
+def test_file_fingerprint(tmp_path):
+    file_path = tmp_path/"data.csv"
+    file_path.write_text("a\n1\n")
+    fingerprint = get_file_fingerprint(str(file_path))
+    assert get_file_fingerprint(str(file_path)) == fingerprint
+    file_path.write_text("a\n2\n")
+    assert get_file_fingerprint(str(file_path)) != fingerprint
+    #a source that can not be read is never reused
+    assert get_file_fingerprint("https://example.com/data.csv") != get_file_fingerprint("https://example.com/data.csv")
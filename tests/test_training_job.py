@@ -0,0 +1,84 @@
+from thyroid.pipeline.training_job import TrainingJobManager,TrainingJob,get_job_info,get_worker_id,is_worker_alive,\
+    to_job_record,JOB_QUEUED,JOB_RUNNING,JOB_COMPLETED,JOB_FAILED
+from thyroid.pipeline.dag import TaskState,TASK_COMPLETED
+from collections import OrderedDict
+import subprocess,threading,socket,json,sys,time
+import pytest
+
+
+@pytest.fixture
+def release_jobs(monkeypatch):
+    #jobs run until the event is set instead of training a model
+    release = threading.Event()
+    def run_job(self,job_id):
+        self.update_job(job_id,status=JOB_RUNNING,start_time=time.time())
+        release.wait(timeout=10)
+        self.update_stage(job_id,TaskState(name="data_ingestion",status=TASK_COMPLETED,start_time=1.0,end_time=3.5,error=None))
+        self.update_job(job_id,status=JOB_COMPLETED,end_time=time.time())
+    monkeypatch.setattr(TrainingJobManager,"run_job",run_job)
+    return release
+
+def get_exited_worker()->str:
+    process = subprocess.Popen([sys.executable,"-c","pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+def write_job(job_file_path:str,worker:str,status:str=JOB_RUNNING):
+    training_job = TrainingJob(job_id="orphan",status=status,submitted_time=1.0,start_time=2.0,end_time=None,
+                               stages=OrderedDict(),final_artifact=None,error=None,worker=worker)
+    with open(job_file_path,'w') as json_file:
+        json.dump([to_job_record(training_job)],json_file)
+
+
+def test_active_job_is_shared_by_managers_of_the_same_job_file(tmp_path,release_jobs):
+    job_file_path = str(tmp_path/"training_jobs.json")
+    manager,other_manager = TrainingJobManager(job_file_path=job_file_path),TrainingJobManager(job_file_path=job_file_path)
+    training_job,created = manager.submit()
+    assert created and training_job.status == JOB_QUEUED
+    other_job,other_created = other_manager.submit()
+    assert other_job.job_id == training_job.job_id and not other_created
+
+    release_jobs.set()
+    manager._executor.shutdown(wait=True)
+    completed_job = other_manager.get_job(training_job.job_id)
+    assert completed_job.status == JOB_COMPLETED
+    assert get_job_info(completed_job)["stages"][0]["duration"] == 2.5
+    #a finished job no longer blocks a new one
+    assert other_manager.submit()[1]
+    other_manager._executor.shutdown(wait=True)
+
+def test_job_of_an_exited_worker_is_marked_failed(tmp_path):
+    job_file_path = str(tmp_path/"training_jobs.json")
+    worker = get_exited_worker()
+    write_job(job_file_path=job_file_path,worker=worker)
+    training_job = TrainingJobManager(job_file_path=job_file_path).get_job("orphan")
+    assert training_job.status == JOB_FAILED
+    assert training_job.error == f"worker {worker} exited"
+    with open(job_file_path) as json_file:
+        assert json.load(json_file)[0]["status"] == JOB_FAILED
+
+@pytest.mark.parametrize("worker",[get_worker_id(),"other-host:1"])
+def test_job_of_a_live_or_remote_worker_stays_active(tmp_path,worker):
+    job_file_path = str(tmp_path/"training_jobs.json")
+    write_job(job_file_path=job_file_path,worker=worker)
+    manager = TrainingJobManager(job_file_path=job_file_path)
+    assert manager.get_job("orphan").status == JOB_RUNNING
+    assert manager.submit() == (manager.get_job("orphan"),False)
+
+def test_is_worker_alive():
+    assert is_worker_alive(get_worker_id())
+    assert not is_worker_alive(get_exited_worker())
+
+def test_job_history_is_trimmed(tmp_path,release_jobs):
+    release_jobs.set()
+    manager = TrainingJobManager(job_file_path=str(tmp_path/"training_jobs.json"),history_size=2)
+    job_ids = []
+    for _ in range(3):
+        job_ids.append(manager.submit()[0].job_id)
+        #jobs run one at a time, wait until this one is done before the next submit
+        deadline = time.time()+10
+        while manager.get_job(job_ids[-1]).status != JOB_COMPLETED and time.time() < deadline:
+            time.sleep(0.01)
+    assert manager.get_job(job_ids[0]) is None
+    assert [manager.get_job(job_id).status for job_id in job_ids[1:]] == [JOB_COMPLETED,JOB_COMPLETED]
+    manager._executor.shutdown(wait=True)
@@ -0,0 +1,50 @@
+from thyroid.entity.tree_ensemble import FlatTreeEnsemble,flatten_tree_model,get_self_check_data,export_flat_model
+from thyroid.constant import FLAT_MODEL_DIR_NAME
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier,GradientBoostingClassifier,AdaBoostClassifier
+from sklearn.datasets import make_classification
+import numpy as np
+import pytest
+
+MODEL_FACTORIES = {
+    "decision_tree":lambda:DecisionTreeClassifier(max_depth=8,random_state=0),
+    "random_forest":lambda:RandomForestClassifier(n_estimators=15,max_depth=6,random_state=0),
+    "gradient_boosting":lambda:GradientBoostingClassifier(n_estimators=15,max_depth=3,random_state=0),
+    "adaboost":lambda:AdaBoostClassifier(estimator=DecisionTreeClassifier(max_depth=2),n_estimators=15,
+                                         algorithm="SAMME.R",random_state=0),
+}
+
+
+def get_classification_data(n_classes:int,random_state:int=0):
+    X,y = make_classification(n_samples=600,n_features=8,n_informative=5,n_classes=n_classes,
+                              random_state=random_state)
+    #class labels that are not 0..n-1 so the label lookup is checked as well
+    return X.astype(np.float32),np.asarray(["negative","primary","secondary","compensated"])[y]
+
+
+@pytest.mark.parametrize("n_classes",[2,3,4])
+@pytest.mark.parametrize("model_name",list(MODEL_FACTORIES))
+def test_flat_model_predicts_like_sklearn(model_name,n_classes):
+    X,y = get_classification_data(n_classes=n_classes)
+    model = MODEL_FACTORIES[model_name]().fit(X,y)
+    flat_model = flatten_tree_model(model=model)
+    assert flat_model is not None
+    random_X = np.random.RandomState(1).normal(scale=3.0,size=(1000,X.shape[1])).astype(np.float32)
+    #rows on and next to every split threshold are where a float32/float64 slip would show
+    for check_X in [X,random_X,get_self_check_data(flat_model=flat_model)]:
+        np.testing.assert_array_equal(flat_model.predict(check_X),model.predict(check_X))
+
+@pytest.mark.parametrize("model_name",list(MODEL_FACTORIES))
+def test_exported_flat_model_loads_and_matches(model_name,tmp_path):
+    X,y = get_classification_data(n_classes=3)
+    model = MODEL_FACTORIES[model_name]().fit(X,y)
+    assert export_flat_model(model=model,export_dir=str(tmp_path),X=X)
+    flat_model = FlatTreeEnsemble.load(flat_model_dir=str(tmp_path/FLAT_MODEL_DIR_NAME))
+    np.testing.assert_array_equal(flat_model.predict(X),model.predict(X))
+
+def test_unsupported_model_is_not_flattened(tmp_path):
+    X,y = get_classification_data(n_classes=3)
+    model = AdaBoostClassifier(n_estimators=5,algorithm="SAMME",random_state=0).fit(X,y)
+    assert flatten_tree_model(model=model) is None
+    assert not export_flat_model(model=model,export_dir=str(tmp_path),X=X)
+    assert FlatTreeEnsemble.load(flat_model_dir=str(tmp_path/FLAT_MODEL_DIR_NAME)) is None
@@ -4,6 +4,7 @@ from thyroid.logger import logging
 from thyroid.entity.config_entity import DataIngestionConfig
 from thyroid.entity.artifact_entity import DataIngestionArtifact
 from thyroid.constant import *
+from thyroid.util.util import get_artifact_file_name,save_dataframe,read_dataframe
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
@@ -16,6 +17,9 @@ class DataIngestion:
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
+    def get_file_name(self)->str:
+        return get_artifact_file_name(file_name=DATABASE_NAME,artifact_format=self.data_ingestion_config.artifact_format)
+
     def download_insurance_data(self):
         try:
             logging.info(f"download insurance data function started")
@@ -25,8 +29,8 @@ class DataIngestion:
 
             os.makedirs(raw_data_dir,exist_ok=True)
             insurance_df = pd.read_csv(dataset_url)
-            raw_file_path = os.path.join(raw_data_dir,DATABASE_NAME)
-            insurance_df.to_csv(raw_file_path,index=False)
+            raw_file_path = os.path.join(raw_data_dir,self.get_file_name())
+            save_dataframe(df=insurance_df,file_path=raw_file_path)
 
             logging.info(f"data saved successfully")
         except Exception as e:
@@ -38,9 +42,9 @@ class DataIngestion:
             raw_data_dir = self.data_ingestion_config.raw_data_dir
             logging.info(f"raw data dir is : {raw_data_dir}")
 
-            raw_file_path = os.path.join(raw_data_dir,DATABASE_NAME)
+            raw_file_path = os.path.join(raw_data_dir,self.get_file_name())
             logging.info(f"-----------data reading started----------")
-            insurance_df = pd.read_csv(raw_file_path)
+            insurance_df = read_dataframe(file_path=raw_file_path)
             logging.info(f"-----------data reading completed----------")
 
 
@@ -53,20 +57,20 @@ class DataIngestion:
             logging.info(f"ingested train dir is : {ingested_train_dir}")
             logging.info(f"ingested test dir is : {ingested_test_dir}")
 
-            ingested_train_file_path = os.path.join(ingested_train_dir,DATABASE_NAME)
-            ingested_test_file_path = os.path.join(ingested_test_dir,DATABASE_NAME)
+            ingested_train_file_path = os.path.join(ingested_train_dir,self.get_file_name())
+            ingested_test_file_path = os.path.join(ingested_test_dir,self.get_file_name())
 
             X_train, X_test, y_train, y_test = train_test_split(insurance_df.iloc[:,:-1],insurance_df.iloc[:,-1], test_size=0.20, random_state=42)
 
             train_df = pd.concat([X_train,y_train],axis=1)
             test_df = pd.concat([X_test,y_test],axis=1)
 
-            logging.info(f"saving train file as csv")
-            train_df.to_csv(ingested_train_file_path,index=False)
+            logging.info(f"saving train file as {self.data_ingestion_config.artifact_format}")
+            save_dataframe(df=train_df,file_path=ingested_train_file_path)
             logging.info(f"train file saved successfully")
 
-            logging.info(f"saving test file as csv")
-            test_df.to_csv(ingested_test_file_path,index=False)
+            logging.info(f"saving test file as {self.data_ingestion_config.artifact_format}")
+            save_dataframe(df=test_df,file_path=ingested_test_file_path)
             logging.info(f"test file saved successfully")
 
             data_ingestion_artifact = DataIngestionArtifact(is_ingested=True,
@@ -1,17 +1,26 @@
-import os,sys,csv,dill
+import os,sys,csv,json
 from thyroid.exception import ThyroidException
 from thyroid.logger import logging
 from thyroid.entity.artifact_entity import DataIngestionArtifact,DataTransformArtifact,DataValidationArtifact
 from thyroid.entity.config_entity import DataTransformConfig
-from thyroid.constant import DROP_COLUMN_LIST,TARGET_COLUMN_KEY,NO_CLUSTER
-from thyroid.util.util import read_yaml
+from thyroid.constant import DROP_COLUMN_LIST,TARGET_COLUMN_KEY,TARGET_CLASS_MAPPING,INDEXED_IMPUTER_MODE,CSV_ARTIFACT_FORMAT,\
+    AUTO_CLUSTERS,CLUSTER_SCORE_FILE_NAME,KMEANS_CLUSTER_BACKEND
+from thyroid.entity.cluster_model import get_cluster_model,fit_cluster_model,iter_chunks
+from thyroid.entity.centroid_router import export_centroid_router
+from thyroid.entity.cluster_selection import ClusterSelector,ClusterSelectionResult,ClusterScore,get_silhouette_samples
+from thyroid.entity.feature_encoder import FeatureEncoder
+from thyroid.entity.preprocessor import ThyroidPreprocessor
+from thyroid.entity.indexed_knn_imputer import IndexedKNNImputer
+from thyroid.util.util import read_yaml,get_cluster_file_names,get_artifact_file_name,save_dataframe,read_dataframe,\
+    save_object
 import pandas as pd
 import numpy as np
 from sklearn.impute import KNNImputer
-from sklearn.cluster import KMeans
-from yellowbrick.cluster import KElbowVisualizer
-from yellowbrick.cluster import SilhouetteVisualizer
+import matplotlib
+#graphs are only written to files and may be drawn outside the main thread
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from joblib import Parallel,delayed
 from pathlib import Path
 from imblearn.over_sampling import RandomOverSampler
 
@@ -33,8 +42,8 @@ class DataTransform:
     def perform_drop_column(self):
         try:
             logging.info("perform drop column function started")
-            train_df = pd.read_csv(self.data_ingestion_artifact.train_file_path)
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            train_df = read_dataframe(file_path=self.data_ingestion_artifact.train_file_path)
+            test_df = read_dataframe(file_path=self.data_ingestion_artifact.test_file_path)
 
             logging.info(f"dropping not needed column from train file")
             train_df.drop(DROP_COLUMN_LIST,inplace=True,axis=1)
@@ -47,31 +56,17 @@ class DataTransform:
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
-    def column_mapping(self,df:pd.DataFrame):
-        try:
-            logging.info(f"column mapping function started")
-            df['sex'] = df['sex'].map({'F':0,'M':1})
-            df['Class'] = df['Class'].map({'negative':0,'compensated_hypothyroid':1,'primary_hypothyroid':2,'secondary_hypothyroid':3})
-            logging.info(f"unique:{np.unique(np.array(df['Class']))}")
-            for columns in df.columns:
-                if len(df[columns].unique())==2:
-                    df[columns] = df[columns].map({'f':0,'t':1})
-
-            return df
-        except Exception as e:
-            raise ThyroidException(sys,e) from e
-        
-    def get_one_hotencoding(self,df:pd.DataFrame):
-        try:
-            logging.info(f"get one hot encoding function started")
-            return pd.get_dummies(df,columns=['referral_source'],drop_first=True)
-        except Exception as e:
-            raise ThyroidException(sys,e) from e
-        
     def perform_imputer(self,df:pd.DataFrame):
         try:
             logging.info(f"perform imputer function started")
-            imputer = KNNImputer(n_neighbors=3,weights='uniform',missing_values=np.nan)
+            imputer_mode = self.data_transform_config.imputer_mode
+            logging.info(f"imputer mode is : {imputer_mode}")
+            if imputer_mode == INDEXED_IMPUTER_MODE:
+                imputer = IndexedKNNImputer(n_neighbors=3,weights='uniform',missing_values=np.nan,
+                                            chunk_size=self.data_transform_config.imputer_chunk_size,
+                                            max_index_bytes=int(self.data_transform_config.imputer_max_index_mb*1024*1024))
+            else:
+                imputer = KNNImputer(n_neighbors=3,weights='uniform',missing_values=np.nan)
             columns = df.columns
             data = imputer.fit_transform(df)
             df = pd.DataFrame(data,columns=columns)
@@ -82,7 +77,7 @@ class DataTransform:
     def get_balanced_class_data(self,df:pd.DataFrame,target:pd.DataFrame):
         try:
             logging.info(f"get balanced class data function started")
-            rd_sample = RandomOverSampler()
+            rd_sample = RandomOverSampler(random_state=42)
             target = pd.DataFrame(np.array(target))
             target.columns = self.target_column
             
@@ -93,54 +88,74 @@ class DataTransform:
         except Exception as e:
             raise ThyroidException(sys,e) from e
 
-    def log_transform(self,df:pd.DataFrame):
-        try:
-            columns = ['age','TSH','T3','TT4','T4U']
-            for column in columns:
-                df[column] = np.log(df[column]+1)
-            return df
-        except Exception as e:
-            raise ThyroidException(sys,e) from e
-                   
-    def perform_preprocessing(self,df:pd.DataFrame,is_test_data:bool=False,preprocessing_object=None):
+    def perform_preprocessing(self,df:pd.DataFrame,is_test_data:bool=False,preprocessing_object:ThyroidPreprocessor=None):
         try:
             logging.info(f"perform preprocessing function started")
-            df = self.column_mapping(df=df)
-            df = self.get_one_hotencoding(df=df)
-            df = df.replace('?', np.NaN)
-            target_df = df.iloc[:,-1]
-            df.drop(self.target_column,axis=1,inplace=True)
+            target_df = df[self.target_column[0]].map(TARGET_CLASS_MAPPING)
+            logging.info(f"unique:{np.unique(np.array(target_df))}")
+
             if is_test_data == False:
-                df,preprocessing_object = self.perform_imputer(df=df)
+                feature_encoder = FeatureEncoder(target_column=self.target_column).fit(df=df)
+                df = feature_encoder.transform(df=df)
+                df,imputer = self.perform_imputer(df=df)
+                preprocessing_object = ThyroidPreprocessor(feature_encoder=feature_encoder,imputer=imputer)
+                df = preprocessing_object.log_transform(df=df)
             else:
-                df['hypopituitary'] = df['hypopituitary'].map({'f':0,'t':1})
-                data = preprocessing_object.transform(df)
-                columns = df.columns
-                df = pd.DataFrame(data,columns=columns)
-            
-            
+                df = preprocessing_object.transform(df=df)
 
             df = self.get_balanced_class_data(df=df,target=target_df)
             return df,preprocessing_object
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
-    def get_and_save_graph_cluster(self,df:pd.DataFrame):
+    def get_cluster_selector(self)->ClusterSelector:
         try:
-            logging.info(f"get and asve graph cluster function started")
-            logging.info(f"making k-means object")
+            return ClusterSelector(backend=self.data_transform_config.cluster_backend,
+                                   batch_size=self.data_transform_config.cluster_batch_size,
+                                   min_clusters=self.data_transform_config.min_clusters,
+                                   max_clusters=self.data_transform_config.max_clusters,
+                                   method=self.data_transform_config.cluster_selection_method,
+                                   sample_size=self.data_transform_config.silhouette_sample_size)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_and_save_cluster_selection(self,df:pd.DataFrame)->ClusterSelectionResult:
+        try:
+            logging.info(f"get and save cluster selection function started")
+            cluster_selection = self.get_cluster_selector().select(X=np.array(df.drop(self.target_column,axis=1)))
 
-            kmeans = KMeans(init='k-means++',random_state=42)
+            graph_dir = self.data_transform_config.graph_save_dir
+            os.makedirs(graph_dir,exist_ok=True)
+            with open(os.path.join(graph_dir,CLUSTER_SCORE_FILE_NAME),'w') as json_file:
+                json.dump({"n_clusters":cluster_selection.n_clusters,"method":cluster_selection.method,
+                           "scores":[score._asdict() for score in cluster_selection.scores]},json_file,indent=2)
+            return cluster_selection
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
 
-            logging.info(f"making visulizer object and fitting train data")
-            visulizer = KElbowVisualizer(kmeans,k=(2,11))
-            logging.info(f"{df.columns}")
-            visulizer.fit((df.drop(self.target_column,axis=1)))
+    def get_and_save_graph_cluster(self,cluster_selection:ClusterSelectionResult):
+        try:
+            logging.info(f"get and asve graph cluster function started")
+            n_clusters = [score.n_clusters for score in cluster_selection.scores]
+
+            fig,ax = plt.subplots(figsize=(8,5))
+            ax.plot(n_clusters,[score.inertia for score in cluster_selection.scores],marker='D')
+            ax.axvline(cluster_selection.n_clusters,linestyle='--',color='black',
+                       label=f"selected k = {cluster_selection.n_clusters} ({cluster_selection.method})")
+            ax.set_xlabel('k')
+            ax.set_ylabel('inertia')
+            silhouette_ax = ax.twinx()
+            silhouette_ax.plot(n_clusters,[score.silhouette_score for score in cluster_selection.scores],
+                               marker='o',color='green',alpha=0.6)
+            silhouette_ax.set_ylabel('silhouette score',color='green')
+            ax.set_title('Elbow and silhouette score for KMeans clustering')
+            ax.legend()
 
             graph_dir = self.data_transform_config.graph_save_dir
             os.makedirs(graph_dir,exist_ok=True)
             graph_file_path = os.path.join(graph_dir,'graph_cluster.png')
-            visulizer.show(graph_file_path)
+            fig.savefig(graph_file_path)
+            plt.close(fig)
 
             logging.info(f"graph saved successfully")
         except Exception as e:
@@ -149,30 +164,105 @@ class DataTransform:
     def get_and_save_silhouette_score_graph(self,df:pd.DataFrame):
         try:
             logging.info(f"get and save silhouette score graph function started")
-            fig, ax = plt.subplots(2, 2, figsize=(15,8))
+            cluster_selector = self.get_cluster_selector()
+            X = np.array(df.drop(self.target_column,axis=1),dtype='float64')
+            sample_index = cluster_selector.get_sample_index(X=X)
+            cluster_numbers = [2,3,4,5]
+            silhouette_results = Parallel(n_jobs=-1)(delayed(get_silhouette_samples)(X,no_clusters,sample_index,
+                                                                                       cluster_selector.random_state,
+                                                                                       cluster_selector.backend,
+                                                                                       cluster_selector.batch_size)
+                                                     for no_clusters in cluster_numbers)
 
-            for no_clusters in [2,3,4,5]:
+            graph_dir = self.data_transform_config.graph_save_dir
+            os.makedirs(graph_dir,exist_ok=True)
+            for no_clusters,(labels,silhouette_values) in zip(cluster_numbers,silhouette_results):
                 logging.info(f"finding and saving graph of silhouette score for {no_clusters} clusters")
-                kmeans = KMeans(n_clusters=no_clusters,init='k-means++',random_state=42)
-                q,mod = divmod(no_clusters,2)
-
-                visulizer = SilhouetteVisualizer(kmeans,colors='yellowbrick',ax=ax[q-1][mod])
-                visulizer.fit((df.drop(self.target_column,axis=1)))
+                fig,ax = plt.subplots(figsize=(8,5))
+                y_lower = 0
+                for cluster_number in range(no_clusters):
+                    cluster_values = np.sort(silhouette_values[labels == cluster_number])
+                    ax.fill_betweenx(np.arange(y_lower,y_lower+len(cluster_values)),0,cluster_values,alpha=0.7)
+                    y_lower += len(cluster_values)
+                ax.axvline(np.mean(silhouette_values),linestyle='--',color='red')
+                ax.set_title(f"Silhouette plot of KMeans clustering on {len(sample_index)} samples in {no_clusters} centers")
+                ax.set_xlabel('silhouette coefficient values')
+                ax.set_ylabel('cluster label')
 
-                graph_dir = self.data_transform_config.graph_save_dir
-                os.makedirs(graph_dir,exist_ok=True)
                 graph_file_path = os.path.join(graph_dir,'cluster_'+str(no_clusters)+'silhouetter_score.png')
-                visulizer.show(graph_file_path)
+                fig.savefig(graph_file_path)
+                plt.close(fig)
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
+    def get_and_save_cluster_graphs(self,cluster_selection:ClusterSelectionResult=None):
+        try:
+            logging.info(f"get and save cluster graphs function started")
+            transform_train_folder = self.data_transform_config.transform_train_dir
+            df = pd.concat([read_dataframe(file_path=os.path.join(transform_train_folder,file_name))
+                            for file_name in get_cluster_file_names(dir_path=transform_train_folder)],ignore_index=True)
+
+            #the selection made while transforming is drawn as it is, otherwise the candidates are scored here
+            cluster_score_file_path = os.path.join(self.data_transform_config.graph_save_dir,CLUSTER_SCORE_FILE_NAME)
+            if cluster_selection is None and os.path.exists(cluster_score_file_path):
+                with open(cluster_score_file_path,'r') as json_file:
+                    cluster_score = json.load(json_file)
+                cluster_selection = ClusterSelectionResult(n_clusters=cluster_score["n_clusters"],method=cluster_score["method"],
+                                                           scores=[ClusterScore(**score) for score in cluster_score["scores"]])
+            if cluster_selection is None:
+                cluster_selection = self.get_and_save_cluster_selection(df=df)
+
+            self.get_and_save_graph_cluster(cluster_selection=cluster_selection)
+            self.get_and_save_silhouette_score_graph(df=df)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+        
+    def save_cluster_files(self,df:pd.DataFrame,cluster_predict,folder:str,file_prefix:str):
+        try:
+            #rows are grouped by one stable sort so every file keeps the original row order, csv files are
+            #written from the same upcast array a row of df.iloc gives, so they match the per row writer
+            artifact_format = self.data_transform_config.artifact_format
+            cluster_predict = np.asarray(cluster_predict)
+            order = np.argsort(cluster_predict,kind='stable')
+            cluster_numbers,start_index = np.unique(cluster_predict[order],return_index=True)
+            end_index = list(start_index[1:])+[len(order)]
+            if artifact_format == CSV_ARTIFACT_FORMAT:
+                rows = df.to_numpy()[order]
+            else:
+                df = df.iloc[order]
+
+            for cluster_number,start,end in zip(cluster_numbers,start_index,end_index):
+                file_name = get_artifact_file_name(file_name=file_prefix+str(cluster_number),artifact_format=artifact_format)
+                file_path = os.path.join(folder,file_name)
+                if artifact_format == CSV_ARTIFACT_FORMAT:
+                    with Path(file_path).open('w',newline='') as csvfiles:
+                        csvwriter = csv.writer(csvfiles)
+                        csvwriter.writerow(df.columns)
+                        csvwriter.writerows(rows[start:end])
+                else:
+                    save_dataframe(df=df.iloc[start:end],file_path=file_path)
+                logging.info(f"{end-start} rows written to {file_path}")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
     def save_data_based_on_cluster(self,train_df:pd.DataFrame,test_df:pd.DataFrame,n_clusters):
         try:
             logging.info(f"save data based on cluster function started")
 
-            logging.info(f"making k-means object and fitting data")
-            kmeans = KMeans(n_clusters=n_clusters,init='k-means++',random_state=42)
-            kmeans.fit((train_df.drop(self.target_column,axis=1)))
+            cluster_backend = self.data_transform_config.cluster_backend
+            logging.info(f"making {cluster_backend} object and fitting data")
+            kmeans = get_cluster_model(backend=cluster_backend,n_clusters=n_clusters,
+                                       batch_size=self.data_transform_config.cluster_batch_size)
+            if cluster_backend == KMEANS_CLUSTER_BACKEND:
+                kmeans.fit((train_df.drop(self.target_column,axis=1)))
+            else:
+                #the oversampled train frame is already in memory, chunks take its feature columns one slice
+                #at a time instead of a full copy without the target
+                feature_columns = list(train_df.columns.drop(self.target_column))
+                kmeans = fit_cluster_model(cluster_model=kmeans,
+                                           get_chunks=lambda:iter_chunks(X=train_df,
+                                                                         chunk_size=self.data_transform_config.cluster_batch_size,
+                                                                         columns=feature_columns))
 
             logging.info(f"prediction of train data's cluster")
             train_predict = kmeans.predict((train_df.drop(self.target_column,axis=1)))
@@ -187,17 +277,8 @@ class DataTransform:
             logging.info(f"cluster numbers are : {cluster_numbers}")
 
             logging.info(f"making csv file for train data")
-
-            for cluster_number in cluster_numbers:
-                train_file_path = os.path.join(transform_train_folder,'train_cluster'+str(cluster_number)+'.csv')
-                with Path(train_file_path).open('w',newline='') as csvfiles:
-
-                    csvwriter = csv.writer(csvfiles)
-                    csvwriter.writerow(column_name)
-
-                    for index in range(len(train_df)):
-                        if train_predict[index] == cluster_number:
-                            csvwriter.writerow(train_df.iloc[index])
+            self.save_cluster_files(df=train_df,cluster_predict=train_predict,folder=transform_train_folder,
+                                    file_prefix='train_cluster')
 
             logging.info(f"csv files write for train data is completed")
 
@@ -214,17 +295,8 @@ class DataTransform:
             logging.info(f"cluster numbers are : {cluster_numbers}")
 
             logging.info(f"making csv file for test data")
-
-            for cluster_number in cluster_numbers:
-                test_file_path = os.path.join(transform_test_folder,'test_cluster'+str(cluster_number)+'.csv')
-                with Path(test_file_path).open('w',newline='') as csvfiles:
-
-                    csvwriter = csv.writer(csvfiles)
-                    csvwriter.writerow(column_name)
-
-                    for index in range(len(test_df)):
-                        if test_predict[index] == cluster_number:
-                            csvwriter.writerow(test_df.iloc[index])
+            self.save_cluster_files(df=test_df,cluster_predict=test_predict,folder=transform_test_folder,
+                                    file_prefix='test_cluster')
 
             logging.info(f"csv files write for test data is completed")
 
@@ -233,7 +305,7 @@ class DataTransform:
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
-    def intiate_data_transform(self)->DataTransformArtifact:
+    def intiate_data_transform(self,save_graphs:bool=True)->DataTransformArtifact:
         try:
             logging.info(f"intiate data transform function started")
             train_df,test_df = self.perform_drop_column()
@@ -241,29 +313,36 @@ class DataTransform:
             train_df,preprocessing_object = self.perform_preprocessing(df=train_df)
             logging.info(f"saving preprocessing object")
 
-            preprocessing_dir = os.path.dirname(self.data_transform_config.preprocessed_file_path)
-            os.makedirs(preprocessing_dir,exist_ok=True)
-            with open(self.data_transform_config.preprocessed_file_path,'wb') as objfile:
-                dill.dump(preprocessing_object,objfile)
+            save_object(file_path=self.data_transform_config.preprocessed_file_path,obj=preprocessing_object)
 
 
             logging.info(f"preprocessing object saved")
             test_df,pre = self.perform_preprocessing(df=test_df,preprocessing_object=preprocessing_object,is_test_data=True)
 
-            self.get_and_save_graph_cluster(df=train_df)
-            self.get_and_save_silhouette_score_graph(df=train_df)
+            cluster_selection = None
+            n_clusters = self.data_transform_config.n_clusters
+            if n_clusters == AUTO_CLUSTERS:
+                cluster_selection = self.get_and_save_cluster_selection(df=train_df)
+                n_clusters = cluster_selection.n_clusters
+            logging.info(f"number of clusters : {n_clusters}")
             
-            kmeans = self.save_data_based_on_cluster(train_df=train_df,test_df=test_df,n_clusters=NO_CLUSTER)
+            kmeans = self.save_data_based_on_cluster(train_df=train_df,test_df=test_df,n_clusters=n_clusters)
+
+            if save_graphs:
+                self.get_and_save_cluster_graphs(cluster_selection=cluster_selection)
 
             logging.info(f"saving cluster model object")
 
             cluster_dir = os.path.dirname(self.data_transform_config.cluster_model_file_path)
-            os.makedirs(cluster_dir,exist_ok=True)
-            with open(self.data_transform_config.cluster_model_file_path,'wb') as objfile:
-                dill.dump(kmeans,objfile)
+            save_object(file_path=self.data_transform_config.cluster_model_file_path,obj=kmeans)
             
             logging.info(f"cluster object saved")
 
+            export_centroid_router(cluster_model=kmeans,
+                                   X=pd.concat([train_df.drop(self.target_column,axis=1),
+                                                test_df.drop(self.target_column,axis=1)]),
+                                   cluster_model_dir=cluster_dir)
+
 
             data_transform_artifact = DataTransformArtifact(is_transform=True,
                                                             message="successfully",
@@ -3,7 +3,7 @@ from thyroid.logger import logging
 from thyroid.exception import ThyroidException
 from thyroid.entity.config_entity import ModelEvulationConfig
 from thyroid.entity.artifact_entity import ModelTrainerArtifact,ModelEvulationArtifact,DataTransformArtifact
-from thyroid.util.util import read_yaml,write_yaml_file,load_object
+from thyroid.util.util import read_yaml,write_yaml_file,load_object,get_cluster_file_names,read_dataframe
 from thyroid.entity.model_factory import get_evulated_classification_model
 from thyroid.constant import BEST_MODEL_KEY,HISTORY_KEY,MODEL_PATH_KEY
 import pandas as pd
@@ -42,7 +42,9 @@ class ModelEvulation:
             if CLUSTER_NUMBER not in model_evulation_file_content:
                 return model
             
-            model = load_object(model_evulation_file_content[CLUSTER_NUMBER][BEST_MODEL_KEY][MODEL_PATH_KEY])
+            #best models pushed before model bundles are dill pickles, comparing against them is opt in
+            model = load_object(model_evulation_file_content[CLUSTER_NUMBER][BEST_MODEL_KEY][MODEL_PATH_KEY],
+                                allow_legacy_pickle=self.model_evulation_config.allow_legacy_pickle)
 
             return model
 
@@ -96,8 +98,8 @@ class ModelEvulation:
             transform_train_files = self.data_transform_artifact.transform_train_dir
             tranform_test_files = self.data_transform_artifact.transform_test_dir
 
-            train_files = os.listdir(transform_train_files)
-            test_files = os.listdir(tranform_test_files)
+            train_files = get_cluster_file_names(dir_path=transform_train_files)
+            test_files = get_cluster_file_names(dir_path=tranform_test_files)
 
             trained_model_name = os.path.basename(self.model_trainer_artifact.trained_model_path)
             trained_model_dir = os.path.dirname(self.model_trainer_artifact.trained_model_path)
@@ -118,10 +120,10 @@ class ModelEvulation:
                 test_file_path = os.path.join(tranform_test_files,test_file_name)
 
                 logging.info(f"reading train data from the file : {train_file_path}")    
-                train_df = pd.read_csv(train_file_path)
+                train_df = read_dataframe(file_path=train_file_path)
                 logging.info(f"train data reading successfull")
                 logging.info(f"reading test data from the file : {test_file_path}")    
-                test_df = pd.read_csv(test_file_path)
+                test_df = read_dataframe(file_path=test_file_path)
                 logging.info(f"test data reading successfull")
 
                 logging.info("splitting data into input and output feature")
@@ -3,6 +3,9 @@ from thyroid.logger import logging
 from thyroid.exception import ThyroidException
 from thyroid.entity.config_entity import ModelPusherConfig
 from thyroid.entity.artifact_entity import ModelPusherArtifact,ModelEvulationArtifact
+from thyroid.entity.tree_ensemble import export_flat_model
+from thyroid.util.util import load_object
+from thyroid.entity.model_bundle import get_bundle_file_paths
 
 class ModelPusher:
 
@@ -27,8 +30,10 @@ class ModelPusher:
                 train_file_name = os.path.basename(trained_models[cluster_numbers])
                 export_dir_name = os.path.join(export_model_dir,'cluster'+str(cluster_numbers))
                 os.makedirs(export_dir_name,exist_ok=True)
-                shutil.copy(src=trained_models[cluster_numbers],dst=export_dir_name)
+                for file_path in get_bundle_file_paths(file_path=trained_models[cluster_numbers]):
+                    shutil.copy(src=file_path,dst=export_dir_name)
                 export_dir_list.append(os.path.join(export_dir_name,train_file_name))
+                self.export_flat_model(model_path=trained_models[cluster_numbers],export_dir_name=export_dir_name)
 
             logging.info(f"all models are copied")
             model_pusher_artifact = ModelPusherArtifact(export_dir_path=export_dir_list)
@@ -36,6 +41,16 @@ class ModelPusher:
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
+    def export_flat_model(self,model_path:str,export_dir_name:str)->bool:
+        try:
+            #a flat model left by an earlier push is removed even when flattening is turned off
+            if not self.model_pusher_config.flatten_models:
+                return export_flat_model(model=None,export_dir=export_dir_name)
+            logging.info(f"flattening model : {model_path}")
+            return export_flat_model(model=load_object(file_path=model_path),export_dir=export_dir_name)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
     def intiate_model_pusher(self)->ModelPusherArtifact:
         try:
             logging.info(f"intiate model pusher function started")
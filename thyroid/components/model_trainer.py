@@ -1,13 +1,69 @@
-import os,sys,dill
+import os,sys
 from thyroid.logger import logging
 from thyroid.exception import ThyroidException
 from thyroid.entity.config_entity import ModelTrainerConfig
-from thyroid.entity.artifact_entity import DataTransformArtifact,ModelTrainerArtifact
-from thyroid.entity.model_factory import ModelFactory,get_evulated_classification_model,GridSearchedBestModel,MetricInfoArtifact
+from thyroid.entity.artifact_entity import DataTransformArtifact,ModelTrainerArtifact,ClusterModelTrainerArtifact
+from thyroid.entity.model_factory import ModelFactory,get_evulated_classification_model,GridSearchedBestModel,MetricInfoArtifact,\
+    SEARCH_POOL_KEY,N_JOBS_KEY
+from thyroid.util.util import get_cluster_file_names,read_dataframe,save_object,get_process_context
+from concurrent.futures import ProcessPoolExecutor
+from joblib import effective_n_jobs
 import pandas as pd
 import numpy as np
 from typing import List
 
+
+def train_cluster_model(cluster_number:int,train_file_path:str,test_file_path:str,model_config:dict,
+                        base_accuracy:float,trained_model_path:str)->ClusterModelTrainerArtifact:
+    try:
+        logging.info(f"{'>>'*20}cluster : {cluster_number}{'<<'*20}")
+
+        logging.info(f"reading train data from the file : {train_file_path}")
+        train_df = read_dataframe(file_path=train_file_path)
+        logging.info(f"train data reading successfull")
+        logging.info(f"reading test data from the file : {test_file_path}")
+        test_df = read_dataframe(file_path=test_file_path)
+        logging.info(f"test data reading successfull")
+
+        logging.info("splitting data into input and output feature")
+        X_train,y_train,X_test,y_test = train_df.iloc[:,:-1],train_df.iloc[:,-1],test_df.iloc[:,:-1],test_df.iloc[:,-1]
+
+        logging.info(f"intlized of model factory class")
+        model_factory = ModelFactory(config=model_config)
+
+        logging.info(f"finding best model for cluster : {cluster_number}")
+        best_model = model_factory.get_best_model(X=np.array(X_train),y=np.array(y_train),base_accuracy=base_accuracy)
+        logging.info(f"best model on trained data is : {best_model}")
+
+        grid_searched_best_model_list : List[GridSearchedBestModel] = model_factory.grid_searched_best_model_list
+        model_list = [model.best_model for model in grid_searched_best_model_list]
+        logging.info(f"individual best model list : {model_list}")
+
+        logging.info(f"finding best model after evulation on train and test data")
+        metric_info:MetricInfoArtifact=get_evulated_classification_model(X_train=np.array(X_train),y_train=np.array(y_train),
+                                                                X_test=np.array(X_test),
+                                                                    y_test=np.array(y_test),base_accuracy=base_accuracy,model_list=model_list)
+        model_object = metric_info.model_object
+
+        logging.info(f"----------best model after train and test evulation : {model_object} accuracy : {metric_info.model_accuracy}-----------")
+
+        model_name = os.path.basename(trained_model_path)
+        model_dir = os.path.dirname(trained_model_path)
+        cluster_dir = os.path.join(model_dir,'cluster'+str(cluster_number))
+
+        os.makedirs(cluster_dir,exist_ok=True)
+        cluster_path = os.path.join(cluster_dir,model_name)
+
+        save_object(file_path=cluster_path,obj=model_object)
+        logging.info(f"model saved successfully")
+
+        return ClusterModelTrainerArtifact(cluster_number=cluster_number,
+                                           metric_info_artifact=metric_info,
+                                           trained_model_path=cluster_path)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
 class ModelTrainer:
 
     def __init__(self,model_trainer_config:ModelTrainerConfig,
@@ -18,7 +74,32 @@ class ModelTrainer:
             self.data_transform_artifact = data_transform_artifact
         except Exception as e:
             raise ThyroidException(sys,e) from e
-        
+
+    def get_cluster_workers(self,no_clusters:int)->int:
+        try:
+            cluster_workers = self.model_trainer_config.cluster_workers
+            if not cluster_workers or cluster_workers <= 0:
+                cluster_workers = os.cpu_count()
+            return max(1,min(cluster_workers,no_clusters))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_model_config(self,cluster_workers:int)->dict:
+        try:
+            logging.info(f"extracting model config file path")
+            model_config = ModelFactory.read_params(config_path=self.model_trainer_config.model_config_file_path)
+
+            #clusters trained side by side share the cores of the search pool instead of each taking all of them,
+            #a cluster that finishes first leaves its share idle, so the default trains one cluster at a time
+            search_pool_config = dict(model_config.get(SEARCH_POOL_KEY) or {})
+            if cluster_workers > 1:
+                n_jobs = effective_n_jobs(search_pool_config.get(N_JOBS_KEY,1))
+                search_pool_config[N_JOBS_KEY] = max(1,n_jobs//cluster_workers)
+                model_config[SEARCH_POOL_KEY] = search_pool_config
+            return model_config
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
     def intiate_model_trainer(self)->ModelTrainerArtifact:
         try:
             logging.info(f"intiate model trainer function started")
@@ -29,74 +110,39 @@ class ModelTrainer:
             logging.info(f"transform train files : {transform_train_files}")
             logging.info(f"transform test files : {transform_test_files}")
 
-            train_files = list(os.listdir(transform_train_files))
-            test_files = list(os.listdir(transform_test_files))
+            train_files = get_cluster_file_names(dir_path=transform_train_files)
+            test_files = get_cluster_file_names(dir_path=transform_test_files)
 
             logging.info(f"train files are : {train_files}")
             logging.info(f"test files are : {test_files}")
 
-            model_trainer_artifact = None
-
-            train_accuracy = []
-            test_accuracy = []
-            model_accuracy = []
-
-            for cluster_number in range(len(train_files)):
-                logging.info(f"{'>>'*20}cluster : {cluster_number}{'<<'*20}")
-
-                train_file_name = train_files[cluster_number]
-                test_file_name = test_files[cluster_number]
-
-                train_file_path = os.path.join(transform_train_files,train_file_name)
-                test_file_path = os.path.join(transform_test_files,test_file_name)
-
-                logging.info(f"reading train data from the file : {train_file_path}")    
-                train_df = pd.read_csv(train_file_path)
-                logging.info(f"train data reading successfull")
-                logging.info(f"reading test data from the file : {test_file_path}")    
-                test_df = pd.read_csv(test_file_path)
-                logging.info(f"test data reading successfull")
-
-                logging.info("splitting data into input and output feature")
-                X_train,y_train,X_test,y_test = train_df.iloc[:,:-1],train_df.iloc[:,-1],test_df.iloc[:,:-1],test_df.iloc[:,-1]
+            base_accuracy = self.model_trainer_config.base_accuracy
+            logging.info(f"base accuracy is :{base_accuracy}")
 
-                logging.info(f"extracting model config file path")
-                model_config_file_path = self.model_trainer_config.model_config_file_path
-                logging.info(f"intlized of model factory class")
-                model_factory = ModelFactory(config_path=model_config_file_path)
+            cluster_workers = self.get_cluster_workers(no_clusters=len(train_files))
+            model_config = self.get_model_config(cluster_workers=cluster_workers)
+            model_path = self.model_trainer_config.trained_model_file_path
 
-                base_accuracy = self.model_trainer_config.base_accuracy
-                logging.info(f"base accuracy is :{base_accuracy}")
+            cluster_arguments = [(cluster_number,
+                                  os.path.join(transform_train_files,train_files[cluster_number]),
+                                  os.path.join(transform_test_files,test_files[cluster_number]),
+                                  model_config,base_accuracy,model_path) for cluster_number in range(len(train_files))]
 
-                logging.info(f"finding best model for cluster : {cluster_number}")
-                best_model = model_factory.get_best_model(X=np.array(X_train),y=np.array(y_train),base_accuracy=base_accuracy)
-                logging.info(f"best model on trained data is : {best_model}")
+            logging.info(f"training {len(cluster_arguments)} clusters with {cluster_workers} workers")
+            if cluster_workers == 1:
+                cluster_model_trainer_artifacts = [train_cluster_model(*arguments) for arguments in cluster_arguments]
+            else:
+                with ProcessPoolExecutor(max_workers=cluster_workers,mp_context=get_process_context()) as executor:
+                    cluster_model_trainer_artifacts = list(executor.map(train_cluster_model,*zip(*cluster_arguments)))
 
-                grid_searched_best_model_list : List[GridSearchedBestModel] = model_factory.grid_searched_best_model_list
-                model_list = [model.best_model for model in grid_searched_best_model_list]
-                logging.info(f"individual best model list : {model_list}")
-
-                logging.info(f"finding best model after evulation on train and test data")
-                metric_info:MetricInfoArtifact=get_evulated_classification_model(X_train=np.array(X_train),y_train=np.array(y_train),
-                                                                        X_test=np.array(X_test),
-                                                                            y_test=np.array(y_test),base_accuracy=base_accuracy,model_list=model_list)
-                model_object = metric_info.model_object
-
-                logging.info(f"----------best model after train and test evulation : {model_object} accuracy : {metric_info.model_accuracy}-----------")
-
-
-                model_path = self.model_trainer_config.trained_model_file_path
-                model_name = os.path.basename(model_path)
-                model_dir = os.path.dirname(model_path)
-                cluster_dir = os.path.join(model_dir,'cluster'+str(cluster_number))
-
-                os.makedirs(cluster_dir,exist_ok=True)
-                cluster_path = os.path.join(cluster_dir,model_name)
-
-                with open(cluster_path,'wb') as object_file:
-                    dill.dump(model_object,object_file)
-                logging.info(f"model saved successfully")
+            train_accuracy = []
+            test_accuracy = []
+            model_accuracy = []
 
+            for cluster_model_trainer_artifact in cluster_model_trainer_artifacts:
+                metric_info = cluster_model_trainer_artifact.metric_info_artifact
+                logging.info(f"cluster {cluster_model_trainer_artifact.cluster_number} model saved at "
+                             f"{cluster_model_trainer_artifact.trained_model_path}")
                 train_accuracy.append(metric_info.train_accuracy)
                 test_accuracy.append(metric_info.test_accuracy)
                 model_accuracy.append(metric_info.model_accuracy)
@@ -111,6 +157,6 @@ class ModelTrainer:
             return model_trainer_artifact
         except Exception as e:
             raise ThyroidException(sys,e) from e
-        
+
     def __del__(self):
-        logging.info(f"{'>>'*20}Model trainer log completed.{'<<'*20} \n\n")
\ No newline at end of file
+        logging.info(f"{'>>'*20}Model trainer log completed.{'<<'*20} \n\n")
@@ -38,7 +38,8 @@ class Configuration:
             data_ingestion_config = DataIngestionConfig(dataset_download_url=data_download_url,
                                                         raw_data_dir=raw_data_dir,
                                                         ingested_train_dir=ingested_train_data_dir,
-                                                        ingested_test_dir=ingested_test_data_dir)
+                                                        ingested_test_dir=ingested_test_data_dir,
+                                                        artifact_format=self.training_pipeline_config.artifact_format)
 
             logging.info(f"data ingestion config : {data_ingestion_config}")
 
@@ -59,11 +60,17 @@ class Configuration:
             schema_dir = os.path.join(ROOT_DIR,data_validation_config[DATA_VALIDATION_SCHEMA_DIR_KEY],
                                       data_validation_config[DATA_VALIDATION_SCHEMA_FILE_KEY])
             
+            report_file_dir = os.path.join(data_validation_dir,data_validation_config[DATA_VALIDATION_REPORT_FILE_NAME_KEY])
+
             report_dir = os.path.join(data_validation_dir,data_validation_config[DATA_VALIDATION_REPORT_PAGE_FILE_NAME])
 
             data_validation_config = DataValidationConfig(schema_file_dir=schema_dir,
+                                                          report_file_dir=report_file_dir,
                                                           report_page_file_dir=report_dir,
-                                                          report_name=data_validation_config[DATA_VALIDATION_REPORT_PAGE_FILE_NAME])
+                                                          save_report_page=data_validation_config.get(DATA_VALIDATION_SAVE_REPORT_PAGE_KEY,True),
+                                                          report_name=data_validation_config[DATA_VALIDATION_REPORT_PAGE_FILE_NAME],
+                                                          chunk_size=data_validation_config.get(DATA_VALIDATION_CHUNK_SIZE_KEY,
+                                                                                                SCHEMA_VALIDATION_CHUNK_SIZE))
             
             logging.info(f"data validation config : {data_validation_config}")
 
@@ -94,10 +101,26 @@ class Configuration:
                                                   data_transform_config[DATA_TRANSFORM_PREPROCESSED_OBJECT_FILE_NAME_KEY])
             
             data_transform_config = DataTransformConfig(graph_save_dir=graph_dir,
+                                                        artifact_format=self.training_pipeline_config.artifact_format,
                                                         transform_train_dir=transform_train_dir,
                                                         transform_test_dir=transform_test_dir,
                                                         cluster_model_file_path=cluster_model_dir,
-                                                        preprocessed_file_path=preprocessed_model_dir)
+                                                        preprocessed_file_path=preprocessed_model_dir,
+                                                        imputer_mode=data_transform_config[DATA_TRANSFORM_IMPUTER_MODE_KEY],
+                                                        imputer_chunk_size=data_transform_config[DATA_TRANSFORM_IMPUTER_CHUNK_SIZE_KEY],
+                                                        imputer_max_index_mb=data_transform_config.get(
+                                                            DATA_TRANSFORM_IMPUTER_MAX_INDEX_MB_KEY,256),
+                                                        n_clusters=data_transform_config.get(DATA_TRANSFORM_N_CLUSTERS_KEY,NO_CLUSTER),
+                                                        min_clusters=data_transform_config.get(DATA_TRANSFORM_MIN_CLUSTERS_KEY,2),
+                                                        max_clusters=data_transform_config.get(DATA_TRANSFORM_MAX_CLUSTERS_KEY,10),
+                                                        cluster_selection_method=data_transform_config.get(
+                                                            DATA_TRANSFORM_CLUSTER_SELECTION_METHOD_KEY,ELBOW_SELECTION_METHOD),
+                                                        silhouette_sample_size=data_transform_config.get(
+                                                            DATA_TRANSFORM_SILHOUETTE_SAMPLE_SIZE_KEY,10000),
+                                                        cluster_backend=data_transform_config.get(
+                                                            DATA_TRANSFORM_CLUSTER_BACKEND_KEY,KMEANS_CLUSTER_BACKEND),
+                                                        cluster_batch_size=data_transform_config.get(
+                                                            DATA_TRANSFORM_CLUSTER_BATCH_SIZE_KEY,4096))
             logging.info(f"data transform config: {data_transform_config}")
 
             return data_transform_config
@@ -122,7 +145,8 @@ class Configuration:
 
             model_trainer_config = ModelTrainerConfig(base_accuracy=base_accuracy,
                                                       trained_model_file_path=model_file_path,
-                                                      model_config_file_path=model_config_file)
+                                                      model_config_file_path=model_config_file,
+                                                      cluster_workers=model_trainer_config[MODEL_TRAINER_CLUSTER_WORKERS_KEY])
             logging.info(f"model trainer config : {model_trainer_config}")
 
             return model_trainer_config
@@ -139,7 +163,10 @@ class Configuration:
             
             model_evulation_file_path = os.path.join(artifact_dir,MODEL_EVULATION_DIR,model_evulation_config[MODEL_EVULATION_FILE_NAME_KEY])
 
+            allow_legacy_pickle = bool(model_evulation_config.get(MODEL_EVULATION_ALLOW_LEGACY_PICKLE_KEY,False))
+
             model_evulation_config = ModelEvulationConfig(evulation_file_path=model_evulation_file_path,
+                                                          allow_legacy_pickle=allow_legacy_pickle,
                                                           time_stamp=self.current_time_stamp)
             
             logging.info(f"model evulation config : {model_evulation_config}")
@@ -158,7 +185,8 @@ class Configuration:
 
             export_model_dir = os.path.join(artifact_dir,MODEL_PUSHER_DIR,model_pusher_config[MODEL_PUSHER_EXPORT_MODEL_DIR_KEY])
 
-            model_pusher_config = ModelPusherConfig(export_dir_path=export_model_dir)
+            model_pusher_config = ModelPusherConfig(export_dir_path=export_model_dir,
+                                                    flatten_models=model_pusher_config.get(MODEL_PUSHER_FLATTEN_MODELS_KEY,True))
             
             logging.info(f"model pusher config : {model_pusher_config}")
 
@@ -175,7 +203,15 @@ class Configuration:
             artifact_dir = os.path.join(ROOT_DIR,training_pipeline_config[TRINING_PIPELINE_NAME_KEY],
                                         training_pipeline_config[TRAINING_PIPELINE_ARTIFACT_DIR_KEY])
             
-            training_pipeline_config = TrainingPipelineConfig(artifact_dir=artifact_dir)
+            reuse_stage_artifacts = training_pipeline_config.get(TRAINING_PIPELINE_REUSE_STAGE_ARTIFACTS_KEY,False)
+
+            artifact_format = training_pipeline_config.get(TRAINING_PIPELINE_ARTIFACT_FORMAT_KEY,CSV_ARTIFACT_FORMAT)
+            if artifact_format not in ARTIFACT_FORMAT_EXTENSIONS:
+                raise ValueError(f"artifact format {artifact_format} is not one of {list(ARTIFACT_FORMAT_EXTENSIONS)}")
+
+            training_pipeline_config = TrainingPipelineConfig(artifact_dir=artifact_dir,
+                                                              artifact_format=artifact_format,
+                                                              reuse_stage_artifacts=reuse_stage_artifacts)
 
             logging.info(f"training pipeline config : {training_pipeline_config}")
 
@@ -15,8 +15,29 @@ COLUMN_KEY = "columns"
 NUMERIC_COULMN_KEY = "numerical_columns"
 CATEGORICAL_COLUMN_KEY = "categorical_columns"
 TARGET_COLUMN_KEY = "target_column"
+SCHEMA_CONSTRAINT_KEY = "column_constraints"
+ALLOWED_VALUES_KEY = "allowed_values"
+MIN_VALUE_KEY = "min_value"
+MAX_VALUE_KEY = "max_value"
+MISSING_VALUES_KEY = "missing_values"
+SCHEMA_VALIDATION_CHUNK_SIZE = 100000
+
+DRIFT_P_VALUE_THRESHOLD = 0.05
+DRIFT_SHARE_THRESHOLD = 0.5
+DRIFT_HISTOGRAM_BINS = 1000
+PSI_BINS = 10
 
 NO_CLUSTER = 2
+AUTO_CLUSTERS = "auto"
+KMEANS_CLUSTER_BACKEND = "kmeans"
+MINIBATCH_KMEANS_CLUSTER_BACKEND = "minibatch_kmeans"
+ELBOW_SELECTION_METHOD = "elbow"
+SILHOUETTE_SELECTION_METHOD = "silhouette"
+CLUSTER_SCORE_FILE_NAME = "cluster_scores.json"
+CLUSTER_CENTROID_FILE_NAME = "cluster_centroids.npy"
+CLUSTER_CENTROID_INFO_FILE_NAME = "cluster_centroids.json"
+
+TARGET_CLASS_MAPPING = {'negative':0,'compensated_hypothyroid':1,'primary_hypothyroid':2,'secondary_hypothyroid':3}
 
 DROP_COLUMN_LIST = ['TBG','TSH_measured','T3_measured','TT4_measured','T4U_measured','FTI_measured','TBG_measured','FTI']
 
@@ -24,11 +45,35 @@ BEST_MODEL_KEY = "best_model"
 HISTORY_KEY = "history"
 MODEL_PATH_KEY = "model_path"
 
+PREDICTION_BATCH_SIZE = 1000
+PREDICTION_CHUNK_SIZE = 50000
+PREDICTION_COLUMN_NAME = "prediction"
+#files scored through the api are read from and written to this directory only
+SCORING_DIR_ENV = "THYROID_SCORING_DIR"
+SCORING_DIR = os.path.join(ROOT_DIR,"scoring")
+
+TRAINING_JOB_HISTORY_SIZE = 20
+#start methods tried in order for worker process pools, fork is never used
+PROCESS_START_METHODS = ["forkserver","spawn"]
+TRAINING_JOB_FILE_NAME = "training_jobs.json"
+
+CSV_ARTIFACT_FORMAT = "csv"
+PARQUET_ARTIFACT_FORMAT = "parquet"
+FEATHER_ARTIFACT_FORMAT = "feather"
+ARTIFACT_FORMAT_EXTENSIONS = {CSV_ARTIFACT_FORMAT:".csv",PARQUET_ARTIFACT_FORMAT:".parquet",FEATHER_ARTIFACT_FORMAT:".feather"}
+
+FINAL_ARTIFACT_FILE_NAME = "data.json"
+FINAL_ARTIFACT_FILE_PATH = os.path.join(ROOT_DIR,FINAL_ARTIFACT_FILE_NAME)
+#job state shared by every server process, next to data.json
+TRAINING_JOB_FILE_PATH = os.path.join(ROOT_DIR,TRAINING_JOB_FILE_NAME)
+
 #training pipeline related variables
 
 TRAINING_PIPELINE_CONFIG_KEY = "training_pipeline_config"
 TRINING_PIPELINE_NAME_KEY = "pipeline_name"
 TRAINING_PIPELINE_ARTIFACT_DIR_KEY = "artifact_dir"
+TRAINING_PIPELINE_ARTIFACT_FORMAT_KEY = "artifact_format"
+TRAINING_PIPELINE_REUSE_STAGE_ARTIFACTS_KEY = "reuse_stage_artifacts"
 
 #data ingestion related variables
 
@@ -47,6 +92,9 @@ DATA_VALIDATION_DIR = "data_validation"
 DATA_VALIDATION_SCHEMA_DIR_KEY = "schema_dir"
 DATA_VALIDATION_SCHEMA_FILE_KEY = "schema_file"
 DATA_VALIDATION_REPORT_PAGE_FILE_NAME = "report_page_file_name"
+DATA_VALIDATION_CHUNK_SIZE_KEY = "chunk_size"
+DATA_VALIDATION_REPORT_FILE_NAME_KEY = "report_file_name"
+DATA_VALIDATION_SAVE_REPORT_PAGE_KEY = "save_report_page"
 
 #data transform related varibales
 
@@ -59,6 +107,18 @@ DATA_TRANSFORM_PREPROCESSED_OBJECT_DIR_KEY = "preprocessed_object_dir"
 DATA_TRANSFORM_PREPROCESSED_OBJECT_FILE_NAME_KEY = "preprocessed_object_file_name"
 DATA_TRANSFORM_CLUSTER_MODEL_DIR_KEY = "cluster_model_dir"
 DATA_TRANSFORM_CLUSTER_MODEL_NAME_KEY = "cluster_model_name"
+DATA_TRANSFORM_IMPUTER_MODE_KEY = "imputer_mode"
+DATA_TRANSFORM_IMPUTER_CHUNK_SIZE_KEY = "imputer_chunk_size"
+DATA_TRANSFORM_IMPUTER_MAX_INDEX_MB_KEY = "imputer_max_index_mb"
+DATA_TRANSFORM_N_CLUSTERS_KEY = "n_clusters"
+DATA_TRANSFORM_CLUSTER_BACKEND_KEY = "cluster_backend"
+DATA_TRANSFORM_CLUSTER_BATCH_SIZE_KEY = "cluster_batch_size"
+DATA_TRANSFORM_MIN_CLUSTERS_KEY = "min_clusters"
+DATA_TRANSFORM_MAX_CLUSTERS_KEY = "max_clusters"
+DATA_TRANSFORM_CLUSTER_SELECTION_METHOD_KEY = "cluster_selection_method"
+DATA_TRANSFORM_SILHOUETTE_SAMPLE_SIZE_KEY = "silhouette_sample_size"
+
+INDEXED_IMPUTER_MODE = "indexed"
 
 #model trainer related variables
 
@@ -68,15 +128,27 @@ MODEL_TRAINER_MODEL_FILE_NAME_KEY = "moddel_file_name"
 MODEL_TRAINER_BASE_ACCURACY_KEY = "base_acuracy"
 MODEL_TRAINER_MODEL_CONFIG_DIR_KEY = "model_config_dir"
 MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY = "model_config_file_name"
+MODEL_TRAINER_CLUSTER_WORKERS_KEY = "cluster_workers"
 
 #model evulation related variables
 
 MODEL_EVULATION_CONFIG_KEY = "model_evulation_config"
 MODEL_EVULATION_DIR = "model_evulation"
 MODEL_EVULATION_FILE_NAME_KEY = "model_evulation_file_name"
+MODEL_EVULATION_ALLOW_LEGACY_PICKLE_KEY = "allow_legacy_pickle"
 
 #model pusher related variables
 
 MODEL_PUSHER_CONFIG_KEY = "model_pusher_config"
 MODEL_PUSHER_DIR = "model_pusher"
-MODEL_PUSHER_EXPORT_MODEL_DIR_KEY = "model_export_dir"
\ No newline at end of file
+MODEL_PUSHER_EXPORT_MODEL_DIR_KEY = "model_export_dir"
+MODEL_PUSHER_FLATTEN_MODELS_KEY = "flatten_models"
+FLAT_MODEL_DIR_NAME = "flat_model"
+FLAT_MODEL_INFO_FILE_NAME = "flat_model.json"
+MODEL_BUNDLE_FORMAT = "joblib"
+MODEL_BUNDLE_FORMAT_VERSION = 2
+MODEL_MANIFEST_SUFFIX = ".manifest.json"
+#manifests are signed with a key kept outside the artifact directory
+MODEL_BUNDLE_KEY_FILE_ENV = "THYROID_BUNDLE_KEY_FILE"
+MODEL_BUNDLE_KEY_FILE_PATH = os.path.join(os.path.expanduser("~"),".thyroid","bundle.key")
+MODEL_BUNDLE_KEY_SIZE = 32
\ No newline at end of file
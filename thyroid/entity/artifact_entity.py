@@ -13,9 +13,13 @@ ModelTrainerArtifact = namedtuple("ModelArtifactConfig",
                                 ["is_trained","message","trained_model_path","train_accuracy","test_accuracy",
                                  "model_accuracy"])
 
+ClusterModelTrainerArtifact = namedtuple("ClusterModelTrainerArtifact",["cluster_number","metric_info_artifact","trained_model_path"])
+
 ModelEvulationArtifact = namedtuple("ModelEvulationConfig",
                                   ["is_model_accepted","evulation_model_file_path"])
 
 ModelPusherArtifact = namedtuple("ModelPusherArtifact",["export_dir_path"])
 
-FinalArtifact = namedtuple("FinalArtifact",["ingested_train_data","cluster_model_path","export_dir_path","preprocessing_dir"])
\ No newline at end of file
+FinalArtifact = namedtuple("FinalArtifact",["ingested_train_data","cluster_model_path","export_dir_path","preprocessing_dir"])
+
+BatchScoringArtifact = namedtuple("BatchScoringArtifact",["input_file_path","output_file_path","row_count","chunk_count"])
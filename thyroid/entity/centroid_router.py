@@ -0,0 +1,98 @@
+import os,sys,json
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import CLUSTER_CENTROID_FILE_NAME,CLUSTER_CENTROID_INFO_FILE_NAME
+import pandas as pd
+import numpy as np
+
+
+def get_centroid_file_paths(cluster_model_dir:str):
+    return (os.path.join(cluster_model_dir,CLUSTER_CENTROID_FILE_NAME),
+            os.path.join(cluster_model_dir,CLUSTER_CENTROID_INFO_FILE_NAME))
+
+
+#nearest centroid assignment from the exported centers only, it computes the same
+#|c|^2 - 2x.c distance KMeans.predict uses (|x|^2 is the same for every center and is left out)
+#and takes the first smallest one, so the serving path does not unpickle the sklearn model
+class CentroidRouter:
+
+    def __init__(self,centroids:np.ndarray,feature_names:list=None) -> None:
+        try:
+            self.centroids = centroids
+            self.feature_names = feature_names
+            self.centroid_squared_norms = np.einsum('ij,ij->i',centroids,centroids)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @property
+    def n_clusters(self)->int:
+        return len(self.centroids)
+
+    def get_input_array(self,X)->np.ndarray:
+        try:
+            if isinstance(X,pd.DataFrame) and self.feature_names is not None \
+                    and list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            return np.asarray(X,dtype=self.centroids.dtype)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def predict(self,X)->np.ndarray:
+        try:
+            X = self.get_input_array(X=X)
+            distances = self.centroid_squared_norms-2*(X@self.centroids.T)
+            return np.argmin(distances,axis=1).astype(np.int32)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @classmethod
+    def from_cluster_model(cls,cluster_model):
+        try:
+            feature_names = getattr(cluster_model,'feature_names_in_',None)
+            return cls(centroids=np.ascontiguousarray(cluster_model.cluster_centers_,dtype='float64'),
+                       feature_names=None if feature_names is None else [str(name) for name in feature_names])
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def save(self,cluster_model_dir:str):
+        try:
+            centroid_file_path,centroid_info_file_path = get_centroid_file_paths(cluster_model_dir=cluster_model_dir)
+            os.makedirs(cluster_model_dir,exist_ok=True)
+            np.save(centroid_file_path,self.centroids,allow_pickle=False)
+            with open(centroid_info_file_path,'w') as json_file:
+                json.dump({"n_clusters":self.n_clusters,"feature_names":self.feature_names},json_file,indent=2)
+            logging.info(f"{self.n_clusters} cluster centroids saved at {centroid_file_path}")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @classmethod
+    def load(cls,cluster_model_dir:str):
+        try:
+            #returns None when the centroids were not exported, the caller falls back to the pickled model
+            centroid_file_path,centroid_info_file_path = get_centroid_file_paths(cluster_model_dir=cluster_model_dir)
+            if not (os.path.exists(centroid_file_path) and os.path.exists(centroid_info_file_path)):
+                return None
+            with open(centroid_info_file_path,'r') as json_file:
+                centroid_info = json.load(json_file)
+            centroids = np.load(centroid_file_path,mmap_mode='r',allow_pickle=False)
+            return cls(centroids=centroids,feature_names=centroid_info["feature_names"])
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+def export_centroid_router(cluster_model,X,cluster_model_dir:str)->bool:
+    try:
+        #the router is only exported when it assigns every row of X to the cluster the model does,
+        #otherwise serving keeps using the pickled model
+        centroid_router = CentroidRouter.from_cluster_model(cluster_model=cluster_model)
+        mismatched_rows = int(np.count_nonzero(centroid_router.predict(X)!=np.asarray(cluster_model.predict(X))))
+        if mismatched_rows:
+            logging.info(f"centroid router differs from the cluster model on {mismatched_rows} rows, not exported")
+            for file_path in get_centroid_file_paths(cluster_model_dir=cluster_model_dir):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            return False
+        centroid_router.save(cluster_model_dir=cluster_model_dir)
+        return True
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
@@ -0,0 +1,62 @@
+import sys
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import KMEANS_CLUSTER_BACKEND,MINIBATCH_KMEANS_CLUSTER_BACKEND
+from sklearn.cluster import KMeans,MiniBatchKMeans
+from sklearn.utils import check_random_state
+import pandas as pd
+import numpy as np
+
+CLUSTER_BACKENDS = [KMEANS_CLUSTER_BACKEND,MINIBATCH_KMEANS_CLUSTER_BACKEND]
+
+
+def get_cluster_model(backend:str,n_clusters:int,batch_size:int=4096,random_state:int=42):
+    try:
+        if backend == KMEANS_CLUSTER_BACKEND:
+            return KMeans(n_clusters=n_clusters,init='k-means++',random_state=random_state)
+        if backend == MINIBATCH_KMEANS_CLUSTER_BACKEND:
+            return MiniBatchKMeans(n_clusters=n_clusters,init='k-means++',batch_size=batch_size,
+                                   n_init=3,random_state=random_state)
+        raise ValueError(f"cluster backend {backend} is not one of {CLUSTER_BACKENDS}")
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_chunks(X,chunk_size:int,random_state:int=42,columns:list=None):
+    try:
+        #chunks of an array or frame in a shuffled order, the rows of a frame sorted by class would
+        #otherwise reach the model one class at a time. columns picks the columns of a frame chunk by
+        #chunk, so the caller does not copy the whole frame to drop the target
+        chunk_starts = np.arange(0,len(X),chunk_size)
+        column_positions = None if columns is None else X.columns.get_indexer(columns)
+        for start in check_random_state(random_state).permutation(chunk_starts):
+            if not isinstance(X,pd.DataFrame):
+                yield X[start:start+chunk_size]
+            elif column_positions is None:
+                yield X.iloc[start:start+chunk_size]
+            else:
+                yield X.iloc[start:start+chunk_size,column_positions]
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def fit_cluster_model(cluster_model,get_chunks,n_passes:int=3):
+    try:
+        #KMeans needs all rows at once, MiniBatchKMeans is fitted from chunks with partial_fit. only the fit
+        #is incremental: the chunks are slices of rows the caller already holds in memory (the transform stage
+        #oversamples its train frame in memory), what stays bounded is the per chunk distance work and copies.
+        #get_chunks returns a new iterator of arrays or frames for every pass
+        if not isinstance(cluster_model,MiniBatchKMeans):
+            chunks = list(get_chunks())
+            return cluster_model.fit(pd.concat(chunks) if isinstance(chunks[0],pd.DataFrame) else np.concatenate(chunks))
+
+        for n_pass in range(n_passes):
+            n_rows = 0
+            for chunk in get_chunks():
+                #the first call sets the centers with k-means++ on its chunk, it needs n_clusters rows
+                if not hasattr(cluster_model,'cluster_centers_') and len(chunk) < cluster_model.n_clusters:
+                    continue
+                cluster_model.partial_fit(chunk)
+                n_rows += len(chunk)
+            logging.info(f"cluster pass {n_pass+1} of {n_passes} over {n_rows} rows")
+        return cluster_model
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
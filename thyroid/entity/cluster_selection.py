@@ -0,0 +1,114 @@
+import sys
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import ELBOW_SELECTION_METHOD,SILHOUETTE_SELECTION_METHOD,KMEANS_CLUSTER_BACKEND
+from thyroid.entity.cluster_model import get_cluster_model
+from sklearn.metrics import silhouette_score,silhouette_samples
+from sklearn.utils import check_random_state
+from joblib import Parallel,delayed
+from collections import namedtuple
+from typing import List
+import numpy as np
+
+ClusterScore = namedtuple("ClusterScore",["n_clusters","inertia","silhouette_score"])
+
+ClusterSelectionResult = namedtuple("ClusterSelectionResult",["n_clusters","method","scores"])
+
+
+def get_sample_index(n_rows:int,sample_size:int,random_state:int)->np.ndarray:
+    try:
+        if sample_size is None or n_rows <= sample_size:
+            return np.arange(n_rows)
+        return np.sort(check_random_state(random_state).choice(n_rows,size=sample_size,replace=False))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def fit_cluster_candidate(X:np.ndarray,n_clusters:int,sample_index:np.ndarray,random_state:int,
+                          backend:str=KMEANS_CLUSTER_BACKEND,batch_size:int=4096)->ClusterScore:
+    try:
+        kmeans = get_cluster_model(backend=backend,n_clusters=n_clusters,batch_size=batch_size,random_state=random_state)
+        labels = kmeans.fit_predict(X)
+        #silhouette is quadratic in rows, it is computed on a fixed sample shared by every candidate
+        sample_labels = labels[sample_index]
+        score = silhouette_score(X[sample_index],sample_labels) if len(np.unique(sample_labels)) > 1 else -1.0
+        return ClusterScore(n_clusters=n_clusters,inertia=float(kmeans.inertia_),silhouette_score=float(score))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_silhouette_samples(X:np.ndarray,n_clusters:int,sample_index:np.ndarray,random_state:int,
+                           backend:str=KMEANS_CLUSTER_BACKEND,batch_size:int=4096):
+    try:
+        #returns (labels, silhouette value) of the sampled rows
+        kmeans = get_cluster_model(backend=backend,n_clusters=n_clusters,batch_size=batch_size,random_state=random_state)
+        labels = kmeans.fit_predict(X)
+        return labels[sample_index],silhouette_samples(X[sample_index],labels[sample_index])
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_elbow(scores:List[ClusterScore])->int:
+    try:
+        #the k furthest below the straight line from the first to the last inertia, both axes scaled to [0,1]
+        n_clusters = np.array([score.n_clusters for score in scores],dtype='float64')
+        inertia = np.array([score.inertia for score in scores],dtype='float64')
+        if len(scores) < 3 or inertia[0] == inertia[-1]:
+            return int(n_clusters[0])
+        x = (n_clusters-n_clusters[0])/(n_clusters[-1]-n_clusters[0])
+        y = (inertia-inertia[-1])/(inertia[0]-inertia[-1])
+        return int(n_clusters[np.argmax((1-x)-y)])
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#fits every candidate number of clusters in parallel and picks one by the elbow of the inertia curve
+#or by the best sampled silhouette score
+class ClusterSelector:
+
+    def __init__(self,min_clusters:int=2,max_clusters:int=10,method:str=ELBOW_SELECTION_METHOD,
+                 sample_size:int=10000,n_jobs:int=-1,random_state:int=42,
+                 backend:str=KMEANS_CLUSTER_BACKEND,batch_size:int=4096) -> None:
+        try:
+            if method not in (ELBOW_SELECTION_METHOD,SILHOUETTE_SELECTION_METHOD):
+                raise ValueError(f"cluster selection method {method} is not {ELBOW_SELECTION_METHOD} or {SILHOUETTE_SELECTION_METHOD}")
+            if min_clusters < 2 or max_clusters < min_clusters:
+                raise ValueError(f"cluster range {min_clusters} to {max_clusters} is not valid")
+            self.min_clusters = min_clusters
+            self.max_clusters = max_clusters
+            self.method = method
+            self.sample_size = sample_size
+            self.n_jobs = n_jobs
+            self.random_state = random_state
+            self.backend = backend
+            self.batch_size = batch_size
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_sample_index(self,X:np.ndarray)->np.ndarray:
+        return get_sample_index(n_rows=len(X),sample_size=self.sample_size,random_state=self.random_state)
+
+    def get_scores(self,X:np.ndarray)->List[ClusterScore]:
+        try:
+            X = np.asarray(X,dtype='float64')
+            max_clusters = min(self.max_clusters,len(X)-1)
+            sample_index = self.get_sample_index(X=X)
+            logging.info(f"fitting {self.min_clusters} to {max_clusters} clusters on {len(X)} rows, "
+                         f"silhouette on {len(sample_index)} rows")
+            scores = Parallel(n_jobs=self.n_jobs)(delayed(fit_cluster_candidate)(X,n_clusters,sample_index,self.random_state,
+                                                                                 self.backend,self.batch_size)
+                                                  for n_clusters in range(self.min_clusters,max_clusters+1))
+            for score in scores:
+                logging.info(f"{score}")
+            return scores
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def select(self,X:np.ndarray)->ClusterSelectionResult:
+        try:
+            scores = self.get_scores(X=X)
+            if self.method == SILHOUETTE_SELECTION_METHOD:
+                n_clusters = max(scores,key=lambda score:score.silhouette_score).n_clusters
+            else:
+                n_clusters = get_elbow(scores=scores)
+            logging.info(f"{n_clusters} clusters selected by {self.method}")
+            return ClusterSelectionResult(n_clusters=n_clusters,method=self.method,scores=scores)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
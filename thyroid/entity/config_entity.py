@@ -1,21 +1,24 @@
 from collections import namedtuple
 
 DataIngestionConfig = namedtuple("DataIngestionConfig",
-                                 ["dataset_download_url","raw_data_dir","ingested_train_dir","ingested_test_dir"])
+                                 ["dataset_download_url","raw_data_dir","ingested_train_dir","ingested_test_dir","artifact_format"])
 
 DataValidationConfig = namedtuple("DataValidationConfig",
-                                  ["schema_file_dir","report_page_file_dir","report_name"])
+                                  ["schema_file_dir","report_file_dir","report_page_file_dir","report_name",
+                                   "save_report_page","chunk_size"])
 
 DataTransformConfig = namedtuple("DataTransformConfig",
-                                 ["graph_save_dir","transform_train_dir","transform_test_dir","preprocessed_file_path","cluster_model_file_path"])
+                                 ["graph_save_dir","transform_train_dir","transform_test_dir","preprocessed_file_path","cluster_model_file_path",
+                                  "imputer_mode","imputer_chunk_size","imputer_max_index_mb","artifact_format","n_clusters","min_clusters","max_clusters",
+                                  "cluster_selection_method","silhouette_sample_size","cluster_backend","cluster_batch_size"])
 
 ModelTrainerConfig = namedtuple("ModelTrainerConfig",["trained_model_file_path","base_accuracy",
-                                                      "model_config_file_path"])
+                                                      "model_config_file_path","cluster_workers"])
 
-ModelEvulationConfig = namedtuple("ModelEvulationConfig",["evulation_file_path","time_stamp"])
+ModelEvulationConfig = namedtuple("ModelEvulationConfig",["evulation_file_path","allow_legacy_pickle","time_stamp"])
 
 ModelPusherConfig = namedtuple("ModelPusherConfig",
-                               ["export_dir_path"])
+                               ["export_dir_path","flatten_models"])
 
 
-TrainingPipelineConfig = namedtuple("TrainingPipelineConfig",["artifact_dir"])
\ No newline at end of file
+TrainingPipelineConfig = namedtuple("TrainingPipelineConfig",["artifact_dir","artifact_format","reuse_stage_artifacts"])
\ No newline at end of file
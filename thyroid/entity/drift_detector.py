@@ -0,0 +1,216 @@
+import os,sys,json,html
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import COLUMN_KEY,NUMERIC_COULMN_KEY,SCHEMA_CONSTRAINT_KEY,MIN_VALUE_KEY,MAX_VALUE_KEY,\
+    SCHEMA_VALIDATION_CHUNK_SIZE,DRIFT_P_VALUE_THRESHOLD,DRIFT_SHARE_THRESHOLD,DRIFT_HISTOGRAM_BINS,PSI_BINS
+from thyroid.util.util import iter_dataframe_chunks
+from scipy.stats import chi2_contingency,kstwobign
+import pandas as pd
+import numpy as np
+
+NUMERIC_COLUMN_TYPE = "numeric"
+CATEGORICAL_COLUMN_TYPE = "categorical"
+MISSING_CATEGORY = "<missing>"
+PSI_EPSILON = 1e-4
+
+
+def get_numeric_values(values:pd.Series)->np.ndarray:
+    try:
+        #text columns repeat few distinct values, only those are parsed
+        if pd.api.types.is_numeric_dtype(values):
+            return values.to_numpy(dtype='float64',na_value=np.nan)
+        codes,uniques = pd.factorize(values)
+        numeric_uniques = pd.to_numeric(pd.Series(uniques,dtype=object),errors='coerce').to_numpy(dtype='float64')
+        #code -1 marks a missing value and picks the appended nan
+        numeric_uniques = np.append(numeric_uniques,np.nan)
+        return numeric_uniques[codes]
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_psi(reference_counts:np.ndarray,current_counts:np.ndarray)->float:
+    try:
+        reference_share = np.clip(reference_counts/max(reference_counts.sum(),1),PSI_EPSILON,None)
+        current_share = np.clip(current_counts/max(current_counts.sum(),1),PSI_EPSILON,None)
+        return float(np.sum((current_share-reference_share)*np.log(current_share/reference_share)))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_psi_bins(reference_counts:np.ndarray,n_bins:int)->np.ndarray:
+    try:
+        #merges the fine histogram into about n_bins bins holding equal shares of the reference data,
+        #returns the fine bin index each merged bin starts at, a merged bin ends at the first fine bin
+        #whose cumulative share reaches its target
+        cumulative_share = np.cumsum(reference_counts)/max(reference_counts.sum(),1)
+        bin_starts = np.searchsorted(cumulative_share,np.linspace(0,1,n_bins+1)[1:-1]-1e-12,side='left')+1
+        return np.unique(np.concatenate([[0],bin_starts[bin_starts < len(reference_counts)]]))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#drift of every schema column between a reference (train) and current (test) file from chunked scans:
+#categorical columns are compared on category counts with chi-square, numeric columns on a fine
+#histogram over the common value range with the two sample KS statistic, PSI is given for both
+class DataDriftDetector:
+
+    def __init__(self,schema_file_data:dict,chunk_size:int=SCHEMA_VALIDATION_CHUNK_SIZE,
+                 p_value_threshold:float=DRIFT_P_VALUE_THRESHOLD,drift_share_threshold:float=DRIFT_SHARE_THRESHOLD,
+                 histogram_bins:int=DRIFT_HISTOGRAM_BINS,psi_bins:int=PSI_BINS) -> None:
+        try:
+            #lab values are stored as text because of their missing value marker, a column with a
+            #range constraint is compared as a number like the numerical columns
+            column_constraints = schema_file_data.get(SCHEMA_CONSTRAINT_KEY) or {}
+            self.columns = list(schema_file_data[COLUMN_KEY])
+            self.numeric_columns = [column for column in self.columns
+                                    if column in schema_file_data[NUMERIC_COULMN_KEY]
+                                    or MIN_VALUE_KEY in column_constraints.get(column,{})
+                                    or MAX_VALUE_KEY in column_constraints.get(column,{})]
+            self.categorical_columns = [column for column in self.columns if column not in self.numeric_columns]
+            self.chunk_size = chunk_size
+            self.p_value_threshold = p_value_threshold
+            self.drift_share_threshold = drift_share_threshold
+            self.histogram_bins = histogram_bins
+            self.psi_bins = psi_bins
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_column_summary(self,file_path:str):
+        try:
+            #returns (rows, category counts per categorical column, (min, max) per numeric column)
+            row_count = 0
+            category_counts = {column:pd.Series(dtype='int64') for column in self.categorical_columns}
+            value_range = {column:(np.inf,-np.inf) for column in self.numeric_columns}
+            for df in iter_dataframe_chunks(file_path=file_path,chunk_size=self.chunk_size,columns=self.columns):
+                row_count += len(df)
+                for column in self.categorical_columns:
+                    counts = df[column].value_counts(dropna=False)
+                    counts.index = [MISSING_CATEGORY if pd.isna(value) else str(value) for value in counts.index]
+                    category_counts[column] = category_counts[column].add(counts.groupby(level=0).sum(),fill_value=0)
+                for column in self.numeric_columns:
+                    values = get_numeric_values(df[column])
+                    if np.isfinite(values).any():
+                        value_range[column] = (min(value_range[column][0],np.nanmin(values)),
+                                               max(value_range[column][1],np.nanmax(values)))
+            return row_count,category_counts,value_range
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_histograms(self,file_path:str,bin_edges:dict)->dict:
+        try:
+            histograms = {column:np.zeros(len(edges)-1,dtype='int64') for column,edges in bin_edges.items()}
+            if not bin_edges:
+                return histograms
+            for df in iter_dataframe_chunks(file_path=file_path,chunk_size=self.chunk_size,columns=list(bin_edges)):
+                for column,edges in bin_edges.items():
+                    values = get_numeric_values(df[column])
+                    histograms[column] += np.histogram(values[np.isfinite(values)],bins=edges)[0]
+            return histograms
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_categorical_drift(self,reference_counts:pd.Series,current_counts:pd.Series)->dict:
+        try:
+            categories = reference_counts.index.union(current_counts.index)
+            table = np.array([reference_counts.reindex(categories,fill_value=0).to_numpy(),
+                              current_counts.reindex(categories,fill_value=0).to_numpy()],dtype='float64')
+            table = table[:,table.sum(axis=0) > 0]
+            statistic,p_value = 0.0,1.0
+            if table.shape[1] > 1 and (table.sum(axis=1) > 0).all():
+                statistic,p_value,_,_ = chi2_contingency(table)
+            return {"column_type":CATEGORICAL_COLUMN_TYPE,"test":"chi_square",
+                    "statistic":float(statistic),"p_value":float(p_value),
+                    "psi":get_psi(table[0],table[1]),"categories":int(table.shape[1])}
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_numeric_drift(self,reference_counts:np.ndarray,current_counts:np.ndarray)->dict:
+        try:
+            reference_rows,current_rows = reference_counts.sum(),current_counts.sum()
+            statistic,p_value = 0.0,1.0
+            if reference_rows and current_rows:
+                statistic = float(np.max(np.abs(np.cumsum(reference_counts)/reference_rows
+                                                -np.cumsum(current_counts)/current_rows)))
+                effective_rows = np.sqrt(reference_rows*current_rows/(reference_rows+current_rows))
+                p_value = float(kstwobign.sf(effective_rows*statistic))
+            bin_starts = get_psi_bins(reference_counts=reference_counts,n_bins=self.psi_bins)
+            psi = get_psi(np.add.reduceat(reference_counts,bin_starts),np.add.reduceat(current_counts,bin_starts))
+            return {"column_type":NUMERIC_COLUMN_TYPE,"test":"kolmogorov_smirnov",
+                    "statistic":statistic,"p_value":p_value,"psi":psi,
+                    "reference_values":int(reference_rows),"current_values":int(current_rows)}
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_drift_report(self,reference_file_path:str,current_file_path:str)->dict:
+        try:
+            logging.info(f"drift of {current_file_path} against {reference_file_path} started")
+            reference_rows,reference_category_counts,reference_range = self.get_column_summary(file_path=reference_file_path)
+            current_rows,current_category_counts,current_range = self.get_column_summary(file_path=current_file_path)
+
+            bin_edges = dict()
+            for column in self.numeric_columns:
+                low = min(reference_range[column][0],current_range[column][0])
+                high = max(reference_range[column][1],current_range[column][1])
+                if np.isfinite(low) and np.isfinite(high):
+                    bin_edges[column] = np.linspace(low,high if high > low else low+1,self.histogram_bins+1)
+            reference_histograms = self.get_histograms(file_path=reference_file_path,bin_edges=bin_edges)
+            current_histograms = self.get_histograms(file_path=current_file_path,bin_edges=bin_edges)
+
+            columns = dict()
+            for column in self.columns:
+                if column in self.categorical_columns:
+                    column_drift = self.get_categorical_drift(reference_counts=reference_category_counts[column],
+                                                              current_counts=current_category_counts[column])
+                elif column in bin_edges:
+                    column_drift = self.get_numeric_drift(reference_counts=reference_histograms[column],
+                                                          current_counts=current_histograms[column])
+                else:
+                    logging.info(f"{column} has no numeric values, drift is not computed")
+                    continue
+                column_drift["drift_detected"] = column_drift["p_value"] < self.p_value_threshold
+                columns[column] = column_drift
+
+            drifted_columns = sum(column_drift["drift_detected"] for column_drift in columns.values())
+            drift_share = drifted_columns/len(columns) if columns else 0.0
+            report = {"reference_file_path":reference_file_path,"current_file_path":current_file_path,
+                      "reference_rows":int(reference_rows),"current_rows":int(current_rows),
+                      "p_value_threshold":self.p_value_threshold,"number_of_columns":len(columns),
+                      "number_of_drifted_columns":int(drifted_columns),"drift_share":drift_share,
+                      "dataset_drift":bool(drift_share >= self.drift_share_threshold),"columns":columns}
+            logging.info(f"{drifted_columns} of {len(columns)} columns drifted, dataset drift : {report['dataset_drift']}")
+            return report
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @staticmethod
+    def save_report(report:dict,report_file_path:str):
+        try:
+            os.makedirs(os.path.dirname(report_file_path),exist_ok=True)
+            with open(report_file_path,'w') as json_file:
+                json.dump(report,json_file,indent=2)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @staticmethod
+    def save_report_page(report:dict,report_page_file_path:str):
+        try:
+            rows = []
+            for column,column_drift in report["columns"].items():
+                style = ' style="background:#f8d7da"' if column_drift["drift_detected"] else ''
+                rows.append(f'<tr{style}><td>{html.escape(column)}</td><td>{column_drift["column_type"]}</td>'
+                            f'<td>{column_drift["test"]}</td><td>{column_drift["statistic"]:.4f}</td>'
+                            f'<td>{column_drift["p_value"]:.4g}</td><td>{column_drift["psi"]:.4f}</td>'
+                            f'<td>{"yes" if column_drift["drift_detected"] else "no"}</td></tr>')
+            page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Data drift report</title></head><body>'
+                    f'<h1>Data drift report</h1>'
+                    f'<p>reference : {html.escape(report["reference_file_path"])} ({report["reference_rows"]} rows)<br>'
+                    f'current : {html.escape(report["current_file_path"])} ({report["current_rows"]} rows)</p>'
+                    f'<p>{report["number_of_drifted_columns"]} of {report["number_of_columns"]} columns drifted '
+                    f'(p value below {report["p_value_threshold"]}), dataset drift : '
+                    f'{"yes" if report["dataset_drift"] else "no"}</p>'
+                    f'<table border="1" cellpadding="4" style="border-collapse:collapse">'
+                    f'<tr><th>column</th><th>type</th><th>test</th><th>statistic</th><th>p value</th><th>psi</th>'
+                    f'<th>drift</th></tr>{"".join(rows)}</table></body></html>')
+            os.makedirs(os.path.dirname(report_page_file_path),exist_ok=True)
+            with open(report_page_file_path,'w') as html_file:
+                html_file.write(page)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
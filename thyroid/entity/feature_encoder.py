@@ -0,0 +1,71 @@
+import sys
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import DROP_COLUMN_LIST
+from typing import List
+import pandas as pd
+import numpy as np
+
+SEX_COLUMN = 'sex'
+SEX_MAPPING = {'F':0,'M':1}
+BINARY_MAPPING = {'f':0,'t':1}
+ONE_HOT_COLUMN = 'referral_source'
+MISSING_VALUE = '?'
+
+
+class FeatureEncoder:
+
+    def __init__(self,target_column:List[str]=None) -> None:
+        try:
+            self.target_column = list(target_column) if target_column is not None else []
+            self.binary_columns = None
+            self.one_hot_columns = None
+            self.feature_columns = None
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_input_columns(self,df:pd.DataFrame)->List[str]:
+        try:
+            drop_columns = set(DROP_COLUMN_LIST)|set(self.target_column)
+            return [column for column in df.columns if column not in drop_columns]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def fit(self,df:pd.DataFrame):
+        try:
+            logging.info(f"feature encoder fit function started")
+            input_columns = self.get_input_columns(df=df)
+
+            #same rule as training column mapping, columns having exactly two values are f/t flags
+            self.binary_columns = [column for column in input_columns
+                                   if column not in (SEX_COLUMN,ONE_HOT_COLUMN) and len(df[column].unique())==2]
+
+            #get_dummies orders categories and drops the first one
+            categories = sorted(df[ONE_HOT_COLUMN].dropna().unique())
+            self.one_hot_columns = {f"{ONE_HOT_COLUMN}_{category}":category for category in categories[1:]}
+
+            self.feature_columns = [column for column in input_columns if column != ONE_HOT_COLUMN]+list(self.one_hot_columns)
+
+            logging.info(f"binary columns : {self.binary_columns}")
+            logging.info(f"one hot columns : {self.one_hot_columns}")
+            logging.info(f"feature columns : {self.feature_columns}")
+            return self
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        try:
+            columns = {}
+            for column in self.feature_columns:
+                if column in self.binary_columns:
+                    columns[column] = df[column].map(BINARY_MAPPING)
+                elif column == SEX_COLUMN:
+                    columns[column] = df[column].map(SEX_MAPPING)
+                elif column in self.one_hot_columns:
+                    columns[column] = (df[ONE_HOT_COLUMN]==self.one_hot_columns[column]).astype(np.uint8)
+                else:
+                    columns[column] = df[column].replace(MISSING_VALUE,np.NaN)
+
+            return pd.DataFrame(columns,index=df.index)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,126 @@
+import os,sys,hashlib
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.entity.model_bundle import save_bundle,load_bundle,get_manifest_file_path,get_bundle_file_paths
+from sklearn.base import clone
+import sklearn
+import numpy as np
+
+CACHE_FILE_EXTENSION = ".joblib"
+
+
+def get_array_fingerprint(*arrays)->str:
+    try:
+        digest = hashlib.sha256()
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#fold scores and refit models stored on disk under a hash of everything that decides the result, so a
+#new run only fits what changed; manifests are touched on every hit and the least recently used go first
+class FitCache:
+
+    def __init__(self,cache_dir:str,max_size_mb:float=None) -> None:
+        try:
+            self.cache_dir = cache_dir
+            self.max_size_mb = max_size_mb
+            self.hits = 0
+            self.misses = 0
+            os.makedirs(cache_dir,exist_ok=True)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @staticmethod
+    def get_estimator_fingerprint(estimator,parameters:dict)->str:
+        try:
+            estimator = clone(estimator).set_params(**parameters)
+            estimator_params = sorted(estimator.get_params(deep=True).items())
+            return f"{type(estimator).__module__}.{type(estimator).__qualname__}{estimator_params!r}"
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @staticmethod
+    def get_key(data_fingerprint:str,estimator,parameters:dict,*parts)->str:
+        try:
+            digest = hashlib.sha256()
+            digest.update(sklearn.__version__.encode())
+            digest.update(data_fingerprint.encode())
+            digest.update(FitCache.get_estimator_fingerprint(estimator=estimator,parameters=parameters).encode())
+            for part in parts:
+                digest.update(repr(part).encode())
+            return digest.hexdigest()
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_file_path(self,key:str)->str:
+        return os.path.join(self.cache_dir,key[:2],key+CACHE_FILE_EXTENSION)
+
+    def get(self,key:str):
+        try:
+            #returns (found, value). entries are model bundles signed with the bundle key and loaded with the
+            #restricted unpickler, an entry without a valid signature or digest (written with another key, edited,
+            #or read while a writer is replacing it) is a miss. the manifest is touched on a hit, eviction goes by it
+            file_path = self.get_file_path(key=key)
+            manifest_file_path = get_manifest_file_path(file_path)
+            if not (os.path.exists(file_path) and os.path.exists(manifest_file_path)):
+                self.misses += 1
+                return False,None
+            try:
+                value = load_bundle(file_path=file_path)
+            except Exception as e:
+                logging.warning(f"fit cache entry {file_path} rejected : {e.__context__ or e}")
+                self.misses += 1
+                return False,None
+            os.utime(manifest_file_path)
+            self.hits += 1
+            return True,value
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def put(self,key:str,value):
+        try:
+            save_bundle(obj=value,file_path=self.get_file_path(key=key))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def evict(self):
+        try:
+            if self.max_size_mb is None:
+                return
+            cache_files = []
+            for dir_path,_,file_names in os.walk(self.cache_dir):
+                for file_name in file_names:
+                    if not file_name.endswith(CACHE_FILE_EXTENSION):
+                        continue
+                    file_path = os.path.join(dir_path,file_name)
+                    #a payload left without its manifest by an interrupted put is evicted first
+                    try:
+                        file_size = sum(os.path.getsize(path) for path in get_bundle_file_paths(file_path))
+                        manifest_file_path = get_manifest_file_path(file_path)
+                        last_used = os.stat(manifest_file_path).st_mtime_ns if os.path.exists(manifest_file_path) else 0
+                    except FileNotFoundError:
+                        continue
+                    cache_files.append((last_used,file_size,file_path))
+
+            total_size = sum(size for _,size,_ in cache_files)
+            max_size = self.max_size_mb*1024*1024
+            evicted = 0
+            for _,size,file_path in sorted(cache_files):
+                if total_size <= max_size:
+                    break
+                for bundle_file_path in get_bundle_file_paths(file_path):
+                    try:
+                        os.remove(bundle_file_path)
+                    except FileNotFoundError:
+                        pass
+                total_size -= size
+                evicted += 1
+            logging.info(f"fit cache : {self.hits} hits, {self.misses} misses, {evicted} files evicted, "
+                         f"{total_size/1024/1024:.1f} MB kept")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,283 @@
+import sys
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from sklearn.impute import KNNImputer
+from sklearn.neighbors import KDTree
+from sklearn.metrics.pairwise import nan_euclidean_distances
+import pandas as pd
+import numpy as np
+
+#relative gap below which the k-th and (k+1)-th donor are treated as a tie, tied rows take
+#their donors by exact distance and then by fitted row index
+TIE_TOLERANCE = 1e-8
+#receivers times donors compared at once by the search without an index
+BRUTE_FORCE_BLOCK_SIZE = 2**20
+
+
+def get_mask_groups(mask:np.ndarray):
+    try:
+        #np.unique over bool rows sorts them column by column, packed bytes are sorted as one key
+        packed = np.ascontiguousarray(np.packbits(mask,axis=1))
+        keys = packed.view(np.dtype((np.void,packed.shape[1]))).reshape(-1)
+        _,first_index,group_number = np.unique(keys,return_index=True,return_inverse=True)
+        return mask[first_index],np.asarray(group_number).reshape(-1)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#KNNImputer answering neighbour queries from KD trees built at fit time per missing value pattern
+#of the fitted rows, instead of computing distances to every fitted row. the trees are capped at
+#max_index_bytes and pickled with the imputer, so a memory mapped bundle shares them between workers.
+#rows whose k-th and (k+1)-th donors are tied take the donors with the lowest fitted row index,
+#KNNImputer orders tied donors differently depending on the batch, so tied rows can differ from it.
+#it is used only when imputer_mode is set to indexed, the default is KNNImputer
+class IndexedKNNImputer(KNNImputer):
+
+    def __init__(self,n_neighbors=5,weights='uniform',missing_values=np.nan,chunk_size=1024,leaf_size=40,
+                 max_index_bytes=256*1024*1024):
+        super().__init__(n_neighbors=n_neighbors,weights=weights,missing_values=missing_values)
+        self.chunk_size = chunk_size
+        self.leaf_size = leaf_size
+        self.max_index_bytes = max_index_bytes
+
+    def fit(self,X,y=None):
+        try:
+            super().fit(X,y)
+            self._pattern_index = dict()
+            self._fit_X_norm_max = float((np.nan_to_num(self._fit_X)**2).sum(axis=1).max())
+            if not self.is_index_supported():
+                logging.info(f"indexed imputation not supported for these parameters, using knn imputer")
+                return self
+            self.build_pattern_index()
+            return self
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def is_index_supported(self)->bool:
+        try:
+            return (self.weights == 'uniform' and self.metric == 'nan_euclidean' and not self.add_indicator
+                    and isinstance(self.missing_values,float) and np.isnan(self.missing_values)
+                    and bool(np.all(self._valid_mask)))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def build_pattern_index(self):
+        try:
+            #patterns are indexed most frequent first while the estimated tree size fits max_index_bytes,
+            #rows with any other pattern are searched without an index
+            n_donors = (~self._mask_fit_X).sum(axis=0)
+            patterns,pattern_number = get_mask_groups(mask=self._mask_fit_X[self._mask_fit_X.any(axis=1)])
+            pattern_counts = np.bincount(pattern_number,minlength=len(patterns))
+            index_bytes = 0
+            for number in np.argsort(-pattern_counts,kind='stable'):
+                pattern = patterns[number]
+                observed_columns = tuple(int(column) for column in np.flatnonzero(~pattern))
+                if len(observed_columns) == 0:
+                    continue
+                #a tree stores each donor's shared columns, its row index and its position in the tree
+                pattern_bytes = int(sum(n_donors[column] for column in np.flatnonzero(pattern)))*8*(len(observed_columns)+2)
+                if index_bytes+pattern_bytes > self.max_index_bytes:
+                    continue
+                for column in np.flatnonzero(pattern):
+                    self._pattern_index[(observed_columns,int(column))] = self.get_pattern_index(
+                        observed_columns=observed_columns,column=column)
+                index_bytes += pattern_bytes
+            logging.info(f"{len(self._pattern_index)} pattern indexes built, about {index_bytes} bytes")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_pattern_index(self,observed_columns:tuple,column:int)->list:
+        try:
+            #donors having the column are grouped by which observed columns they miss, inside a group
+            #nan_euclidean distance is euclidean distance on the shared columns times one constant
+            observed = np.array(observed_columns)
+            n_features = self._fit_X.shape[1]
+            donor_idx = np.flatnonzero(~self._mask_fit_X[:,column])
+            donor_mask = self._mask_fit_X[np.ix_(donor_idx,observed)]
+            groups,group_number = get_mask_groups(mask=donor_mask)
+
+            pattern_index = []
+            for number,group in enumerate(groups):
+                shared_columns = observed[~group]
+                if len(shared_columns) == 0:
+                    continue
+                group_idx = donor_idx[group_number==number]
+                tree = KDTree(self._fit_X[np.ix_(group_idx,shared_columns)],leaf_size=self.leaf_size)
+                pattern_index.append((tree,group_idx,shared_columns,np.sqrt(n_features/len(shared_columns))))
+            return pattern_index
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_donor_distances(self,receiver:np.ndarray,donor_idx:np.ndarray)->np.ndarray:
+        try:
+            #squared nan_euclidean distance computed one donor at a time from the differences, so a
+            #receiver gets the same values whichever batch it came in
+            difference = self._fit_X[donor_idx]-receiver
+            shared = ~np.isnan(difference)
+            squared_difference = np.where(shared,difference,0.0)**2
+            n_shared = shared.sum(axis=1)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                distances = squared_difference.sum(axis=1)*self._fit_X.shape[1]/n_shared
+            distances[n_shared==0] = np.inf
+            return distances
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def select_donors(self,receiver:np.ndarray,candidate_idx:np.ndarray)->np.ndarray:
+        try:
+            #candidates are every donor within rounding of the k-th nearest one, the k nearest are
+            #taken by exact distance and then by fitted row index
+            distances = self.get_donor_distances(receiver=receiver,donor_idx=candidate_idx)
+            order = np.lexsort((candidate_idx,distances))[:self.n_neighbors]
+            return candidate_idx[order]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def query_pattern_index(self,pattern_index:list,receivers:np.ndarray):
+        try:
+            #k+1 nearest donors of every receiver over all donor groups, as squared distances
+            candidate_dist = []
+            candidate_idx = []
+            for tree,group_idx,shared_columns,scale in pattern_index:
+                n_query = min(self.n_neighbors+1,len(group_idx))
+                tree_dist,tree_idx = tree.query(receivers[:,shared_columns],k=n_query)
+                candidate_dist.append((tree_dist*scale)**2)
+                candidate_idx.append(group_idx[tree_idx])
+            candidate_dist = np.hstack(candidate_dist)
+            candidate_idx = np.hstack(candidate_idx)
+            order = np.argsort(candidate_dist,axis=1,kind='stable')[:,:self.n_neighbors+1]
+            return np.take_along_axis(candidate_dist,order,axis=1),np.take_along_axis(candidate_idx,order,axis=1)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_index_candidates(self,pattern_index:list,receiver:np.ndarray,max_dist:float)->np.ndarray:
+        try:
+            candidate_idx = []
+            for tree,group_idx,shared_columns,scale in pattern_index:
+                tree_idx = tree.query_radius(receiver[shared_columns].reshape(1,-1),r=np.sqrt(max_dist)/scale)[0]
+                candidate_idx.append(group_idx[tree_idx])
+            return np.concatenate(candidate_idx)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def query_donors(self,donor_idx:np.ndarray,receivers:np.ndarray):
+        try:
+            #search without an index for patterns that were not indexed at fit time
+            n_query = self.n_neighbors+1
+            block_size = max(1,BRUTE_FORCE_BLOCK_SIZE//len(donor_idx))
+            nearest_dist = np.empty((len(receivers),n_query))
+            nearest_idx = np.empty((len(receivers),n_query),dtype=np.intp)
+            for start in range(0,len(receivers),block_size):
+                distances = nan_euclidean_distances(receivers[start:start+block_size],self._fit_X[donor_idx],squared=True)
+                distances[np.isnan(distances)] = np.inf
+                partition = np.argpartition(distances,n_query-1,axis=1)[:,:n_query]
+                partition_dist = np.take_along_axis(distances,partition,axis=1)
+                order = np.argsort(partition_dist,axis=1,kind='stable')
+                nearest_dist[start:start+block_size] = np.take_along_axis(partition_dist,order,axis=1)
+                nearest_idx[start:start+block_size] = donor_idx[np.take_along_axis(partition,order,axis=1)]
+            return nearest_dist,nearest_idx
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_donor_candidates(self,donor_idx:np.ndarray,receiver:np.ndarray,max_dist:float)->np.ndarray:
+        try:
+            distances = nan_euclidean_distances(receiver.reshape(1,-1),self._fit_X[donor_idx],squared=True)[0]
+            return donor_idx[distances <= max_dist]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def impute_pattern(self,X:np.ndarray,rows:np.ndarray,pattern:np.ndarray)->np.ndarray:
+        try:
+            #returns the rows that have to be imputed by KNNImputer itself
+            observed_columns = tuple(int(column) for column in np.flatnonzero(~pattern))
+            if len(observed_columns) == 0:
+                return rows
+
+            receivers = X[rows]
+            receivers_norm = (receivers[:,list(observed_columns)]**2).sum(axis=1)
+            fallback = np.zeros(len(rows),dtype=bool)
+            values = dict()
+
+            for column in np.flatnonzero(pattern):
+                pattern_index = self._pattern_index.get((observed_columns,int(column)))
+                if pattern_index is not None:
+                    n_donors = sum(len(group_idx) for _,group_idx,_,_ in pattern_index)
+                    max_scale = max(scale for _,_,_,scale in pattern_index) if pattern_index else 0.0
+                else:
+                    donor_idx = np.flatnonzero(~self._mask_fit_X[:,column])
+                    n_donors = len(donor_idx)
+                    max_scale = np.sqrt(self._fit_X.shape[1])
+                if n_donors <= self.n_neighbors:
+                    return rows
+
+                if pattern_index is not None:
+                    nearest_dist,nearest_idx = self.query_pattern_index(pattern_index=pattern_index,receivers=receivers)
+                else:
+                    nearest_dist,nearest_idx = self.query_donors(donor_idx=donor_idx,receivers=receivers)
+
+                kth_dist = nearest_dist[:,self.n_neighbors-1]
+                next_dist = nearest_dist[:,self.n_neighbors]
+                #rows sharing no observed column with k donors are left to KNNImputer
+                fallback |= ~np.isfinite(kth_dist)
+                tolerance = TIE_TOLERANCE*max_scale**2*(receivers_norm+self._fit_X_norm_max)
+                nearest_idx = nearest_idx[:,:self.n_neighbors]
+                for number in np.flatnonzero(((next_dist-kth_dist) <= tolerance) & ~fallback):
+                    max_dist = kth_dist[number]+tolerance[number]
+                    if pattern_index is not None:
+                        candidate_idx = self.get_index_candidates(pattern_index=pattern_index,
+                                                                  receiver=receivers[number],max_dist=max_dist)
+                    else:
+                        candidate_idx = self.get_donor_candidates(donor_idx=donor_idx,receiver=receivers[number],
+                                                                  max_dist=max_dist)
+                    if len(candidate_idx) >= self.n_neighbors:
+                        nearest_idx[number] = self.select_donors(receiver=receivers[number],candidate_idx=candidate_idx)
+
+                #donors are averaged in row index order so the sum rounds the same way in every batch
+                values[column] = self._fit_X[np.sort(nearest_idx,axis=1),column].mean(axis=1)
+
+            for column,value in values.items():
+                X[rows[~fallback],column] = value[~fallback]
+            return rows[fallback]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def knn_transform(self,X:np.ndarray)->np.ndarray:
+        try:
+            output = []
+            for start in range(0,len(X),self.chunk_size):
+                chunk = X[start:start+self.chunk_size]
+                if hasattr(self,'feature_names_in_'):
+                    chunk = pd.DataFrame(chunk,columns=self.feature_names_in_)
+                output.append(super().transform(chunk))
+            return np.vstack(output) if output else X[:,self._valid_mask]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def transform(self,X):
+        try:
+            X = np.array(X,dtype=np.float64)
+            if X.ndim != 2 or X.shape[1] != self._fit_X.shape[1]:
+                raise ValueError(f"expected {self._fit_X.shape[1]} features, got an array of shape {X.shape}")
+            if np.isinf(X).any():
+                raise ValueError(f"input contains infinity")
+            if not self.is_index_supported():
+                return self.knn_transform(X=X)
+
+            mask = np.isnan(X)
+            row_missing_idx = np.flatnonzero(mask.any(axis=1))
+            fallback_rows = []
+
+            for start in range(0,len(row_missing_idx),self.chunk_size):
+                chunk_rows = row_missing_idx[start:start+self.chunk_size]
+                patterns,pattern_number = get_mask_groups(mask=mask[chunk_rows])
+                for number,pattern in enumerate(patterns):
+                    rows = chunk_rows[pattern_number==number]
+                    fallback_rows.append(self.impute_pattern(X=X,rows=rows,pattern=pattern))
+
+            fallback_rows = np.concatenate(fallback_rows) if fallback_rows else np.array([],dtype=int)
+            if len(fallback_rows):
+                logging.info(f"{len(fallback_rows)} rows imputed by knn imputer")
+                X[fallback_rows] = self.knn_transform(X=X[fallback_rows])
+            return X
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,163 @@
+import os,sys,hmac,json,time,pickle,hashlib,inspect,platform
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import MODEL_BUNDLE_FORMAT,MODEL_BUNDLE_FORMAT_VERSION,MODEL_MANIFEST_SUFFIX,\
+    MODEL_BUNDLE_KEY_FILE_ENV,MODEL_BUNDLE_KEY_FILE_PATH,MODEL_BUNDLE_KEY_SIZE
+from joblib.numpy_pickle import NumpyUnpickler
+import joblib
+import sklearn
+import numpy as np
+
+#the only globals a payload may resolve, as (module, name) pairs: the classes the pipeline objects are
+#made of and the reconstructors numpy, joblib and sklearn pickle them with. module paths moved between
+#library versions (numpy.core -> numpy._core, sklearn _gb_losses -> _loss), both spellings are listed.
+#an estimator class added to model.yaml has to be added here before its models can be loaded
+ALLOWED_PICKLE_GLOBALS = {
+    ("copyreg","_reconstructor"),
+    ("builtins","object"),
+    ("collections","OrderedDict"),
+    ("joblib.numpy_pickle","NumpyArrayWrapper"),
+    ("numpy","dtype"),("numpy","ndarray"),
+    ("numpy.core.multiarray","_reconstruct"),("numpy.core.multiarray","scalar"),
+    ("numpy.core.numeric","_frombuffer"),
+    ("numpy._core.multiarray","_reconstruct"),("numpy._core.multiarray","scalar"),
+    ("numpy._core.numeric","_frombuffer"),
+    ("numpy.random._pickle","__randomstate_ctor"),("numpy.random._pickle","__bit_generator_ctor"),
+    ("numpy.random._pickle","__generator_ctor"),
+    ("sklearn.cluster._kmeans","KMeans"),("sklearn.cluster._kmeans","MiniBatchKMeans"),
+    ("sklearn.dummy","DummyClassifier"),
+    ("sklearn.tree._classes","DecisionTreeClassifier"),("sklearn.tree._classes","DecisionTreeRegressor"),
+    ("sklearn.tree._tree","Tree"),
+    ("sklearn.ensemble._forest","RandomForestClassifier"),
+    ("sklearn.ensemble._weight_boosting","AdaBoostClassifier"),
+    ("sklearn.ensemble._gb","GradientBoostingClassifier"),
+    ("sklearn.ensemble._gb_losses","BinomialDeviance"),("sklearn.ensemble._gb_losses","MultinomialDeviance"),
+    ("sklearn.ensemble._gb_losses","ExponentialLoss"),
+    ("sklearn._loss.loss","HalfBinomialLoss"),("sklearn._loss.loss","HalfMultinomialLoss"),
+    ("sklearn._loss.loss","ExponentialLoss"),
+    ("sklearn._loss.link","Interval"),("sklearn._loss.link","LogitLink"),("sklearn._loss.link","HalfLogitLink"),
+    ("sklearn._loss.link","MultinomialLogit"),
+    ("sklearn.impute._knn","KNNImputer"),
+    ("sklearn.neighbors._kd_tree","KDTree"),("sklearn.neighbors._kd_tree","KDTree64"),
+    ("sklearn.neighbors._kd_tree","newObj"),
+    ("sklearn.metrics._dist_metrics","EuclideanDistance"),("sklearn.metrics._dist_metrics","EuclideanDistance64"),
+    ("sklearn.metrics._dist_metrics","newObj"),
+    ("thyroid.entity.preprocessor","ThyroidPreprocessor"),
+    ("thyroid.entity.feature_encoder","FeatureEncoder"),
+    ("thyroid.entity.indexed_knn_imputer","IndexedKNNImputer"),
+}
+HASH_CHUNK_SIZE = 1024*1024
+
+#payloads whose digest was checked in this process, by path, size and modification time: a reload of an
+#unchanged payload only checks the signed manifest and the size, a payload rewritten since is hashed again
+_verified_payloads = set()
+
+
+def get_manifest_file_path(file_path:str)->str:
+    return file_path+MODEL_MANIFEST_SUFFIX
+
+def get_bundle_file_paths(file_path:str)->list:
+    #payload and manifest of a saved object, a legacy pickle has no manifest
+    return [path for path in [file_path,get_manifest_file_path(file_path)] if os.path.exists(path)]
+
+def get_file_digest(file_path:str)->str:
+    try:
+        digest = hashlib.sha256()
+        with open(file_path,'rb') as payload_file:
+            for block in iter(lambda:payload_file.read(HASH_CHUNK_SIZE),b''):
+                digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_object_type(obj)->str:
+    return f"{type(obj).__module__}.{type(obj).__qualname__}"
+
+
+def get_signing_key(create:bool=False)->bytes:
+    try:
+        #the key lives outside the artifact directory, a host that only serves models needs a copy of
+        #the key of the host that trained them. it is created on the first save when it does not exist
+        key_file_path = os.environ.get(MODEL_BUNDLE_KEY_FILE_ENV,MODEL_BUNDLE_KEY_FILE_PATH)
+        if not os.path.exists(key_file_path):
+            if not create:
+                raise FileNotFoundError(f"model bundle signing key not found at {key_file_path}, "
+                                        f"set {MODEL_BUNDLE_KEY_FILE_ENV} to the key the models were saved with")
+            os.makedirs(os.path.dirname(key_file_path),exist_ok=True)
+            key_file_descriptor = os.open(key_file_path,os.O_WRONLY|os.O_CREAT|os.O_EXCL,0o600)
+            with os.fdopen(key_file_descriptor,'wb') as key_file:
+                key_file.write(os.urandom(MODEL_BUNDLE_KEY_SIZE))
+            logging.info(f"model bundle signing key created at {key_file_path}")
+        with open(key_file_path,'rb') as key_file:
+            return key_file.read()
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_manifest_signature(manifest:dict,key:bytes)->str:
+    unsigned_manifest = {name:value for name,value in manifest.items() if name != "signature"}
+    message = json.dumps(unsigned_manifest,sort_keys=True,separators=(',',':')).encode()
+    return hmac.new(key,message,hashlib.sha256).hexdigest()
+
+
+class RestrictedUnpickler(NumpyUnpickler):
+
+    def find_class(self,module,name):
+        if (module,name) in ALLOWED_PICKLE_GLOBALS:
+            return super().find_class(module,name)
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed in a model bundle")
+
+
+def save_bundle(obj,file_path:str):
+    try:
+        #the payload is an uncompressed joblib file so its arrays can be memory mapped, the manifest
+        #written after it records what the payload holds and its digest, and is signed with the bundle key
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        joblib.dump(obj,file_path)
+        manifest = {"format":MODEL_BUNDLE_FORMAT,"format_version":MODEL_BUNDLE_FORMAT_VERSION,
+                    "object_type":get_object_type(obj),"payload":os.path.basename(file_path),
+                    "size":os.path.getsize(file_path),"sha256":get_file_digest(file_path),
+                    "created":time.time(),
+                    "versions":{"python":platform.python_version(),"numpy":np.__version__,
+                                "scikit-learn":sklearn.__version__,"joblib":joblib.__version__}}
+        manifest["signature"] = get_manifest_signature(manifest=manifest,key=get_signing_key(create=True))
+        with open(get_manifest_file_path(file_path),'w') as json_file:
+            json.dump(manifest,json_file,indent=2)
+        logging.info(f"{manifest['object_type']} saved at {file_path}")
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def load_bundle(file_path:str,mmap_mode:str=None):
+    try:
+        #the manifest signature and the payload digest are checked before anything is unpickled, a digest
+        #alone would only catch accidental damage since whoever can rewrite the payload can rewrite it too.
+        #the whole payload is read for the digest only once per process and payload version
+        with open(get_manifest_file_path(file_path),'r') as json_file:
+            manifest = json.load(json_file)
+        if manifest.get("format") != MODEL_BUNDLE_FORMAT or manifest.get("format_version") != MODEL_BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"{file_path} has bundle format {manifest.get('format')} {manifest.get('format_version')}")
+        signature = get_manifest_signature(manifest=manifest,key=get_signing_key())
+        if not hmac.compare_digest(str(manifest.get("signature","")),signature):
+            raise ValueError(f"{file_path} manifest is not signed with the bundle key")
+        payload_stat = os.stat(file_path)
+        if payload_stat.st_size != manifest["size"]:
+            raise ValueError(f"{file_path} does not match the size in its manifest")
+        payload_key = (os.path.realpath(file_path),payload_stat.st_size,payload_stat.st_mtime_ns,manifest["sha256"])
+        if payload_key not in _verified_payloads:
+            if get_file_digest(file_path) != manifest["sha256"]:
+                raise ValueError(f"{file_path} does not match the digest in its manifest")
+            _verified_payloads.add(payload_key)
+
+        with open(file_path,'rb') as payload_file:
+            #joblib added ensure_native_byte_order in 1.5, memory mapped arrays keep the stored order
+            if "ensure_native_byte_order" in inspect.signature(NumpyUnpickler.__init__).parameters:
+                unpickler = RestrictedUnpickler(file_path,payload_file,ensure_native_byte_order=mmap_mode is None,
+                                                mmap_mode=mmap_mode)
+            else:
+                unpickler = RestrictedUnpickler(file_path,payload_file,mmap_mode=mmap_mode)
+            obj = unpickler.load()
+
+        if get_object_type(obj) != manifest["object_type"]:
+            raise ValueError(f"{file_path} holds {get_object_type(obj)}, manifest has {manifest['object_type']}")
+        return obj
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
@@ -1,7 +1,13 @@
-import sys,yaml,importlib
+import os,sys,yaml,importlib
 from thyroid.logger import logging
 from thyroid.exception import ThyroidException
-from sklearn.metrics import accuracy_score
+from thyroid.constant import ROOT_DIR
+from thyroid.entity.fit_cache import FitCache,get_array_fingerprint
+from thyroid.entity.search_strategy import get_search_strategy,get_subsample,SearchBudget,GRID_STRATEGY
+from sklearn.metrics import accuracy_score,check_scoring
+from sklearn.base import clone,is_classifier
+from sklearn.model_selection import check_cv
+from joblib import Parallel,delayed,effective_n_jobs
 from collections import namedtuple
 from typing import List
 import numpy as np
@@ -12,6 +18,25 @@ CLASS_KEY = 'class'
 PARAM_KEY = 'params'
 MODEL_SELECTION_KEY = 'model_selection'
 SEARCH_PARAM_GRID_KEY = 'search_param_grid'
+SEARCH_POOL_KEY = 'search_pool'
+MEMMAP_THRESHOLD_KEY = 'memmap_threshold'
+MAX_NBYTES_KEY = 'max_nbytes'
+STRATEGY_KEY = 'strategy'
+NAME_KEY = 'name'
+BUDGET_KEY = 'budget'
+FIT_CACHE_KEY = 'fit_cache'
+CACHE_DIR_KEY = 'cache_dir'
+MAX_SIZE_MB_KEY = 'max_size_mb'
+REFIT_CACHE_PART = 'refit'
+#fits submitted per pool worker between two checks of the search time budget
+SEARCH_BATCH_FITS_PER_WORKER = 2
+
+GRID_SEARCH_CV_CLASS_NAME = 'GridSearchCV'
+CV_KEY = 'cv'
+SCORING_KEY = 'scoring'
+VERBOSE_KEY = 'verbose'
+ERROR_SCORE_KEY = 'error_score'
+N_JOBS_KEY = 'n_jobs'
 
 InitlizedModelDetails = namedtuple("InitlizedModelDetails", ["model_serial_number","model","params_grid_search","model_name"])
 
@@ -73,17 +98,62 @@ def get_evulated_classification_model(model_list:list,X_train:np.ndarray,y_train
         return metric_info_artifact  
     except Exception as e:
         raise ThyroidException(sys,e) from e
-    
+
+def fit_and_score(estimator,parameters:dict,X:np.ndarray,y:np.ndarray,train:np.ndarray,test:np.ndarray,scoring=None,
+                  error_score=np.nan)->float:
+    try:
+        #only the fit itself may fail into error_score like GridSearchCV's, a bad parameter name, a bad scoring
+        #or running out of memory stops the search. error_score "raise" stops it on a failed fit too
+        estimator = clone(estimator).set_params(**parameters)
+        try:
+            estimator.fit(X[train],y[train])
+        except MemoryError:
+            raise
+        except Exception as e:
+            if error_score == "raise":
+                raise
+            logging.warning(f"fit failed for {estimator} with {parameters}, scored {error_score} : {e}")
+            return float(error_score)
+        scorer = check_scoring(estimator,scoring=scoring)
+        return float(scorer(estimator,X[test],y[test]))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def refit(estimator,parameters:dict,X:np.ndarray,y:np.ndarray):
+    try:
+        return clone(estimator).set_params(**parameters).fit(X,y)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
 
 class ModelFactory:
 
-    def __init__(self,config_path:str=None) -> None:
+    def __init__(self,config_path:str=None,config:dict=None) -> None:
         try:
-            self.config : dict = ModelFactory.read_params(config_path=config_path)
+            self.config : dict = config if config is not None else ModelFactory.read_params(config_path=config_path)
             self.grid_search_cv_module =self.config[GRID_SEARCH_KEY][MODULE_KEY]
             self.grid_search_cv_class_module = self.config[GRID_SEARCH_KEY][CLASS_KEY]
             self.grid_search_property_data:dict = dict(self.config[GRID_SEARCH_KEY][PARAM_KEY])
             self.model_intial_config : dict = dict(self.config[MODEL_SELECTION_KEY])
+            self.search_pool_property_data:dict = dict(self.config.get(SEARCH_POOL_KEY) or {})
+            #memmap_threshold is joblib's max_nbytes: arrays bigger than it reach the workers as memory maps
+            #instead of copies, it is not a limit on the memory the search uses
+            if MEMMAP_THRESHOLD_KEY in self.search_pool_property_data:
+                self.search_pool_property_data[MAX_NBYTES_KEY] = self.search_pool_property_data.pop(MEMMAP_THRESHOLD_KEY)
+
+            strategy_config:dict = dict(self.config[GRID_SEARCH_KEY].get(STRATEGY_KEY) or {})
+            default_strategy_name = GRID_STRATEGY if self.grid_search_cv_class_module == GRID_SEARCH_CV_CLASS_NAME else None
+            self.search_strategy_name = strategy_config.get(NAME_KEY,default_strategy_name)
+            self.search_strategy_params:dict = dict(strategy_config.get(PARAM_KEY) or {})
+            self.search_budget_data:dict = dict(self.config[GRID_SEARCH_KEY].get(BUDGET_KEY) or {})
+
+            fit_cache_config:dict = dict(self.config.get(FIT_CACHE_KEY) or {})
+            self.fit_cache = None
+            if fit_cache_config.get(CACHE_DIR_KEY):
+                #a relative cache_dir is taken from the project root, ~ is expanded to the home directory
+                cache_dir = os.path.join(ROOT_DIR,os.path.expanduser(fit_cache_config[CACHE_DIR_KEY]))
+                self.fit_cache = FitCache(cache_dir=cache_dir,
+                                          max_size_mb=fit_cache_config.get(MAX_SIZE_MB_KEY))
 
             self.intlized_model_list = None
             self.grid_searched_best_model_list = None
@@ -158,6 +228,14 @@ class ModelFactory:
                                                            input_feature,output_feature)->List[GridSearchedBestModel]:
         try:
             logging.info(f"intiate best parameter for models function started")
+            if self.search_strategy_name is not None:
+                self.grid_searched_best_model_list = self.initite_parallel_search_for_initlized_models(
+                    intlized_model_list=intlized_model_list,
+                    input_feature=input_feature,
+                    output_feature=output_feature
+                )
+                return self.grid_searched_best_model_list
+
             self.grid_searched_best_model_list = []
 
             for intlized_model in intlized_model_list:
@@ -173,6 +251,137 @@ class ModelFactory:
             return self.grid_searched_best_model_list
         except Exception as e:
             raise ThyroidException(sys,e) from e
+
+    def run_cached_tasks(self,parallel:Parallel,tasks:list,cache_keys:list):
+        try:
+            #returns the result of every task and how many of them had to run, results found in the fit
+            #cache are reused and new ones are stored, failed fits scoring nan are never stored
+            results = [None]*len(tasks)
+            missing = []
+            for index in range(len(tasks)):
+                found = False
+                if self.fit_cache is not None:
+                    found,value = self.fit_cache.get(key=cache_keys[index])
+                if found:
+                    results[index] = value
+                else:
+                    missing.append(index)
+
+            values = parallel(tasks[index] for index in missing)
+            for index,value in zip(missing,values):
+                results[index] = value
+                if self.fit_cache is not None and not (isinstance(value,float) and np.isnan(value)):
+                    self.fit_cache.put(key=cache_keys[index],value=value)
+            return results,len(missing)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def initite_parallel_search_for_initlized_models(self,intlized_model_list:List[InitlizedModelDetails],
+                                                     input_feature,output_feature)->List[GridSearchedBestModel]:
+        try:
+            #the search strategy proposes rounds of candidates, every (model, parameter, fold) fit of a round is one
+            #task of a single pool and the scores go back to the strategy until it stops or the budget runs out,
+            #then the best parameters of each model are refit on the whole data
+            logging.info(f"parallel {self.search_strategy_name} search function started with {self.search_pool_property_data}")
+            input_feature = np.asarray(input_feature)
+            output_feature = np.asarray(output_feature)
+            scoring = self.grid_search_property_data.get(SCORING_KEY)
+            error_score = self.grid_search_property_data.get(ERROR_SCORE_KEY,np.nan)
+
+            folds_list = []
+            for intlized_model in intlized_model_list:
+                cv = check_cv(self.grid_search_property_data.get(CV_KEY,5),output_feature,
+                              classifier=is_classifier(intlized_model.model))
+                folds_list.append(list(cv.split(input_feature,output_feature)))
+
+            search_strategy = get_search_strategy(strategy_name=self.search_strategy_name,
+                                                  param_grids=[intlized_model.params_grid_search
+                                                               for intlized_model in intlized_model_list],
+                                                  strategy_params=self.search_strategy_params)
+            search_budget = SearchBudget(**self.search_budget_data)
+            round_number = 0
+            data_fingerprint = get_array_fingerprint(input_feature,output_feature) if self.fit_cache is not None else None
+            batch_fits = effective_n_jobs(self.search_pool_property_data.get(N_JOBS_KEY,1))*SEARCH_BATCH_FITS_PER_WORKER
+
+            with Parallel(verbose=self.grid_search_property_data.get(VERBOSE_KEY,0),
+                          **self.search_pool_property_data) as parallel:
+                while True:
+                    candidates = search_strategy.propose()
+                    if not candidates or (round_number > 0 and search_budget.is_exhausted()):
+                        break
+                    n_folds = max(len(folds) for folds in folds_list)
+                    candidates = search_budget.trim(candidates=candidates,n_folds=n_folds,keep_one_per_model=round_number == 0)
+
+                    subsamples = dict()
+                    scored_candidates = []
+                    mean_scores = []
+                    for batch in search_budget.get_batches(candidates=candidates,n_folds=n_folds,batch_fits=batch_fits):
+                        #the first round goes on until every model has a score even when the time is up
+                        scored_models = {candidate.model_index for candidate in scored_candidates}
+                        if scored_candidates and search_budget.is_exhausted() and \
+                                (round_number > 0 or len(scored_models) == len(intlized_model_list)):
+                            logging.info(f"search budget ran out after {len(scored_candidates)} of {len(candidates)} candidates")
+                            break
+                        tasks = []
+                        cache_keys = []
+                        for candidate in batch:
+                            intlized_model = intlized_model_list[candidate.model_index]
+                            folds = folds_list[candidate.model_index]
+                            for fold_index,(train,test) in enumerate(folds):
+                                key = (candidate.model_index,fold_index,candidate.resource)
+                                if key not in subsamples:
+                                    subsamples[key] = get_subsample(train=train,y=output_feature,resource=candidate.resource,
+                                                                    random_state=search_strategy.random_state)
+                                tasks.append(delayed(fit_and_score)(intlized_model.model,candidate.parameters,input_feature,
+                                                                    output_feature,subsamples[key],test,scoring,
+                                                                    error_score))
+                                if self.fit_cache is not None:
+                                    cache_keys.append(FitCache.get_key(data_fingerprint,intlized_model.model,candidate.parameters,
+                                                                       get_array_fingerprint(subsamples[key],test),scoring,
+                                                                       error_score))
+                        logging.info(f"search round {round_number} : {len(batch)} of {len(candidates)} candidates, "
+                                     f"{len(tasks)} fits scheduled")
+
+                        scores,fits = self.run_cached_tasks(parallel=parallel,tasks=tasks,cache_keys=cache_keys)
+                        search_budget.spend(fits=fits)
+
+                        start = 0
+                        for candidate in batch:
+                            end = start+len(folds_list[candidate.model_index])
+                            mean_scores.append(float(np.mean(scores[start:end])))
+                            start = end
+                        scored_candidates.extend(batch)
+                    candidates = scored_candidates
+                    search_strategy.update(candidates=candidates,scores=mean_scores)
+                    round_number += 1
+
+                logging.info(f"search finished after {round_number} rounds and {search_budget.fits} fits")
+                best_result_list = [search_strategy.get_best(model_index=model_index)
+                                    for model_index in range(len(intlized_model_list))]
+                tasks = [delayed(refit)(intlized_model.model,best_result.parameters,input_feature,output_feature)
+                         for intlized_model,best_result in zip(intlized_model_list,best_result_list)]
+                cache_keys = []
+                if self.fit_cache is not None:
+                    cache_keys = [FitCache.get_key(data_fingerprint,intlized_model.model,best_result.parameters,REFIT_CACHE_PART)
+                                  for intlized_model,best_result in zip(intlized_model_list,best_result_list)]
+                best_model_list,_ = self.run_cached_tasks(parallel=parallel,tasks=tasks,cache_keys=cache_keys)
+
+            if self.fit_cache is not None:
+                self.fit_cache.evict()
+
+            grid_searched_best_model_list = []
+            for intlized_model,best_model,best_result in zip(intlized_model_list,best_model_list,best_result_list):
+                grid_searched_best_model = GridSearchedBestModel(model_serial_number=intlized_model.model_serial_number,
+                                                                 model=intlized_model.model,
+                                                                 best_model=best_model,
+                                                                 best_parameters=best_result.parameters,
+                                                                 best_scores=best_result.score)
+                logging.info(f"best model is : {grid_searched_best_model}")
+                grid_searched_best_model_list.append(grid_searched_best_model)
+
+            return grid_searched_best_model_list
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
         
     def initite_best_parameter_search_for_initlized_model(self,intlized_model_details:InitlizedModelDetails,
                                                           input_feature,output_feature)->GridSearchedBestModel:
@@ -186,6 +395,8 @@ class ModelFactory:
             
             grid_seach_cv = ModelFactory.update_property_class(insta_object=grid_search_cv,
                                                                property_data=self.grid_search_property_data)
+            if N_JOBS_KEY in self.search_pool_property_data and hasattr(grid_seach_cv,N_JOBS_KEY):
+                grid_seach_cv.n_jobs = self.search_pool_property_data[N_JOBS_KEY]
             
             grid_search_cv.fit(input_feature,output_feature)
 
@@ -0,0 +1,39 @@
+import sys
+from thyroid.exception import ThyroidException
+from thyroid.entity.feature_encoder import FeatureEncoder
+from typing import List
+import pandas as pd
+import numpy as np
+
+
+#fitted encoder, imputer and log transform kept as the one preprocessing artifact used by training and serving
+class ThyroidPreprocessor:
+
+    def __init__(self,feature_encoder:FeatureEncoder,imputer,log_transform_columns:List[str]=None) -> None:
+        try:
+            self.feature_encoder = feature_encoder
+            self.imputer = imputer
+            self.log_transform_columns = list(log_transform_columns) if log_transform_columns is not None else []
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @property
+    def feature_columns(self)->List[str]:
+        return self.feature_encoder.feature_columns
+
+    def log_transform(self,df:pd.DataFrame)->pd.DataFrame:
+        try:
+            for column in self.log_transform_columns:
+                df[column] = np.log(df[column]+1)
+            return df
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        try:
+            df = self.feature_encoder.transform(df=df)
+            data = self.imputer.transform(df)
+            df = pd.DataFrame(data,columns=self.feature_columns)
+            return self.log_transform(df=df)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,175 @@
+import os,sys,csv
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import COLUMN_KEY,SCHEMA_CONSTRAINT_KEY,ALLOWED_VALUES_KEY,MIN_VALUE_KEY,MAX_VALUE_KEY,\
+    MISSING_VALUES_KEY,SCHEMA_VALIDATION_CHUNK_SIZE,CSV_ARTIFACT_FORMAT,PARQUET_ARTIFACT_FORMAT
+from thyroid.util.util import get_artifact_format,iter_dataframe_chunks
+from collections import namedtuple
+import pandas as pd
+import numpy as np
+
+SchemaValidationResult = namedtuple("SchemaValidationResult",["file_path","is_valid","row_count","errors"])
+
+INTEGER_PATTERN = r'^\s*[+-]?\d+\s*$'
+MAX_EXAMPLE_VALUES = 5
+
+
+class ColumnViolation:
+
+    def __init__(self,message:str) -> None:
+        self.message = message
+        self.count = 0
+        self.examples = []
+
+    def add(self,values:pd.Series):
+        self.count += len(values)
+        #examples are distinct over the whole file, not only inside one chunk
+        if len(self.examples) < MAX_EXAMPLE_VALUES:
+            new_values = [value for value in values.drop_duplicates().tolist() if value not in self.examples]
+            self.examples.extend(new_values[:MAX_EXAMPLE_VALUES-len(self.examples)])
+
+    def __str__(self) -> str:
+        return f"{self.message} in {self.count} rows, e.g. {self.examples}"
+
+
+#validates a file against schema.yaml without loading it: column count and names come from the header,
+#types, ranges and allowed values from a scan in chunks of chunk_size rows. A header or type error is
+#a hard failure and ends the scan, range and allowed value violations are counted over the whole file
+class SchemaValidator:
+
+    def __init__(self,schema_file_data:dict,chunk_size:int=SCHEMA_VALIDATION_CHUNK_SIZE) -> None:
+        try:
+            self.schema_columns = dict(schema_file_data[COLUMN_KEY])
+            self.column_constraints = dict(schema_file_data.get(SCHEMA_CONSTRAINT_KEY) or {})
+            self.chunk_size = chunk_size
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_header(self,file_path:str):
+        try:
+            #returns (column names, column dtypes), dtypes are only known without a scan for typed files
+            artifact_format = get_artifact_format(file_path=file_path)
+            if artifact_format == CSV_ARTIFACT_FORMAT:
+                with open(file_path,'r',newline='') as csv_file:
+                    return next(csv.reader(csv_file),[]),None
+
+            import pyarrow as pa
+            if artifact_format == PARQUET_ARTIFACT_FORMAT:
+                import pyarrow.parquet as pq
+                schema = pq.read_schema(file_path)
+            else:
+                schema = pa.ipc.open_file(pa.memory_map(file_path)).schema
+            data_types = dict()
+            for field in schema:
+                try:
+                    data_types[field.name] = np.dtype(field.type.to_pandas_dtype()).name
+                except NotImplementedError:
+                    data_types[field.name] = str(field.type)
+            return list(schema.names),data_types
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def check_header(self,columns:list,data_types:dict)->list:
+        try:
+            errors = []
+            if len(columns) != len(self.schema_columns):
+                errors.append(f"column count is {len(columns)}, schema has {len(self.schema_columns)}")
+            missing_columns = [column for column in self.schema_columns if column not in columns]
+            extra_columns = [column for column in columns if column not in self.schema_columns]
+            if missing_columns:
+                errors.append(f"columns missing : {missing_columns}")
+            if extra_columns:
+                errors.append(f"columns not in schema : {extra_columns}")
+            for column,data_type in (data_types or {}).items():
+                if column in self.schema_columns and data_type != self.schema_columns[column]:
+                    errors.append(f"data type for {column} is {data_type}, schema has {self.schema_columns[column]}")
+            return errors
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def check_text_types(self,df:pd.DataFrame,violations:dict)->bool:
+        try:
+            #text values that pandas could not read as the schema type, object columns take anything
+            is_valid = True
+            for column,data_type in self.schema_columns.items():
+                values = df[column]
+                if data_type.startswith('int'):
+                    bad_values = values[values.isna()|~values.str.match(INTEGER_PATTERN,na=False)]
+                elif data_type.startswith('float'):
+                    bad_values = values[values.notna()&pd.to_numeric(values,errors='coerce').isna()]
+                else:
+                    continue
+                if len(bad_values):
+                    violations.setdefault((column,'type'),ColumnViolation(f"{column} has values that are not {data_type}")
+                                          ).add(bad_values.fillna('<missing>'))
+                    is_valid = False
+            return is_valid
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def check_constraints(self,df:pd.DataFrame,violations:dict):
+        try:
+            for column,constraint in self.column_constraints.items():
+                if column not in df.columns:
+                    continue
+                values = df[column]
+                text_values = values.astype(str)
+                missing_values = set(str(value) for value in constraint.get(MISSING_VALUES_KEY,[]))
+                is_present = values.notna()&~text_values.isin(missing_values)
+                values,text_values = values[is_present],text_values[is_present]
+
+                if ALLOWED_VALUES_KEY in constraint:
+                    allowed_values = set(str(value) for value in constraint[ALLOWED_VALUES_KEY])
+                    bad_values = values[~text_values.isin(allowed_values)]
+                    if len(bad_values):
+                        violations.setdefault((column,ALLOWED_VALUES_KEY),
+                                              ColumnViolation(f"{column} has values outside {sorted(allowed_values)}")
+                                              ).add(bad_values)
+
+                if MIN_VALUE_KEY in constraint or MAX_VALUE_KEY in constraint:
+                    numbers = pd.to_numeric(values,errors='coerce')
+                    bad_values = values[numbers.isna()]
+                    if len(bad_values):
+                        violations.setdefault((column,'numeric'),ColumnViolation(f"{column} has values that are not numbers")
+                                              ).add(bad_values)
+                    out_of_range = pd.Series(False,index=values.index)
+                    if MIN_VALUE_KEY in constraint:
+                        out_of_range |= numbers < constraint[MIN_VALUE_KEY]
+                    if MAX_VALUE_KEY in constraint:
+                        out_of_range |= numbers > constraint[MAX_VALUE_KEY]
+                    if out_of_range.any():
+                        violations.setdefault((column,'range'),
+                                              ColumnViolation(f"{column} has values outside "
+                                                              f"[{constraint.get(MIN_VALUE_KEY)}, {constraint.get(MAX_VALUE_KEY)}]")
+                                              ).add(values[out_of_range])
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def validate(self,file_path:str)->SchemaValidationResult:
+        try:
+            logging.info(f"schema validation of {file_path} started")
+            if not os.path.exists(file_path):
+                return SchemaValidationResult(file_path=file_path,is_valid=False,row_count=0,
+                                              errors=[f"file is not available"])
+
+            columns,data_types = self.get_header(file_path=file_path)
+            errors = self.check_header(columns=columns,data_types=data_types)
+            if errors:
+                logging.info(f"header of {file_path} does not match the schema : {errors}")
+                return SchemaValidationResult(file_path=file_path,is_valid=False,row_count=0,errors=errors)
+
+            row_count = 0
+            violations = dict()
+            for df in iter_dataframe_chunks(file_path=file_path,chunk_size=self.chunk_size):
+                row_count += len(df)
+                if data_types is None:
+                    if not self.check_text_types(df=df,violations=violations):
+                        logging.info(f"type error in {file_path} near row {row_count}, scan stopped")
+                        break
+                self.check_constraints(df=df,violations=violations)
+
+            errors = [str(violation) for violation in violations.values()]
+            logging.info(f"schema validation of {file_path} checked {row_count} rows, {len(errors)} errors")
+            return SchemaValidationResult(file_path=file_path,is_valid=not errors,row_count=row_count,errors=errors)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,331 @@
+import sys,math,time
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from sklearn.model_selection import ParameterGrid,ParameterSampler
+from sklearn.utils import resample
+from collections import namedtuple
+from abc import ABC,abstractmethod
+from typing import List
+import numpy as np
+
+GRID_STRATEGY = 'grid'
+RANDOM_STRATEGY = 'random'
+HALVING_STRATEGY = 'halving'
+EARLY_STOP_STRATEGY = 'early_stop'
+
+#one parameter set of one model, fitted on the given fraction of every training fold
+SearchCandidate = namedtuple("SearchCandidate",["model_index","parameters","resource"])
+
+SearchResult = namedtuple("SearchResult",["parameters","resource","score"])
+
+
+def get_subsample(train:np.ndarray,y:np.ndarray,resource:float,random_state=None)->np.ndarray:
+    try:
+        if resource >= 1:
+            return train
+        n_samples = max(int(math.ceil(resource*len(train))),len(np.unique(y[train])))
+        if n_samples >= len(train):
+            return train
+        return resample(train,replace=False,n_samples=n_samples,random_state=random_state,stratify=y[train])
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+class SearchBudget:
+
+    def __init__(self,max_fits:int=None,max_seconds:float=None) -> None:
+        try:
+            self.max_fits = max_fits
+            self.max_seconds = max_seconds
+            self.fits = 0
+            self.start_time = time.monotonic()
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def is_exhausted(self)->bool:
+        try:
+            if self.max_fits is not None and self.fits >= self.max_fits:
+                return True
+            if self.max_seconds is not None and time.monotonic()-self.start_time >= self.max_seconds:
+                return True
+            return False
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @staticmethod
+    def interleave(candidates:List[SearchCandidate])->List[SearchCandidate]:
+        #models take turns, the order of the candidates of one model is kept
+        model_candidates = dict()
+        for candidate in candidates:
+            model_candidates.setdefault(candidate.model_index,[]).append(candidate)
+        interleaved = []
+        for position in range(max((len(value) for value in model_candidates.values()),default=0)):
+            for value in model_candidates.values():
+                if position < len(value):
+                    interleaved.append(value[position])
+        return interleaved
+
+    def trim(self,candidates:List[SearchCandidate],n_folds:int,keep_one_per_model:bool=False)->List[SearchCandidate]:
+        try:
+            if self.max_fits is None:
+                return candidates
+            n_candidates = max(0,(self.max_fits-self.fits)//n_folds)
+            if keep_one_per_model:
+                #the first round always scores one candidate of every model so each model gets a result
+                n_candidates = max(n_candidates,len({candidate.model_index for candidate in candidates}))
+            if n_candidates >= len(candidates):
+                return candidates
+            #a small budget is shared by all models instead of spent on the first one
+            return SearchBudget.interleave(candidates=candidates)[:n_candidates]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_batches(self,candidates:List[SearchCandidate],n_folds:int,batch_fits:int)->List[List[SearchCandidate]]:
+        try:
+            #without a time limit a round is submitted at once. with one it is split into batches of about
+            #batch_fits fits, models taking turns, so the limit is also checked between the batches of a round
+            #and a single round (all of the grid strategy) can not run past it
+            if self.max_seconds is None or not candidates:
+                return [candidates]
+            candidates = SearchBudget.interleave(candidates=candidates)
+            batch_size = max(1,batch_fits//max(1,n_folds))
+            return [candidates[start:start+batch_size] for start in range(0,len(candidates),batch_size)]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def spend(self,fits:int):
+        self.fits += fits
+
+
+class SearchStrategy(ABC):
+
+    def __init__(self,param_grids:List[dict],random_state=None) -> None:
+        try:
+            self.param_grids = param_grids
+            self.random_state = random_state
+            self.results = [[] for _ in param_grids]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @abstractmethod
+    def propose(self)->List[SearchCandidate]:
+        #the candidates of the next round, an empty list ends the search
+        pass
+
+    def update(self,candidates:List[SearchCandidate],scores:List[float]):
+        try:
+            for candidate,score in zip(candidates,scores):
+                self.results[candidate.model_index].append(SearchResult(parameters=candidate.parameters,
+                                                                        resource=candidate.resource,
+                                                                        score=score))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_best(self,model_index:int):
+        try:
+            #best mean score among the candidates fitted on the most data, the first of tied candidates wins
+            results = self.results[model_index]
+            if not results:
+                return None
+            max_resource = max(result.resource for result in results)
+            results = [result for result in results if result.resource == max_resource]
+            scores = np.array([result.score for result in results],dtype=float)
+            best_index = int(np.argmax(np.where(np.isnan(scores),-np.inf,scores)))
+            return results[best_index]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+#every grid point of every model in one round, same candidates as GridSearchCV
+class GridSearchStrategy(SearchStrategy):
+
+    def __init__(self,param_grids:List[dict],random_state=None) -> None:
+        super().__init__(param_grids=param_grids,random_state=random_state)
+        self.proposed = False
+
+    def propose(self)->List[SearchCandidate]:
+        try:
+            if self.proposed:
+                return []
+            self.proposed = True
+            return [SearchCandidate(model_index=model_index,parameters=parameters,resource=1.0)
+                    for model_index,param_grid in enumerate(self.param_grids)
+                    for parameters in ParameterGrid(param_grid)]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+#n_iter grid points per model sampled like RandomizedSearchCV, proposed batch_size at a time so budgets can stop it early
+class RandomSearchStrategy(SearchStrategy):
+
+    def __init__(self,param_grids:List[dict],random_state=None,n_iter:int=10,batch_size:int=None) -> None:
+        super().__init__(param_grids=param_grids,random_state=random_state)
+        self.batch_size = batch_size
+        self.pending = []
+        for model_index,param_grid in enumerate(param_grids):
+            n_candidates = min(n_iter,len(ParameterGrid(param_grid)))
+            self.pending.append([SearchCandidate(model_index=model_index,parameters=parameters,resource=1.0)
+                                 for parameters in ParameterSampler(param_grid,n_iter=n_candidates,
+                                                                    random_state=random_state)])
+
+    def propose(self)->List[SearchCandidate]:
+        try:
+            candidates = []
+            for model_index,pending in enumerate(self.pending):
+                batch_size = self.batch_size or len(pending)
+                candidates.extend(pending[:batch_size])
+                self.pending[model_index] = pending[batch_size:]
+            return candidates
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+#successive halving like HalvingGridSearchCV: all grid points start on a small share of every training fold,
+#the best 1/factor go on to factor times more data until the last round uses the whole folds
+class HalvingSearchStrategy(SearchStrategy):
+
+    def __init__(self,param_grids:List[dict],random_state=None,factor:int=3,min_resource:float=None) -> None:
+        super().__init__(param_grids=param_grids,random_state=random_state)
+        self.factor = factor
+        self.min_resource = min_resource
+        self.round_number = 0
+        self.survivors = [list(ParameterGrid(param_grid)) for param_grid in param_grids]
+        self.n_rounds = [self.get_n_rounds(n_candidates=len(survivors)) for survivors in self.survivors]
+
+    def get_n_rounds(self,n_candidates:int)->int:
+        n_rounds = 1
+        while n_candidates > self.factor:
+            n_candidates = int(math.ceil(n_candidates/self.factor))
+            n_rounds += 1
+        return n_rounds
+
+    def get_resource(self,model_index:int)->float:
+        resource = float(self.factor)**-(self.n_rounds[model_index]-1-self.round_number)
+        if self.min_resource is not None:
+            resource = max(resource,self.min_resource)
+        return min(resource,1.0)
+
+    def propose(self)->List[SearchCandidate]:
+        try:
+            candidates = []
+            for model_index,survivors in enumerate(self.survivors):
+                if self.round_number >= self.n_rounds[model_index]:
+                    continue
+                resource = self.get_resource(model_index=model_index)
+                candidates.extend(SearchCandidate(model_index=model_index,parameters=parameters,resource=resource)
+                                  for parameters in survivors)
+            return candidates
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def update(self,candidates:List[SearchCandidate],scores:List[float]):
+        try:
+            super().update(candidates=candidates,scores=scores)
+            for model_index in range(len(self.survivors)):
+                model_scores = [(score,candidate.parameters) for candidate,score in zip(candidates,scores)
+                                if candidate.model_index == model_index]
+                if not model_scores:
+                    self.survivors[model_index] = []
+                    continue
+                n_keep = int(math.ceil(len(model_scores)/self.factor))
+                #stable sort keeps the earlier candidate first among equal scores
+                order = sorted(range(len(model_scores)),
+                               key=lambda index:-model_scores[index][0] if not np.isnan(model_scores[index][0]) else np.inf)
+                self.survivors[model_index] = [model_scores[index][1] for index in order[:n_keep]]
+            self.round_number += 1
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+#starts from n_initial sampled grid points and then only tries the grid neighbours (one parameter moved to the
+#next or previous listed value) of the best points so far, a model stops after patience rounds without a better score
+class EarlyStopSearchStrategy(SearchStrategy):
+
+    def __init__(self,param_grids:List[dict],random_state=None,n_initial:int=5,n_best:int=2,
+                 patience:int=2,tolerance:float=1e-4) -> None:
+        super().__init__(param_grids=param_grids,random_state=random_state)
+        self.n_best = n_best
+        self.patience = patience
+        self.tolerance = tolerance
+        self.stalled_rounds = [0 for _ in param_grids]
+        self.best_scores = [-np.inf for _ in param_grids]
+        self.seen = [set() for _ in param_grids]
+        self.pending = []
+        for model_index,param_grid in enumerate(param_grids):
+            n_candidates = min(n_initial,len(ParameterGrid(param_grid)))
+            self.pending.append([parameters for parameters in ParameterSampler(param_grid,n_iter=n_candidates,
+                                                                               random_state=random_state)])
+
+    @staticmethod
+    def get_key(parameters:dict)->tuple:
+        return tuple(sorted((key,repr(value)) for key,value in parameters.items()))
+
+    def get_neighbours(self,model_index:int,parameters:dict)->List[dict]:
+        try:
+            neighbours = []
+            param_grid = self.param_grids[model_index]
+            for key,values in param_grid.items():
+                values = list(values)
+                position = values.index(parameters[key])
+                for next_position in (position-1,position+1):
+                    if 0 <= next_position < len(values):
+                        neighbour = dict(parameters)
+                        neighbour[key] = values[next_position]
+                        neighbours.append(neighbour)
+            return neighbours
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def propose(self)->List[SearchCandidate]:
+        try:
+            candidates = []
+            for model_index,pending in enumerate(self.pending):
+                for parameters in pending:
+                    self.seen[model_index].add(EarlyStopSearchStrategy.get_key(parameters))
+                    candidates.append(SearchCandidate(model_index=model_index,parameters=parameters,resource=1.0))
+                self.pending[model_index] = []
+            return candidates
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def update(self,candidates:List[SearchCandidate],scores:List[float]):
+        try:
+            super().update(candidates=candidates,scores=scores)
+            for model_index,results in enumerate(self.results):
+                if not any(candidate.model_index == model_index for candidate in candidates):
+                    continue
+                scores = np.array([result.score for result in results],dtype=float)
+                scores = np.where(np.isnan(scores),-np.inf,scores)
+                if scores.max() > self.best_scores[model_index]+self.tolerance:
+                    self.best_scores[model_index] = scores.max()
+                    self.stalled_rounds[model_index] = 0
+                else:
+                    self.stalled_rounds[model_index] += 1
+                if self.stalled_rounds[model_index] >= self.patience:
+                    logging.info(f"search of model {model_index} stopped after {len(results)} candidates")
+                    continue
+
+                pending = []
+                for best_index in np.argsort(-scores,kind='stable')[:self.n_best]:
+                    for neighbour in self.get_neighbours(model_index=model_index,parameters=results[best_index].parameters):
+                        key = EarlyStopSearchStrategy.get_key(neighbour)
+                        if key not in self.seen[model_index]:
+                            self.seen[model_index].add(key)
+                            pending.append(neighbour)
+                self.pending[model_index] = pending
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+SEARCH_STRATEGIES = {GRID_STRATEGY:GridSearchStrategy,
+                     RANDOM_STRATEGY:RandomSearchStrategy,
+                     HALVING_STRATEGY:HalvingSearchStrategy,
+                     EARLY_STOP_STRATEGY:EarlyStopSearchStrategy}
+
+def get_search_strategy(strategy_name:str,param_grids:List[dict],strategy_params:dict=None)->SearchStrategy:
+    try:
+        if strategy_name not in SEARCH_STRATEGIES:
+            raise ValueError(f"unknown search strategy : {strategy_name}, expected one of {list(SEARCH_STRATEGIES)}")
+        return SEARCH_STRATEGIES[strategy_name](param_grids=param_grids,**(strategy_params or {}))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
@@ -0,0 +1,277 @@
+import os,sys,json,shutil
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import FLAT_MODEL_DIR_NAME,FLAT_MODEL_INFO_FILE_NAME
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier,GradientBoostingClassifier,AdaBoostClassifier
+from sklearn.dummy import DummyClassifier
+from sklearn.utils import check_random_state
+from scipy.special import expit,logsumexp
+import numpy as np
+
+DECISION_TREE_KIND = "decision_tree"
+RANDOM_FOREST_KIND = "random_forest"
+GRADIENT_BOOSTING_KIND = "gradient_boosting"
+ADABOOST_KIND = "adaboost"
+
+BINOMIAL_DECISION = "binomial"
+MULTINOMIAL_DECISION = "multinomial"
+EXPONENTIAL_DECISION = "exponential"
+GRADIENT_BOOSTING_DECISIONS = {"BinomialDeviance":BINOMIAL_DECISION,"MultinomialDeviance":MULTINOMIAL_DECISION,
+                               "ExponentialLoss":EXPONENTIAL_DECISION}
+
+FLAT_MODEL_ARRAYS = ["feature","threshold","children","leaf_value","roots"]
+SELF_CHECK_ROWS = 2000
+
+
+def get_tree_arrays(tree,leaf_value:np.ndarray):
+    try:
+        #returns (feature, threshold, children) of one fitted sklearn tree, a leaf points to itself
+        #so rows that reach it early stay there for the remaining levels
+        node_index = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        feature = np.where(is_leaf,0,tree.feature).astype(np.int32)
+        threshold = np.where(is_leaf,0.0,tree.threshold).astype(np.float64)
+        children = np.stack([np.where(is_leaf,node_index,tree.children_left),
+                             np.where(is_leaf,node_index,tree.children_right)],axis=1)
+        return feature,threshold,children,leaf_value
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_tree_proba(estimator)->np.ndarray:
+    try:
+        #per leaf class shares exactly as DecisionTreeClassifier.predict_proba normalizes them
+        proba = estimator.tree_.value[:,0,:estimator.n_classes_].copy()
+        normalizer = proba.sum(axis=1)[:,np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        return proba
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_samme_proba(proba:np.ndarray,n_classes:int)->np.ndarray:
+    try:
+        #the per leaf form of AdaBoostClassifier's SAMME.R estimator output
+        proba = np.clip(proba,np.finfo(proba.dtype).eps,None)
+        log_proba = np.log(proba)
+        return (n_classes-1)*(log_proba-(1.0/n_classes)*log_proba.sum(axis=1)[:,np.newaxis])
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#a fitted tree model as contiguous node arrays: every row walks all trees at once, one level per step,
+#and the leaf outputs are combined in the order and with the arithmetic of the sklearn predict they
+#replace, so the predictions are the same without the per call overhead of the estimator
+class FlatTreeEnsemble:
+
+    def __init__(self,kind:str,feature:np.ndarray,threshold:np.ndarray,children:np.ndarray,
+                 leaf_value:np.ndarray,roots:np.ndarray,max_depth:int,n_features:int,classes:list,
+                 params:dict=None) -> None:
+        try:
+            #memory mapped arrays are used as plain views of the mapped file
+            self.kind = kind
+            self.feature = np.asarray(feature)
+            self.threshold = np.asarray(threshold)
+            self.children = np.asarray(children)
+            self.leaf_value = np.asarray(leaf_value)
+            self.roots = np.asarray(roots)
+            self.max_depth = max_depth
+            self.n_features = n_features
+            self.classes = np.asarray(classes)
+            self.params = params or {}
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @property
+    def n_trees(self)->int:
+        return len(self.roots)
+
+    def apply(self,X)->np.ndarray:
+        try:
+            #returns the leaf of every (tree, row); sklearn trees compare float32 inputs to
+            #float64 thresholds, the comparison here is made on the same values
+            X = np.ascontiguousarray(X,dtype=np.float32)
+            row_offset = np.arange(len(X),dtype=np.intp)*self.n_features
+            nodes = np.repeat(self.roots[:,np.newaxis],len(X),axis=1)
+            #children are read as one flat array, the child of node n is at 2n (left) or 2n+1 (right)
+            children = self.children.reshape(-1)
+            feature_index = np.empty_like(nodes)
+            go_right = np.empty(nodes.shape,dtype=bool)
+            for _ in range(self.max_depth):
+                np.add(self.feature.take(nodes),row_offset,out=feature_index)
+                np.greater(X.take(feature_index),self.threshold.take(nodes),out=go_right)
+                nodes *= 2
+                nodes += go_right
+                children.take(nodes,out=nodes)
+            return nodes
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_class_index(self,X)->np.ndarray:
+        try:
+            #leaf outputs are (tree, row, value), summing over the first axis adds one tree at a time
+            #in tree order as the sklearn predict loops do
+            leaf_values = self.leaf_value.take(self.apply(X=X),axis=0)
+            if self.kind == DECISION_TREE_KIND:
+                return np.argmax(leaf_values[0],axis=1)
+
+            if self.kind == RANDOM_FOREST_KIND:
+                proba = leaf_values.sum(axis=0)
+                proba /= self.n_trees
+                return np.argmax(proba,axis=1)
+
+            if self.kind == ADABOOST_KIND:
+                pred = leaf_values.sum(axis=0)
+                pred /= self.params["weight_sum"]
+                if len(self.classes) == 2:
+                    pred[:,0] *= -1
+                    return (pred.sum(axis=1) > 0).astype(np.intp)
+                return np.argmax(pred,axis=1)
+
+            #gradient boosting trees are stored stage by stage with one tree per raw output and leaf values
+            #already scaled by the learning rate, the init prediction is the first term of the sum
+            init_raw = np.asarray(self.params["init_raw"],dtype=np.float64)
+            terms = leaf_values.reshape(-1,len(init_raw),leaf_values.shape[1])
+            raw = np.concatenate([np.broadcast_to(init_raw[np.newaxis,:,np.newaxis],(1,)+terms.shape[1:]),terms]).sum(axis=0).T
+            decision = self.params["decision"]
+            if decision == BINOMIAL_DECISION:
+                positive_proba = expit(raw.ravel())
+                return ((1.0-positive_proba) < positive_proba).astype(np.intp)
+            if decision == EXPONENTIAL_DECISION:
+                return (raw.ravel() >= 0).astype(np.intp)
+            return np.argmax(np.nan_to_num(np.exp(raw-logsumexp(raw,axis=1)[:,np.newaxis])),axis=1)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def predict(self,X)->np.ndarray:
+        try:
+            return self.classes.take(self.get_class_index(X=X),axis=0)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def save(self,flat_model_dir:str):
+        try:
+            os.makedirs(flat_model_dir,exist_ok=True)
+            for array_name in FLAT_MODEL_ARRAYS:
+                np.save(os.path.join(flat_model_dir,array_name+'.npy'),getattr(self,array_name),allow_pickle=False)
+            flat_model_info = {"kind":self.kind,"max_depth":self.max_depth,"n_features":self.n_features,
+                               "classes":self.classes.tolist(),"params":self.params}
+            with open(os.path.join(flat_model_dir,FLAT_MODEL_INFO_FILE_NAME),'w') as json_file:
+                json.dump(flat_model_info,json_file,indent=2)
+            logging.info(f"{self.kind} with {self.n_trees} trees and {len(self.feature)} nodes saved at {flat_model_dir}")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @classmethod
+    def load(cls,flat_model_dir:str):
+        try:
+            #returns None when the model was not flattened, the caller falls back to the pickled model
+            flat_model_info_file_path = os.path.join(flat_model_dir,FLAT_MODEL_INFO_FILE_NAME)
+            if not os.path.exists(flat_model_info_file_path):
+                return None
+            with open(flat_model_info_file_path,'r') as json_file:
+                flat_model_info = json.load(json_file)
+            arrays = {array_name:np.load(os.path.join(flat_model_dir,array_name+'.npy'),mmap_mode='r',allow_pickle=False)
+                      for array_name in FLAT_MODEL_ARRAYS}
+            return cls(**arrays,**flat_model_info)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+def get_tree_estimators(model)->list:
+    if isinstance(model,DecisionTreeClassifier):
+        return [model]
+    return list(np.asarray(model.estimators_).ravel())
+
+def flatten_tree_model(model)->FlatTreeEnsemble:
+    try:
+        #returns None for models that are not single output tree classifiers handled here
+        if getattr(model,'n_outputs_',1) != 1:
+            return None
+        params = dict()
+        if isinstance(model,DecisionTreeClassifier):
+            kind,trees = DECISION_TREE_KIND,[get_tree_arrays(model.tree_,model.tree_.value[:,0,:model.n_classes_])]
+        elif isinstance(model,RandomForestClassifier):
+            kind,trees = RANDOM_FOREST_KIND,[get_tree_arrays(estimator.tree_,get_tree_proba(estimator))
+                                             for estimator in model.estimators_]
+        elif isinstance(model,AdaBoostClassifier):
+            if getattr(model,'algorithm',None) != "SAMME.R" or \
+                    not all(isinstance(estimator,DecisionTreeClassifier) for estimator in model.estimators_):
+                return None
+            kind,trees = ADABOOST_KIND,[get_tree_arrays(estimator.tree_,
+                                                        get_samme_proba(get_tree_proba(estimator),model.n_classes_))
+                                        for estimator in model.estimators_]
+            params["weight_sum"] = float(model.estimator_weights_.sum())
+        elif isinstance(model,GradientBoostingClassifier):
+            #the fitted loss is loss_ before scikit-learn 1.1 and _loss after it
+            loss = getattr(model,'_loss',None) or getattr(model,'loss_',None)
+            decision = GRADIENT_BOOSTING_DECISIONS.get(type(loss).__name__)
+            if decision is None or not (model.init_ == "zero" or isinstance(model.init_,DummyClassifier)):
+                return None
+            #the zero or prior init estimator gives every row the same raw prediction
+            init_raw = model._raw_predict_init(np.zeros((1,model.n_features_in_),dtype=np.float32))[0]
+            #sklearn adds learning_rate*leaf value per tree, the same product is stored per leaf
+            kind,trees = GRADIENT_BOOSTING_KIND,[get_tree_arrays(estimator.tree_,model.learning_rate*estimator.tree_.value[:,0,:1])
+                                                 for estimator in model.estimators_.ravel()]
+            params.update(init_raw=init_raw.tolist(),decision=decision)
+        else:
+            return None
+
+        node_counts = [len(feature) for feature,_,_,_ in trees]
+        offsets = np.concatenate([[0],np.cumsum(node_counts)[:-1]]).astype(np.int64)
+        return FlatTreeEnsemble(kind=kind,
+                                feature=np.concatenate([feature for feature,_,_,_ in trees]),
+                                threshold=np.concatenate([threshold for _,threshold,_,_ in trees]),
+                                children=np.concatenate([children+offset for (_,_,children,_),offset in zip(trees,offsets)]),
+                                leaf_value=np.ascontiguousarray(np.concatenate([leaf_value for _,_,_,leaf_value in trees]),
+                                                                dtype=np.float64).reshape(sum(node_counts),-1),
+                                roots=offsets,
+                                max_depth=int(max(estimator.tree_.max_depth for estimator in get_tree_estimators(model))),
+                                n_features=int(model.n_features_in_),
+                                classes=model.classes_.tolist(),
+                                params=params)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_self_check_data(flat_model:FlatTreeEnsemble,n_rows:int=SELF_CHECK_ROWS,random_state:int=42)->np.ndarray:
+    try:
+        #rows built from every split threshold of a feature and the float32 values right next to it,
+        #so both sides of each split are taken where rounding could send a row the other way
+        random_state = check_random_state(random_state)
+        is_split = flat_model.children[:,0] != np.arange(len(flat_model.children))
+        X = np.zeros((n_rows,flat_model.n_features),dtype=np.float32)
+        for feature in range(flat_model.n_features):
+            thresholds = np.unique(flat_model.threshold[is_split&(flat_model.feature == feature)]).astype(np.float32)
+            if not len(thresholds):
+                continue
+            candidates = np.concatenate([thresholds,np.nextafter(thresholds,np.float32(-np.inf)),
+                                         np.nextafter(thresholds,np.float32(np.inf))])
+            X[:,feature] = random_state.choice(candidates,size=n_rows)
+        return X
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def export_flat_model(model,export_dir:str,X=None)->bool:
+    try:
+        #the flat model is only exported when it predicts like the model on X and on rows around every
+        #split threshold, otherwise serving keeps using the pickled model
+        flat_model_dir = os.path.join(export_dir,FLAT_MODEL_DIR_NAME)
+        if os.path.exists(flat_model_dir):
+            shutil.rmtree(flat_model_dir)
+        if model is None:
+            return False
+        flat_model = flatten_tree_model(model=model)
+        if flat_model is None:
+            logging.info(f"{type(model).__name__} can not be flattened, pickled model is served")
+            return False
+        check_data = get_self_check_data(flat_model=flat_model)
+        if X is not None:
+            check_data = np.concatenate([check_data,np.asarray(X,dtype=np.float32)])
+        mismatched_rows = int(np.count_nonzero(flat_model.predict(check_data)!=model.predict(check_data)))
+        if mismatched_rows:
+            logging.info(f"flat {flat_model.kind} differs from the model on {mismatched_rows} rows, not exported")
+            return False
+        flat_model.save(flat_model_dir=flat_model_dir)
+        return True
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
@@ -0,0 +1,105 @@
+import sys,time
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from concurrent.futures import ThreadPoolExecutor,wait,FIRST_COMPLETED
+from collections import namedtuple
+from typing import List
+
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_COMPLETED = "completed"
+TASK_FAILED = "failed"
+TASK_SKIPPED = "skipped"
+
+#function is called with the outputs of the tasks named in inputs as keyword arguments and its return value
+#is the output of the task, a side task (critical=False) that fails is logged without stopping the pipeline
+PipelineTask = namedtuple("PipelineTask",["name","function","inputs","critical"])
+
+TaskState = namedtuple("TaskState",["name","status","start_time","end_time","error"])
+
+
+class DagScheduler:
+
+    def __init__(self,tasks:List[PipelineTask],max_workers:int=4,task_listener=None) -> None:
+        try:
+            self.tasks = {task.name:task for task in tasks}
+            if len(self.tasks) != len(tasks):
+                raise ValueError(f"task names are not unique : {[task.name for task in tasks]}")
+            for task in tasks:
+                unknown_inputs = [name for name in task.inputs if name not in self.tasks]
+                if unknown_inputs:
+                    raise ValueError(f"task {task.name} reads unknown tasks : {unknown_inputs}")
+            self.max_workers = max_workers
+            self.task_listener = task_listener
+            self.task_states = {task.name:TaskState(name=task.name,status=TASK_PENDING,start_time=None,
+                                                    end_time=None,error=None) for task in tasks}
+            self.outputs = dict()
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def set_task_state(self,name:str,**changes):
+        try:
+            self.task_states[name] = self.task_states[name]._replace(**changes)
+            if self.task_listener is not None:
+                self.task_listener(self.task_states[name])
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_task(self,task:PipelineTask):
+        return task.function(**{name:self.outputs[name] for name in task.inputs})
+
+    def get_ready_tasks(self)->List[PipelineTask]:
+        try:
+            ready_tasks = []
+            for name,task in self.tasks.items():
+                if self.task_states[name].status != TASK_PENDING:
+                    continue
+                input_status = [self.task_states[input_name].status for input_name in task.inputs]
+                if any(status in (TASK_FAILED,TASK_SKIPPED) for status in input_status):
+                    logging.info(f"task {name} skipped, an input task did not complete")
+                    self.set_task_state(name,status=TASK_SKIPPED)
+                elif all(status == TASK_COMPLETED for status in input_status):
+                    ready_tasks.append(task)
+            return ready_tasks
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run(self)->dict:
+        try:
+            #a task is started as soon as its inputs are done, so side tasks run next to the critical path
+            running = dict()
+            critical_error = None
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    if critical_error is None:
+                        for task in self.get_ready_tasks():
+                            self.set_task_state(task.name,status=TASK_RUNNING,start_time=time.time())
+                            running[executor.submit(self.run_task,task)] = task
+                    if not running:
+                        break
+
+                    done,_ = wait(list(running),return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task = running.pop(future)
+                        try:
+                            self.outputs[task.name] = future.result()
+                            self.set_task_state(task.name,status=TASK_COMPLETED,end_time=time.time())
+                            logging.info(f"task {task.name} completed")
+                        except Exception as e:
+                            self.set_task_state(task.name,status=TASK_FAILED,end_time=time.time(),error=str(e))
+                            if task.critical:
+                                logging.info(f"task {task.name} failed, no further task is started : {e}")
+                                critical_error = critical_error or e
+                            else:
+                                logging.info(f"side task {task.name} failed : {e}")
+
+            pending_tasks = [name for name,task_state in self.task_states.items() if task_state.status == TASK_PENDING]
+            for name in pending_tasks:
+                self.set_task_state(name,status=TASK_SKIPPED)
+            if critical_error is not None:
+                raise critical_error
+            if pending_tasks:
+                raise ValueError(f"tasks never became ready, their inputs form a cycle : {pending_tasks}")
+            return self.outputs
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
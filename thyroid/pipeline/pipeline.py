@@ -1,7 +1,10 @@
-import os,sys,json
+import os,re,sys,json
 from thyroid.logger import logging
 from thyroid.exception import ThyroidException
 from thyroid.config.configuration import Configuration
+from thyroid.constant import *
+from thyroid.pipeline.stage_cache import StageCache,get_fingerprint,get_file_fingerprint,get_source_files
+from thyroid.pipeline.dag import DagScheduler,PipelineTask
 from thyroid.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformArtifact,ModelTrainerArtifact,ModelEvulationArtifact,ModelPusherArtifact,FinalArtifact
 from thyroid.components.data_ingestion import DataIngestion
 from thyroid.components.data_validation import DataValidation
@@ -9,12 +12,62 @@ from thyroid.components.data_transform import DataTransform
 from thyroid.components.model_trainer import ModelTrainer
 from thyroid.components.model_evulation import ModelEvulation
 from thyroid.components.model_pusher import ModelPusher
+from typing import List
+
+DATA_INGESTION_STAGE = "data_ingestion"
+DATA_VALIDATION_STAGE = "data_validation"
+DATA_TRANSFORM_STAGE = "data_transform"
+MODEL_TRAINER_STAGE = "model_trainer"
+MODEL_EVULATION_STAGE = "model_evulation"
+MODEL_PUSHER_STAGE = "model_pusher"
+DATA_DRIFT_REPORT_TASK = "data_drift_report"
+CLUSTER_GRAPH_TASK = "cluster_graph"
+FINAL_ARTIFACT_TASK = "final_artifact"
+
+
+def get_trained_model_paths(model_trainer:ModelTrainerArtifact)->list:
+    #the trainer artifact names the model file, the models themselves are saved in a cluster<n>
+    #directory next to it for every cluster
+    model_dir = os.path.dirname(model_trainer.trained_model_path)
+    model_name = os.path.basename(model_trainer.trained_model_path)
+    if not os.path.isdir(model_dir):
+        return []
+    return [os.path.join(model_dir,dir_name,model_name) for dir_name in os.listdir(model_dir)
+            if re.fullmatch(r'cluster\d+',dir_name)]
 
 class Pipeline:
 
     def __init__(self,config:Configuration=Configuration()) -> None:
         try:
             self.config = config
+            self.stage_fingerprints = dict()
+            self.stage_cache = None
+            if self.config.training_pipeline_config.reuse_stage_artifacts:
+                self.stage_cache = StageCache(artifact_dir=self.config.training_pipeline_config.artifact_dir)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_stage_fingerprint(self,stage_name:str,component_class,upstream_fingerprints:list=None,
+                              config_keys:list=None,file_paths:list=None)->str:
+        try:
+            #a stage is fingerprinted by the stages it reads from, its config.yaml sections, the files it
+            #reads (source data, schema.yaml, model.yaml) and the code of its component and of every
+            #thyroid module the component imports, the constants included
+            source_files = get_source_files(module_name=component_class.__module__)
+            return get_fingerprint(stage_name,
+                                   upstream_fingerprints or [],
+                                   [self.config.config_info[config_key] for config_key in config_keys or []],
+                                   [get_file_fingerprint(file_path) for file_path in (file_paths or [])+source_files])
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_stage(self,stage_name:str,fingerprint:str,artifact_class,stage_function,get_output_paths=None):
+        try:
+            if self.stage_cache is None:
+                return stage_function()
+            return self.stage_cache.run_stage(stage_name=stage_name,fingerprint=fingerprint,
+                                              artifact_class=artifact_class,stage_function=stage_function,
+                                              get_output_paths=get_output_paths)
         except Exception as e:
             raise ThyroidException(sys,e) from e
 
@@ -25,21 +78,22 @@ class Pipeline:
         except Exception as e:
             raise ThyroidException(sys,e) from e
     
-    def start_data_validation(self,data_ingestion_artifact:DataIngestionArtifact)->DataValidationArtifact:
+    def start_data_validation(self,data_ingestion_artifact:DataIngestionArtifact,
+                              save_report:bool=True)->DataValidationArtifact:
         try:
             data_validation = DataValidation(data_validation_config=self.config.get_data_validation_config(),
                                              data_ingestion_artifact=data_ingestion_artifact)
-            return data_validation.intiate_data_validation()
+            return data_validation.intiate_data_validation(save_report=save_report)
         except Exception as e:
             raise ThyroidException(sys,e) from e
     
     def start_data_transform(self,data_ingestion_artifact:DataIngestionArtifact,
-                            data_validation_artifact:DataValidationArtifact)->DataTransformArtifact:
+                            data_validation_artifact:DataValidationArtifact,save_graphs:bool=True)->DataTransformArtifact:
         try:
             data_transform = DataTransform(data_transform_config=self.config.get_data_transform_config(),
                                            data_ingestion_artifact=data_ingestion_artifact,
                                            data_validation_artifact=data_validation_artifact)
-            return data_transform.intiate_data_transform()
+            return data_transform.intiate_data_transform(save_graphs=save_graphs)
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
@@ -69,22 +123,167 @@ class Pipeline:
         except Exception as e:
             raise ThyroidException(sys,e) from e
         
-    def run_pipeline(self):
-        try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transform_artifact = self.start_data_transform(data_ingestion_artifact=data_ingestion_artifact,
-                                                                data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transform_artifact=data_transform_artifact)
-            model_evulation_artifact = self.start_model_evulation(data_transform_artifact=data_transform_artifact,
-                                                                  model_trainer_artifact=model_trainer_artifact)
-            model_pusher_artifact = self.start_model_pusher(model_evulation_artifact=model_evulation_artifact)
-            final_artifact = FinalArtifact(cluster_model_path=data_transform_artifact.cluster_model_dir,
-                                           export_dir_path=model_pusher_artifact.export_dir_path,
-                                           ingested_train_data=data_ingestion_artifact.train_file_path,
-                                           preprocessing_dir=data_transform_artifact.preprocessing_dir)
+    def is_stage_reused(self,stage_name:str)->bool:
+        return self.stage_cache is not None and stage_name in self.stage_cache.reused_stages
+
+    def run_data_ingestion_stage(self)->DataIngestionArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=DATA_INGESTION_STAGE,component_class=DataIngestion,
+                                                     config_keys=[TRAINING_PIPELINE_CONFIG_KEY,DATA_INGESTION_CONFIG_KEY],
+                                                     file_paths=[self.config.get_data_ingestion_config().dataset_download_url])
+            self.stage_fingerprints[DATA_INGESTION_STAGE] = fingerprint
+            return self.run_stage(stage_name=DATA_INGESTION_STAGE,fingerprint=fingerprint,
+                                  artifact_class=DataIngestionArtifact,stage_function=self.start_data_ingestion)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_data_validation_stage(self,data_ingestion:DataIngestionArtifact)->DataValidationArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=DATA_VALIDATION_STAGE,component_class=DataValidation,
+                                                     upstream_fingerprints=[self.stage_fingerprints[DATA_INGESTION_STAGE]],
+                                                     config_keys=[DATA_VALIDTION_CONFIG_KEY],
+                                                     file_paths=[self.config.get_data_validation_config().schema_file_dir])
+            self.stage_fingerprints[DATA_VALIDATION_STAGE] = fingerprint
+            return self.run_stage(stage_name=DATA_VALIDATION_STAGE,fingerprint=fingerprint,
+                                  artifact_class=DataValidationArtifact,
+                                  stage_function=lambda:self.start_data_validation(data_ingestion_artifact=data_ingestion,
+                                                                                   save_report=False))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_data_drift_report(self,data_ingestion:DataIngestionArtifact,data_validation:DataValidationArtifact):
+        try:
+            if self.is_stage_reused(DATA_VALIDATION_STAGE) and os.path.exists(data_validation.reprot_file_path):
+                return data_validation.reprot_file_path
+            #the report goes next to the validation artifact, which is an earlier run's when validation was reused
+            data_validation_config = self.config.get_data_validation_config()
+            report_dir = os.path.dirname(data_validation.reprot_file_path)
+            data_validation_config = data_validation_config._replace(
+                report_file_dir=data_validation.reprot_file_path,
+                report_page_file_dir=os.path.join(report_dir,os.path.basename(data_validation_config.report_page_file_dir)))
+            data_validation_component = DataValidation(data_validation_config=data_validation_config,
+                                                       data_ingestion_artifact=data_ingestion)
+            data_validation_component.get_and_save_datadrift_report()
+            return data_validation.reprot_file_path
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_data_transform_stage(self,data_ingestion:DataIngestionArtifact,
+                                 data_validation:DataValidationArtifact)->DataTransformArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=DATA_TRANSFORM_STAGE,component_class=DataTransform,
+                                                     upstream_fingerprints=[self.stage_fingerprints[DATA_VALIDATION_STAGE]],
+                                                     config_keys=[TRAINING_PIPELINE_CONFIG_KEY,DATA_TRANSFORM_CONFIG_KEY])
+            self.stage_fingerprints[DATA_TRANSFORM_STAGE] = fingerprint
+            return self.run_stage(stage_name=DATA_TRANSFORM_STAGE,fingerprint=fingerprint,
+                                  artifact_class=DataTransformArtifact,
+                                  stage_function=lambda:self.start_data_transform(data_ingestion_artifact=data_ingestion,
+                                                                                  data_validation_artifact=data_validation,
+                                                                                  save_graphs=False))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_cluster_graphs(self,data_ingestion:DataIngestionArtifact,data_validation:DataValidationArtifact,
+                           data_transform:DataTransformArtifact):
+        try:
+            if self.is_stage_reused(DATA_TRANSFORM_STAGE):
+                return None
+            data_transform_config = self.config.get_data_transform_config()._replace(
+                transform_train_dir=data_transform.transform_train_dir)
+            data_transform_component = DataTransform(data_transform_config=data_transform_config,
+                                                     data_ingestion_artifact=data_ingestion,
+                                                     data_validation_artifact=data_validation)
+            data_transform_component.get_and_save_cluster_graphs()
+            return data_transform_config.graph_save_dir
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_model_trainer_stage(self,data_transform:DataTransformArtifact)->ModelTrainerArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=MODEL_TRAINER_STAGE,component_class=ModelTrainer,
+                                                     upstream_fingerprints=[self.stage_fingerprints[DATA_TRANSFORM_STAGE]],
+                                                     config_keys=[MODEL_TRAINER_CONFIG_KEY],
+                                                     file_paths=[self.config.get_model_trainer_config().model_config_file_path])
+            self.stage_fingerprints[MODEL_TRAINER_STAGE] = fingerprint
+            return self.run_stage(stage_name=MODEL_TRAINER_STAGE,fingerprint=fingerprint,
+                                  artifact_class=ModelTrainerArtifact,
+                                  stage_function=lambda:self.start_model_trainer(data_transform_artifact=data_transform),
+                                  get_output_paths=get_trained_model_paths)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_model_evulation_stage(self,data_transform:DataTransformArtifact,
+                                  model_trainer:ModelTrainerArtifact)->ModelEvulationArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=MODEL_EVULATION_STAGE,component_class=ModelEvulation,
+                                                     upstream_fingerprints=[self.stage_fingerprints[MODEL_TRAINER_STAGE]],
+                                                     config_keys=[MODEL_EVULATION_CONFIG_KEY])
+            self.stage_fingerprints[MODEL_EVULATION_STAGE] = fingerprint
+            return self.run_stage(stage_name=MODEL_EVULATION_STAGE,fingerprint=fingerprint,
+                                  artifact_class=ModelEvulationArtifact,
+                                  stage_function=lambda:self.start_model_evulation(data_transform_artifact=data_transform,
+                                                                                   model_trainer_artifact=model_trainer))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_model_pusher_stage(self,model_evulation:ModelEvulationArtifact)->ModelPusherArtifact:
+        try:
+            fingerprint = self.get_stage_fingerprint(stage_name=MODEL_PUSHER_STAGE,component_class=ModelPusher,
+                                                     upstream_fingerprints=[self.stage_fingerprints[MODEL_EVULATION_STAGE]],
+                                                     config_keys=[MODEL_PUSHER_CONFIG_KEY])
+            self.stage_fingerprints[MODEL_PUSHER_STAGE] = fingerprint
+            return self.run_stage(stage_name=MODEL_PUSHER_STAGE,fingerprint=fingerprint,
+                                  artifact_class=ModelPusherArtifact,
+                                  stage_function=lambda:self.start_model_pusher(model_evulation_artifact=model_evulation))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def save_final_artifact(self,data_ingestion:DataIngestionArtifact,data_transform:DataTransformArtifact,
+                            model_pusher:ModelPusherArtifact)->FinalArtifact:
+        try:
+            final_artifact = FinalArtifact(cluster_model_path=data_transform.cluster_model_dir,
+                                           export_dir_path=model_pusher.export_dir_path,
+                                           ingested_train_data=data_ingestion.train_file_path,
+                                           preprocessing_dir=data_transform.preprocessing_dir)
             
-            with open('data.json', 'w') as json_obj:
+            temp_file_path = FINAL_ARTIFACT_FILE_PATH+'.tmp'
+            with open(temp_file_path, 'w') as json_obj:
                 json.dump(final_artifact._asdict(), json_obj)
+            os.replace(temp_file_path,FINAL_ARTIFACT_FILE_PATH)
+            return final_artifact
         except Exception as e:
-            raise ThyroidException(sys,e) from e
\ No newline at end of file
+            raise ThyroidException(sys,e) from e
+
+    def get_pipeline_tasks(self)->List[PipelineTask]:
+        #task inputs are the names of the tasks whose output they take, reports and graphs are side
+        #tasks nothing on the way to the final artifact waits for
+        return [PipelineTask(name=DATA_INGESTION_STAGE,function=self.run_data_ingestion_stage,
+                             inputs=[],critical=True),
+                PipelineTask(name=DATA_VALIDATION_STAGE,function=self.run_data_validation_stage,
+                             inputs=[DATA_INGESTION_STAGE],critical=True),
+                PipelineTask(name=DATA_DRIFT_REPORT_TASK,function=self.run_data_drift_report,
+                             inputs=[DATA_INGESTION_STAGE,DATA_VALIDATION_STAGE],critical=False),
+                PipelineTask(name=DATA_TRANSFORM_STAGE,function=self.run_data_transform_stage,
+                             inputs=[DATA_INGESTION_STAGE,DATA_VALIDATION_STAGE],critical=True),
+                PipelineTask(name=CLUSTER_GRAPH_TASK,function=self.run_cluster_graphs,
+                             inputs=[DATA_INGESTION_STAGE,DATA_VALIDATION_STAGE,DATA_TRANSFORM_STAGE],critical=False),
+                PipelineTask(name=MODEL_TRAINER_STAGE,function=self.run_model_trainer_stage,
+                             inputs=[DATA_TRANSFORM_STAGE],critical=True),
+                PipelineTask(name=MODEL_EVULATION_STAGE,function=self.run_model_evulation_stage,
+                             inputs=[DATA_TRANSFORM_STAGE,MODEL_TRAINER_STAGE],critical=True),
+                PipelineTask(name=MODEL_PUSHER_STAGE,function=self.run_model_pusher_stage,
+                             inputs=[MODEL_EVULATION_STAGE],critical=True),
+                PipelineTask(name=FINAL_ARTIFACT_TASK,function=self.save_final_artifact,
+                             inputs=[DATA_INGESTION_STAGE,DATA_TRANSFORM_STAGE,MODEL_PUSHER_STAGE],critical=True)]
+
+    def run_pipeline(self,task_listener=None)->FinalArtifact:
+        try:
+            self.stage_fingerprints = dict()
+            dag_scheduler = DagScheduler(tasks=self.get_pipeline_tasks(),task_listener=task_listener)
+            outputs = dag_scheduler.run()
+            for task_state in dag_scheduler.task_states.values():
+                logging.info(f"task {task_state.name} {task_state.status}"
+                             +(f" in {task_state.end_time-task_state.start_time:.1f}s" if task_state.end_time else ""))
+            return outputs[FINAL_ARTIFACT_TASK]
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
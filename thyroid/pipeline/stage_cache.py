@@ -0,0 +1,160 @@
+import os,sys,ast,json,hashlib,uuid,importlib.util
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.entity.model_bundle import get_bundle_file_paths
+
+STAGE_CACHE_FILE_NAME = "stage_cache.json"
+STAGE_FINGERPRINT_KEY = "fingerprint"
+STAGE_ARTIFACT_KEY = "artifact"
+STAGE_OUTPUTS_KEY = "outputs"
+SOURCE_PACKAGE_NAME = "thyroid"
+
+
+def get_file_fingerprint(file_path:str)->str:
+    try:
+        #a source that is not a local file (an url) can not be fingerprinted, a random value
+        #makes the stage and everything after it run again
+        if not os.path.isfile(file_path):
+            return uuid.uuid4().hex
+        digest = hashlib.sha256()
+        with open(file_path,'rb') as source_file:
+            for block in iter(lambda:source_file.read(1024*1024),b''):
+                digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_fingerprint(*parts)->str:
+    try:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(json.dumps(part,sort_keys=True,default=str).encode())
+        return digest.hexdigest()
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_imported_module_names(source_file_path:str)->list:
+    try:
+        with open(source_file_path,'rb') as source_file:
+            tree = ast.parse(source_file.read(),filename=source_file_path)
+        module_names = []
+        for node in ast.walk(tree):
+            if isinstance(node,ast.Import):
+                module_names.extend(alias.name for alias in node.names)
+            elif isinstance(node,ast.ImportFrom) and node.module and node.level == 0:
+                #from package import name, the name may be a submodule
+                module_names.append(node.module)
+                module_names.extend(f"{node.module}.{alias.name}" for alias in node.names if alias.name != '*')
+        return module_names
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_source_files(module_name:str)->list:
+    try:
+        #source files of a module and of every thyroid module it imports, directly or through other
+        #thyroid modules, so a change in a helper a component uses changes the component's fingerprint
+        source_files = dict()
+        pending = [module_name]
+        while pending:
+            name = pending.pop()
+            if name in source_files or not (name == SOURCE_PACKAGE_NAME or name.startswith(SOURCE_PACKAGE_NAME+'.')):
+                continue
+            try:
+                spec = importlib.util.find_spec(name)
+            except ModuleNotFoundError:
+                spec = None
+            if spec is None or spec.origin is None or not spec.origin.endswith('.py'):
+                continue
+            source_files[name] = spec.origin
+            pending.append(name.rpartition('.')[0])
+            pending.extend(get_imported_module_names(source_file_path=spec.origin))
+        return sorted(set(source_files.values()))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_artifact_paths(value)->list:
+    try:
+        if isinstance(value,(list,tuple)):
+            return [path for item in value for path in get_artifact_paths(item)]
+        if isinstance(value,str) and os.path.isabs(value):
+            return [value]
+        return []
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_output_files(paths:list)->list:
+    try:
+        #every file a stage left behind: a directory is listed file by file and a saved object comes
+        #with its manifest. paths that do not exist when the stage ends are not outputs
+        output_files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for dir_path,_,file_names in os.walk(path):
+                    output_files.extend(os.path.join(dir_path,file_name) for file_name in file_names)
+            else:
+                output_files.extend(get_bundle_file_paths(path))
+        return sorted(set(output_files))
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+#last artifact, input fingerprint and output files of every pipeline stage, a stage whose fingerprint
+#is unchanged and whose output files all still exist is not run again
+class StageCache:
+
+    def __init__(self,artifact_dir:str) -> None:
+        try:
+            self.cache_file_path = os.path.join(artifact_dir,STAGE_CACHE_FILE_NAME)
+            self.stages = dict()
+            self.reused_stages = set()
+            if os.path.exists(self.cache_file_path):
+                with open(self.cache_file_path,'r') as json_file:
+                    self.stages = json.load(json_file)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_artifact(self,stage_name:str,fingerprint:str,artifact_class):
+        try:
+            stage = self.stages.get(stage_name)
+            if stage is None or stage[STAGE_FINGERPRINT_KEY] != fingerprint:
+                return None
+            artifact = artifact_class(**stage[STAGE_ARTIFACT_KEY])
+            if STAGE_OUTPUTS_KEY not in stage:
+                logging.info(f"{stage_name} artifact can not be reused, its output files were not recorded")
+                return None
+            missing_paths = [path for path in stage[STAGE_OUTPUTS_KEY] if not os.path.exists(path)]
+            if missing_paths:
+                logging.info(f"{stage_name} artifact can not be reused, missing : {missing_paths}")
+                return None
+            return artifact
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def save_artifact(self,stage_name:str,fingerprint:str,artifact,output_paths:list=None):
+        try:
+            #output paths default to the paths the artifact names
+            if output_paths is None:
+                output_paths = get_artifact_paths(list(artifact))
+            self.stages[stage_name] = {STAGE_FINGERPRINT_KEY:fingerprint,STAGE_ARTIFACT_KEY:artifact._asdict(),
+                                       STAGE_OUTPUTS_KEY:get_output_files(paths=output_paths)}
+            os.makedirs(os.path.dirname(self.cache_file_path),exist_ok=True)
+            temp_file_path = self.cache_file_path+'.tmp'
+            with open(temp_file_path,'w') as json_file:
+                json.dump(self.stages,json_file,default=float)
+            os.replace(temp_file_path,self.cache_file_path)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_stage(self,stage_name:str,fingerprint:str,artifact_class,stage_function,get_output_paths=None):
+        try:
+            artifact = self.get_artifact(stage_name=stage_name,fingerprint=fingerprint,artifact_class=artifact_class)
+            if artifact is not None:
+                logging.info(f"{stage_name} inputs unchanged, reusing artifact : {artifact}")
+                self.reused_stages.add(stage_name)
+                return artifact
+            artifact = stage_function()
+            output_paths = None if get_output_paths is None else get_output_paths(artifact)
+            self.save_artifact(stage_name=stage_name,fingerprint=fingerprint,artifact=artifact,output_paths=output_paths)
+            return artifact
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,192 @@
+import os,sys,json,time,uuid,socket,threading
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.config.configuration import Configuration
+from thyroid.constant import TRAINING_JOB_HISTORY_SIZE,TRAINING_JOB_FILE_PATH
+from thyroid.entity.artifact_entity import FinalArtifact
+from thyroid.pipeline.pipeline import Pipeline
+from thyroid.pipeline.dag import TaskState,TASK_PENDING
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple,OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    #windows has no fcntl, jobs are then only de-duplicated inside one process
+    fcntl = None
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+ACTIVE_JOB_STATUSES = [JOB_QUEUED,JOB_RUNNING]
+
+TrainingJob = namedtuple("TrainingJob",["job_id","status","submitted_time","start_time","end_time",
+                                        "stages","final_artifact","error","worker"])
+
+
+def get_job_info(training_job:TrainingJob)->dict:
+    try:
+        job_info = training_job._asdict()
+        job_info.pop("worker")
+        job_info["stages"] = [dict(task_state._asdict(),
+                                   duration=(task_state.end_time-task_state.start_time
+                                             if task_state.end_time and task_state.start_time else None))
+                              for task_state in training_job.stages.values()]
+        if training_job.final_artifact is not None:
+            job_info["final_artifact"] = training_job.final_artifact._asdict()
+        return job_info
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+def get_worker_id()->str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def is_worker_alive(worker:str)->bool:
+    try:
+        #a worker on another host can not be checked and is taken as alive
+        host,_,pid = worker.rpartition(':')
+        if host != socket.gethostname():
+            return True
+        os.kill(int(pid),0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def to_job_record(training_job:TrainingJob)->dict:
+    job_record = training_job._asdict()
+    job_record["stages"] = [task_state._asdict() for task_state in training_job.stages.values()]
+    if training_job.final_artifact is not None:
+        job_record["final_artifact"] = training_job.final_artifact._asdict()
+    return job_record
+
+def from_job_record(job_record:dict)->TrainingJob:
+    job_record = dict(job_record)
+    job_record["stages"] = OrderedDict((task_state["name"],TaskState(**task_state)) for task_state in job_record["stages"])
+    if job_record["final_artifact"] is not None:
+        job_record["final_artifact"] = FinalArtifact(**job_record["final_artifact"])
+    return TrainingJob(**job_record)
+
+
+#training runs one at a time on a background thread. jobs are kept in a json file next to data.json and
+#changed under an fcntl lock, so every gunicorn worker sees the same jobs and a train request made while
+#a job is queued or running in any worker gets that job back instead of stacking another run on the same
+#artifact dir. a job whose worker process died is marked failed the next time the jobs are read
+class TrainingJobManager:
+
+    def __init__(self,job_file_path:str=TRAINING_JOB_FILE_PATH,history_size:int=TRAINING_JOB_HISTORY_SIZE) -> None:
+        try:
+            self.job_file_path = job_file_path
+            self.lock_file_path = job_file_path+'.lock'
+            self.history_size = history_size
+            self._lock = threading.Lock()
+            self._executor = ThreadPoolExecutor(max_workers=1,thread_name_prefix="training_job")
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    @contextmanager
+    def locked_jobs(self):
+        #yields the jobs, they are written back when the caller changed them
+        with self._lock:
+            lock_file = None
+            try:
+                if fcntl is not None:
+                    os.makedirs(os.path.dirname(self.lock_file_path) or '.',exist_ok=True)
+                    lock_file = open(self.lock_file_path,'a')
+                    fcntl.flock(lock_file,fcntl.LOCK_EX)
+                job_records = self.read_job_records()
+                jobs = OrderedDict((job_record["job_id"],from_job_record(job_record)) for job_record in job_records)
+                for job_id,training_job in jobs.items():
+                    if training_job.status in ACTIVE_JOB_STATUSES and not is_worker_alive(training_job.worker):
+                        jobs[job_id] = training_job._replace(status=JOB_FAILED,end_time=time.time(),
+                                                             error=f"worker {training_job.worker} exited")
+                yield jobs
+                if self.get_job_records(jobs) != job_records:
+                    self.write_job_records(self.get_job_records(jobs))
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file,fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def get_job_records(self,jobs:OrderedDict)->list:
+        #records as they read back from the file, so an unchanged job list is not written again
+        return json.loads(json.dumps([to_job_record(training_job) for training_job in jobs.values()],default=float))
+
+    def read_job_records(self)->list:
+        try:
+            if not os.path.exists(self.job_file_path):
+                return []
+            with open(self.job_file_path,'r') as json_file:
+                return json.load(json_file)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def write_job_records(self,job_records:list):
+        try:
+            temp_file_path = self.job_file_path+'.tmp'
+            with open(temp_file_path,'w') as json_file:
+                json.dump(job_records,json_file)
+            os.replace(temp_file_path,self.job_file_path)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def update_job(self,job_id:str,**changes):
+        with self.locked_jobs() as jobs:
+            jobs[job_id] = jobs[job_id]._replace(**changes)
+
+    def update_stage(self,job_id:str,task_state:TaskState):
+        with self.locked_jobs() as jobs:
+            training_job = jobs[job_id]
+            stages = OrderedDict(training_job.stages)
+            stages[task_state.name] = task_state
+            jobs[job_id] = training_job._replace(stages=stages)
+
+    def get_job(self,job_id:str)->TrainingJob:
+        with self.locked_jobs() as jobs:
+            return jobs.get(job_id)
+
+    def submit(self):
+        try:
+            #returns (job, created)
+            with self.locked_jobs() as jobs:
+                active_jobs = [training_job for training_job in jobs.values() if training_job.status in ACTIVE_JOB_STATUSES]
+                if active_jobs:
+                    logging.info(f"training job {active_jobs[0].job_id} is already active, request de-duplicated")
+                    return active_jobs[0],False
+
+                job_id = uuid.uuid4().hex
+                training_job = TrainingJob(job_id=job_id,status=JOB_QUEUED,submitted_time=time.time(),
+                                           start_time=None,end_time=None,stages=OrderedDict(),
+                                           final_artifact=None,error=None,worker=get_worker_id())
+                jobs[job_id] = training_job
+                while len(jobs) > self.history_size:
+                    jobs.popitem(last=False)
+
+            self._executor.submit(self.run_job,job_id)
+            logging.info(f"training job {job_id} queued")
+            return training_job,True
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def run_job(self,job_id:str):
+        try:
+            self.update_job(job_id,status=JOB_RUNNING,start_time=time.time())
+            #every job gets its own time stamp so its artifacts do not land in an earlier run's directories
+            config = Configuration(current_time_stamp=datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
+            pipeline = Pipeline(config=config)
+            for task in pipeline.get_pipeline_tasks():
+                self.update_stage(job_id,TaskState(name=task.name,status=TASK_PENDING,start_time=None,
+                                                   end_time=None,error=None))
+            final_artifact = pipeline.run_pipeline(task_listener=lambda task_state:self.update_stage(job_id,task_state))
+            self.update_job(job_id,status=JOB_COMPLETED,end_time=time.time(),final_artifact=final_artifact)
+            logging.info(f"training job {job_id} completed")
+        except Exception as e:
+            logging.exception(f"training job {job_id} failed")
+            self.update_job(job_id,status=JOB_FAILED,end_time=time.time(),error=str(e))
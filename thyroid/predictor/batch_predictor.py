@@ -0,0 +1,68 @@
+import sys
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.constant import TARGET_CLASS_MAPPING
+from thyroid.predictor.model_registry import LoadedModelBundle
+import pandas as pd
+import numpy as np
+
+CLASS_LABELS = {value:key for key,value in TARGET_CLASS_MAPPING.items()}
+
+
+def predict_by_cluster(input_array:np.ndarray,cluster_numbers:np.ndarray,model_objects:list)->np.ndarray:
+    try:
+        cluster_numbers = np.asarray(cluster_numbers)
+        output = np.empty(len(input_array),dtype=np.int64)
+        if len(input_array) == 0:
+            return output
+
+        #rows grouped by cluster with one stable sort, each group is scored with one predict call
+        #and written back at its original positions
+        order = np.argsort(cluster_numbers,kind='stable')
+        boundaries = np.flatnonzero(np.diff(cluster_numbers[order]))+1
+
+        for row_index in np.split(order,boundaries):
+            cluster_number = cluster_numbers[row_index[0]]
+            model_object = model_objects[cluster_number]
+            output[row_index] = np.asarray(model_object.predict(input_array[row_index])).astype(np.int64)
+
+        return output
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_class_labels(encoded_output:np.ndarray)->list:
+    try:
+        return [CLASS_LABELS.get(value,value) for value in np.asarray(encoded_output).tolist()]
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+class BatchPredictor:
+
+    def __init__(self,bundle:LoadedModelBundle) -> None:
+        try:
+            self.bundle = bundle
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        try:
+            return self.bundle.preprocessing_object.transform(df=df)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def predict(self,df:pd.DataFrame)->np.ndarray:
+        try:
+            logging.info(f"batch predict function started for {len(df)} rows")
+            df = self.transform(df=df)
+            cluster_numbers = np.asarray(self.bundle.cluster_object.predict(df))
+            return predict_by_cluster(input_array=np.array(df),cluster_numbers=cluster_numbers,
+                                      model_objects=self.bundle.model_objects)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def predict_labels(self,df:pd.DataFrame)->list:
+        try:
+            return get_class_labels(encoded_output=self.predict(df=df))
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
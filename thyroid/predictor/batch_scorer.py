@@ -0,0 +1,307 @@
+import os,sys,shutil,argparse
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.entity.artifact_entity import BatchScoringArtifact,FinalArtifact
+from thyroid.constant import FINAL_ARTIFACT_FILE_PATH,PREDICTION_CHUNK_SIZE,PREDICTION_COLUMN_NAME
+from thyroid.predictor.model_registry import ModelRegistry,LoadedModelBundle
+from thyroid.predictor.batch_predictor import BatchPredictor
+from thyroid.util.util import get_process_context
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+import pandas as pd
+
+PARQUET_FILE_EXTENSIONS = [".parquet",".pq"]
+
+#set once per worker process by init_scoring_worker
+_worker_batch_predictor = None
+
+
+def get_parquet_schema(columns:list):
+    #input values are read as text and predictions are class labels, every column is a string
+    import pyarrow as pa
+    return pa.schema([(str(column),pa.string()) for column in columns])
+
+
+class PredictionWriter:
+
+    def __init__(self,output_file_path:str) -> None:
+        try:
+            self.output_file_path = output_file_path
+            self.is_parquet = os.path.splitext(output_file_path)[1].lower() in PARQUET_FILE_EXTENSIONS
+            self.parquet_writer = None
+            self.chunk_count = 0
+
+            output_dir = os.path.dirname(output_file_path)
+            if output_dir:
+                os.makedirs(output_dir,exist_ok=True)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def write(self,df:pd.DataFrame):
+        try:
+            if self.is_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                #the schema is given, not inferred from the first chunk: a column missing in every row of a
+                #chunk would be typed null there and the next chunk, with text in it, would not match
+                if self.parquet_writer is None:
+                    self.parquet_writer = pq.ParquetWriter(self.output_file_path,get_parquet_schema(columns=df.columns))
+                table = pa.Table.from_pandas(df,schema=self.parquet_writer.schema,preserve_index=False)
+                self.parquet_writer.write_table(table)
+            else:
+                df.to_csv(self.output_file_path,mode='w' if self.chunk_count == 0 else 'a',
+                          header=self.chunk_count == 0,index=False)
+            self.chunk_count += 1
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def write_file(self,file_path:str,chunk_count:int):
+        try:
+            #appends a file written by another PredictionWriter without parsing it, parquet row groups are
+            #copied one at a time and the header line of a csv is only kept from the first file
+            if self.is_parquet:
+                import pyarrow.parquet as pq
+                parquet_file = pq.ParquetFile(file_path)
+                for row_group in range(parquet_file.num_row_groups):
+                    table = parquet_file.read_row_group(row_group)
+                    if self.parquet_writer is None:
+                        self.parquet_writer = pq.ParquetWriter(self.output_file_path,get_parquet_schema(columns=table.column_names))
+                    self.parquet_writer.write_table(table.cast(self.parquet_writer.schema))
+            else:
+                with open(file_path,'rb') as part_file,\
+                        open(self.output_file_path,'wb' if self.chunk_count == 0 else 'ab') as output_file:
+                    if self.chunk_count > 0:
+                        part_file.readline()
+                    shutil.copyfileobj(part_file,output_file)
+            self.chunk_count += chunk_count
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def close(self):
+        try:
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+                self.parquet_writer = None
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+def get_scoring_file_path(scoring_dir:str,file_path:str)->str:
+    try:
+        #a path sent by a client is relative to the scoring directory, it can not climb out of it
+        #through .., an absolute path or a symlink
+        if not isinstance(file_path,str) or not file_path.strip():
+            raise ValueError(f"file path must be a non empty string : {file_path}")
+        parts = file_path.replace("\\","/").split("/")
+        if os.path.isabs(file_path) or os.path.splitdrive(file_path)[0] or ".." in parts:
+            raise ValueError(f"file path must be relative to the scoring directory : {file_path}")
+        scoring_dir = os.path.realpath(scoring_dir)
+        scoring_file_path = os.path.realpath(os.path.join(scoring_dir,file_path))
+        if os.path.commonpath([scoring_dir,scoring_file_path]) != scoring_dir or scoring_file_path == scoring_dir:
+            raise ValueError(f"file path is outside the scoring directory : {file_path}")
+        return scoring_file_path
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_csv_chunks(input_file_path:str,chunk_size:int)->Iterator[pd.DataFrame]:
+    try:
+        #values are kept as text so every chunk has the same column types in the output file
+        for df in pd.read_csv(input_file_path,chunksize=chunk_size,dtype=str):
+            yield df
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+class FileRangeReader:
+
+    #a binary file read from start up to end only, what pandas reads one row range shard through
+    def __init__(self,file,start:int,end:int) -> None:
+        self.file = file
+        self.end = end
+        self.file.seek(start)
+
+    def read(self,size:int=-1)->bytes:
+        remaining = max(0,self.end-self.file.tell())
+        return self.file.read(remaining if size is None or size < 0 else min(size,remaining))
+
+
+def get_shard_ranges(input_file_path:str,n_shards:int)->list:
+    try:
+        #byte ranges of about the same size after the header line, every range starts at the beginning of a
+        #line so a shard is a run of whole rows. a quoted csv value with a line break in it would be cut in two,
+        #such files have to be scored with one worker
+        file_size = os.path.getsize(input_file_path)
+        with open(input_file_path,'rb') as input_file:
+            input_file.readline()
+            boundaries = [input_file.tell()]
+            for shard in range(1,n_shards):
+                target = boundaries[0]+(file_size-boundaries[0])*shard//n_shards
+                if target > boundaries[-1]:
+                    input_file.seek(target-1)
+                    input_file.readline()
+                boundaries.append(max(input_file.tell(),boundaries[-1]))
+        boundaries.append(file_size)
+        return [(start,end) for start,end in zip(boundaries[:-1],boundaries[1:])]
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_csv_range_chunks(input_file_path:str,columns:list,start:int,end:int,chunk_size:int)->Iterator[pd.DataFrame]:
+    try:
+        if end <= start:
+            return
+        with open(input_file_path,'rb') as input_file:
+            reader = FileRangeReader(file=input_file,start=start,end=end)
+            for df in pd.read_csv(reader,header=None,names=columns,chunksize=chunk_size,dtype=str):
+                yield df
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_part_file_path(output_file_path:str,shard:int)->str:
+    output_dir,output_file_name = os.path.split(output_file_path)
+    name,extension = os.path.splitext(output_file_name)
+    return os.path.join(output_dir,f".{name}.part{shard:04d}{extension}")
+
+def get_scored_chunk(df:pd.DataFrame,predictions:list,predictions_only:bool=False)->pd.DataFrame:
+    try:
+        if predictions_only:
+            return pd.DataFrame({PREDICTION_COLUMN_NAME:predictions})
+        df = df.reset_index(drop=True)
+        df[PREDICTION_COLUMN_NAME] = predictions
+        return df
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+def init_scoring_worker(final_artifact:FinalArtifact):
+    global _worker_batch_predictor
+    try:
+        #every worker loads the models once, from the same final artifact as the parent process
+        bundle = ModelRegistry().load_bundle(version=None,final_artifact=final_artifact)
+        _worker_batch_predictor = BatchPredictor(bundle=bundle)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def score_shard(input_file_path:str,columns:list,start:int,end:int,part_file_path:str,chunk_size:int,
+                predictions_only:bool=False)->tuple:
+    try:
+        #reads, scores and writes one row range shard in the worker, only the row and chunk counts go back
+        prediction_writer = PredictionWriter(output_file_path=part_file_path)
+        row_count = 0
+        try:
+            for df in iter_csv_range_chunks(input_file_path=input_file_path,columns=columns,start=start,end=end,
+                                            chunk_size=chunk_size):
+                predictions = _worker_batch_predictor.predict_labels(df=df)
+                prediction_writer.write(df=get_scored_chunk(df=df,predictions=predictions,predictions_only=predictions_only))
+                row_count += len(df)
+        finally:
+            prediction_writer.close()
+        return row_count,prediction_writer.chunk_count
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+
+class BatchScorer:
+
+    def __init__(self,bundle:LoadedModelBundle,chunk_size:int=PREDICTION_CHUNK_SIZE,
+                 predictions_only:bool=False,workers:int=1) -> None:
+        try:
+            self.bundle = bundle
+            self.batch_predictor = BatchPredictor(bundle=bundle)
+            self.chunk_size = chunk_size
+            self.predictions_only = predictions_only
+            self.workers = workers if workers > 0 else os.cpu_count()
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def iter_scored_chunks(self,input_file_path:str)->Iterator[pd.DataFrame]:
+        try:
+            for df in iter_csv_chunks(input_file_path=input_file_path,chunk_size=self.chunk_size):
+                predictions = self.batch_predictor.predict_labels(df=df)
+                yield get_scored_chunk(df=df,predictions=predictions,predictions_only=self.predictions_only)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def score_shards(self,input_file_path:str,prediction_writer:PredictionWriter)->int:
+        try:
+            #every worker reads one row range of the input itself and writes its own part file, the parent only
+            #finds the range boundaries and appends the part files to the output in file order
+            columns = list(pd.read_csv(input_file_path,nrows=0,dtype=str).columns)
+            shard_ranges = get_shard_ranges(input_file_path=input_file_path,n_shards=self.workers)
+            part_file_paths = [get_part_file_path(output_file_path=prediction_writer.output_file_path,shard=shard)
+                               for shard in range(len(shard_ranges))]
+            row_count = 0
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers,initializer=init_scoring_worker,
+                                         initargs=(self.bundle.final_artifact,),mp_context=get_process_context()) as executor:
+                    futures = [executor.submit(score_shard,input_file_path,columns,start,end,part_file_path,
+                                               self.chunk_size,self.predictions_only)
+                               for (start,end),part_file_path in zip(shard_ranges,part_file_paths)]
+                    for shard,(future,part_file_path) in enumerate(zip(futures,part_file_paths)):
+                        shard_row_count,shard_chunk_count = future.result()
+                        if shard_chunk_count:
+                            prediction_writer.write_file(file_path=part_file_path,chunk_count=shard_chunk_count)
+                        row_count += shard_row_count
+                        logging.info(f"shard {shard+1} of {len(shard_ranges)} scored, {row_count} rows scored")
+                #a file without rows still gets its header, as pandas gives one empty chunk for it
+                if prediction_writer.chunk_count == 0:
+                    df = pd.DataFrame(columns=columns,dtype=str)
+                    prediction_writer.write(df=get_scored_chunk(df=df,predictions=[],predictions_only=self.predictions_only))
+            finally:
+                for part_file_path in part_file_paths:
+                    if os.path.exists(part_file_path):
+                        os.remove(part_file_path)
+            return row_count
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def score_file(self,input_file_path:str,output_file_path:str)->BatchScoringArtifact:
+        try:
+            logging.info(f"scoring {input_file_path} into {output_file_path} with chunk size {self.chunk_size} "
+                         f"and {self.workers} workers")
+            prediction_writer = PredictionWriter(output_file_path=output_file_path)
+            row_count = 0
+            try:
+                if self.workers > 1:
+                    row_count = self.score_shards(input_file_path=input_file_path,prediction_writer=prediction_writer)
+                else:
+                    for df in self.iter_scored_chunks(input_file_path=input_file_path):
+                        prediction_writer.write(df=df)
+                        row_count += len(df)
+                        logging.info(f"{row_count} rows scored")
+            finally:
+                prediction_writer.close()
+
+            batch_scoring_artifact = BatchScoringArtifact(input_file_path=input_file_path,
+                                                          output_file_path=output_file_path,
+                                                          row_count=row_count,
+                                                          chunk_count=prediction_writer.chunk_count)
+            logging.info(f"batch scoring artifact : {batch_scoring_artifact}")
+            return batch_scoring_artifact
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+
+def get_argument_parser()->argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="score a csv file with the trained thyroid models")
+    parser.add_argument("--input",required=True,help="csv file to score")
+    parser.add_argument("--output",required=True,help="output csv or parquet file")
+    parser.add_argument("--chunk-size",type=int,default=PREDICTION_CHUNK_SIZE,help="rows read and scored at a time")
+    parser.add_argument("--workers",type=int,default=1,help="scoring processes, 0 uses every core")
+    parser.add_argument("--predictions-only",action="store_true",help="write only the prediction column")
+    parser.add_argument("--final-artifact",default=FINAL_ARTIFACT_FILE_PATH,help="final artifact json written by the pipeline")
+    return parser
+
+def main(args=None):
+    args = get_argument_parser().parse_args(args)
+    bundle = ModelRegistry(final_artifact_file_path=args.final_artifact).get_bundle()
+    if bundle is None:
+        raise SystemExit("No model is trained, please start training")
+
+    batch_scorer = BatchScorer(bundle=bundle,chunk_size=args.chunk_size,predictions_only=args.predictions_only,
+                               workers=args.workers)
+    batch_scoring_artifact = batch_scorer.score_file(input_file_path=args.input,output_file_path=args.output)
+    print(f"{batch_scoring_artifact.row_count} rows scored into {batch_scoring_artifact.output_file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os,sys,json,threading
+from thyroid.logger import logging
+from thyroid.exception import ThyroidException
+from thyroid.entity.artifact_entity import FinalArtifact
+from thyroid.constant import FINAL_ARTIFACT_FILE_PATH,FLAT_MODEL_DIR_NAME
+from thyroid.entity.centroid_router import CentroidRouter
+from thyroid.entity.tree_ensemble import FlatTreeEnsemble
+from thyroid.util.util import load_object
+from collections import namedtuple
+
+LoadedModelBundle = namedtuple("LoadedModelBundle",["version","final_artifact","preprocessing_object",
+                                                    "cluster_object","model_objects"])
+
+
+#keeps the final artifact objects resident, the final artifact file is only stat-ed per request
+#and a new bundle is swapped in as one reference once the pipeline writes a new file
+class ModelRegistry:
+
+    def __init__(self,final_artifact_file_path:str=FINAL_ARTIFACT_FILE_PATH) -> None:
+        try:
+            self.final_artifact_file_path = final_artifact_file_path
+            self._lock = threading.Lock()
+            self._bundle = None
+            self._failed_version = None
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_artifact_version(self):
+        try:
+            if not os.path.exists(self.final_artifact_file_path):
+                return None
+            file_stat = os.stat(self.final_artifact_file_path)
+            return (file_stat.st_mtime_ns,file_stat.st_size)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def read_final_artifact(self)->FinalArtifact:
+        try:
+            with open(self.final_artifact_file_path,'r') as json_file:
+                dict_data = json.loads(json_file.read())
+            return FinalArtifact(**dict_data)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def load_bundle(self,version,final_artifact:FinalArtifact=None)->LoadedModelBundle:
+        try:
+            logging.info(f"load bundle function started")
+            if final_artifact is None:
+                final_artifact = self.read_final_artifact()
+            logging.info(f"final artifact : {final_artifact}")
+
+            #arrays of the bundles are memory mapped read only, workers loading the same files share their pages.
+            #serving never opts in to legacy pickles, a file without a signed manifest fails the load
+            preprocessing_object = load_object(file_path=final_artifact.preprocessing_dir,mmap_mode='r')
+            #the exported centroids route rows without unpickling sklearn, runs without them use the pickle
+            cluster_object = CentroidRouter.load(cluster_model_dir=os.path.dirname(final_artifact.cluster_model_path))
+            if cluster_object is None:
+                cluster_object = load_object(file_path=final_artifact.cluster_model_path,mmap_mode='r')
+            logging.info(f"cluster object : {type(cluster_object).__name__}")
+            model_objects = [self.load_model(model_path=model_path) for model_path in final_artifact.export_dir_path]
+
+            logging.info(f"model bundle loaded with {len(model_objects)} cluster models")
+            return LoadedModelBundle(version=version,
+                                     final_artifact=final_artifact,
+                                     preprocessing_object=preprocessing_object,
+                                     cluster_object=cluster_object,
+                                     model_objects=model_objects)
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def load_model(self,model_path:str):
+        try:
+            #the flat export next to a pushed model predicts without the sklearn estimator
+            model_object = FlatTreeEnsemble.load(flat_model_dir=os.path.join(os.path.dirname(model_path),FLAT_MODEL_DIR_NAME))
+            if model_object is None:
+                model_object = load_object(file_path=model_path,mmap_mode='r')
+            logging.info(f"model object for {model_path} : {type(model_object).__name__}")
+            return model_object
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
+
+    def get_bundle(self)->LoadedModelBundle:
+        try:
+            version = self.get_artifact_version()
+            bundle = self._bundle
+            if version is None:
+                return bundle
+            if bundle is not None and (bundle.version == version or self._failed_version == version):
+                return bundle
+
+            with self._lock:
+                bundle = self._bundle
+                if bundle is not None and (bundle.version == version or self._failed_version == version):
+                    return bundle
+                try:
+                    new_bundle = self.load_bundle(version=version)
+                except Exception as e:
+                    logging.info(f"loading new model bundle failed, serving previous bundle : {e}")
+                    self._failed_version = version
+                    return bundle
+
+                self._bundle = new_bundle
+                self._failed_version = None
+                logging.info(f"model bundle swapped to version : {version}")
+                return new_bundle
+        except Exception as e:
+            raise ThyroidException(sys,e) from e
@@ -0,0 +1,59 @@
+import io,sys,json
+from thyroid.exception import ThyroidException
+from typing import Iterator
+import pandas as pd
+
+JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPES = ["application/x-ndjson","application/ndjson","application/jsonl","application/x-jsonlines"]
+CSV_CONTENT_TYPES = ["text/csv","application/csv"]
+JSON_RECORDS_KEY = "records"
+
+
+def iter_json_batches(stream,batch_size:int)->Iterator[pd.DataFrame]:
+    try:
+        #a json document has to be parsed as a whole, only the scoring is batched
+        data = json.load(stream)
+        records = data[JSON_RECORDS_KEY] if isinstance(data,dict) else data
+        if isinstance(records,dict):
+            records = [records]
+        for start in range(0,len(records),batch_size):
+            yield pd.DataFrame.from_records(records[start:start+batch_size])
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_ndjson_batches(stream,batch_size:int)->Iterator[pd.DataFrame]:
+    try:
+        records = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            records.append(json.loads(line))
+            if len(records) == batch_size:
+                yield pd.DataFrame.from_records(records)
+                records = []
+        if records:
+            yield pd.DataFrame.from_records(records)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_csv_batches(stream,batch_size:int)->Iterator[pd.DataFrame]:
+    try:
+        #values are kept as text like the file scoring path, so a value does not change type between batches
+        for df in pd.read_csv(stream,chunksize=batch_size,dtype=str):
+            yield df
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def iter_request_batches(content_type:str,stream,batch_size:int)->Iterator[pd.DataFrame]:
+    try:
+        content_type = (content_type or "").lower()
+        if content_type in NDJSON_CONTENT_TYPES:
+            return iter_ndjson_batches(stream=io.TextIOWrapper(stream,encoding='utf-8'),batch_size=batch_size)
+        if content_type in CSV_CONTENT_TYPES:
+            return iter_csv_batches(stream=stream,batch_size=batch_size)
+        if content_type == JSON_CONTENT_TYPE:
+            return iter_json_batches(stream=stream,batch_size=batch_size)
+        raise ValueError(f"unsupported content type : {content_type}")
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
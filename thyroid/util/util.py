@@ -1,9 +1,9 @@
-import os,sys,dill,yaml
+import os,re,sys,dill,yaml,multiprocessing
 from thyroid.exception import ThyroidException
 from thyroid.logger import logging
+from thyroid.constant import PROCESS_START_METHODS,ARTIFACT_FORMAT_EXTENSIONS,CSV_ARTIFACT_FORMAT,PARQUET_ARTIFACT_FORMAT,FEATHER_ARTIFACT_FORMAT
+from thyroid.entity.model_bundle import save_bundle,load_bundle,get_manifest_file_path
 import pandas as pd
-from thyroid.constant import DROP_COLUMN_LIST
-import numpy as np
 
 
 def read_yaml(file_path:str):
@@ -23,30 +23,109 @@ def write_yaml_file(file_path:str, data:dict=None):
     except Exception as e:
         raise ThyroidException(sys,e) from e  
     
-def load_object(file_path:str):
+def save_object(file_path:str,obj):
     try:
+        save_bundle(obj=obj,file_path=file_path)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def load_object(file_path:str,mmap_mode:str=None,allow_legacy_pickle:bool=False):
+    try:
+        #objects saved before model bundles are dill pickles without a manifest, they are only
+        #unpickled when the caller opts in since nothing checks where they came from
+        if os.path.exists(get_manifest_file_path(file_path)):
+            return load_bundle(file_path=file_path,mmap_mode=mmap_mode)
+        if not allow_legacy_pickle:
+            raise ValueError(f"{file_path} has no bundle manifest, legacy pickles are not loaded "
+                             f"unless allow_legacy_pickle is set")
+        logging.info(f"{file_path} has no manifest, loading it as a legacy dill pickle")
         with open(file_path,"rb") as object_file:
             return dill.load(object_file)
     except Exception as e:
         raise ThyroidException(sys,e) from e
-    
-def preprocessing(df:pd.DataFrame):
+
+def get_process_context():
+    try:
+        #worker processes are started from a clean interpreter instead of a fork of the caller, the pipeline
+        #forks them while dag threads and joblib pools are running and a forked lock held by one of those
+        #threads would never be released in the child
+        start_methods = multiprocessing.get_all_start_methods()
+        start_method = next(method for method in PROCESS_START_METHODS if method in start_methods)
+        return multiprocessing.get_context(start_method)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_cluster_file_names(dir_path:str)->list:
+    try:
+        #cluster files are named <prefix><cluster number>.<extension>, ordered by cluster number not by name
+        file_names = [file_name for file_name in os.listdir(dir_path) if re.search(r'\d+\.\w+$',file_name)]
+        file_names.sort(key=lambda file_name:int(re.search(r'(\d+)\.\w+$',file_name).group(1)))
+        return file_names
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def get_artifact_file_name(file_name:str,artifact_format:str)->str:
     try:
-        #preprocessing on test data
+        return os.path.splitext(file_name)[0]+ARTIFACT_FORMAT_EXTENSIONS[artifact_format]
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
 
-        #drop columns
-        df.drop(DROP_COLUMN_LIST,inplace=True,axis=1)
-        df = df.replace('?', np.NaN)
+def get_artifact_format(file_path:str)->str:
+    try:
+        extension = os.path.splitext(file_path)[1]
+        for artifact_format,format_extension in ARTIFACT_FORMAT_EXTENSIONS.items():
+            if extension == format_extension:
+                return artifact_format
+        raise ValueError(f"no artifact format for the file : {file_path}")
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
+
+def save_dataframe(df:pd.DataFrame,file_path:str):
+    try:
+        #the format is taken from the file extension
+        artifact_format = get_artifact_format(file_path=file_path)
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        if artifact_format == PARQUET_ARTIFACT_FORMAT:
+            df.to_parquet(file_path,index=False)
+        elif artifact_format == FEATHER_ARTIFACT_FORMAT:
+            #uncompressed so a read can map the columns straight from the file
+            df.reset_index(drop=True).to_feather(file_path,compression='uncompressed')
+        else:
+            df.to_csv(file_path,index=False)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
 
-        #columns mapping
-        df['sex'] = df['sex'].map({'F':0,'M':1})
-        for columns in df.columns:
-            if len(df[columns].unique())==2:
-                df[columns] = df[columns].map({'f':0,'t':1})
+def read_dataframe(file_path:str)->pd.DataFrame:
+    try:
+        artifact_format = get_artifact_format(file_path=file_path)
+        if artifact_format == PARQUET_ARTIFACT_FORMAT:
+            return pd.read_parquet(file_path,memory_map=True)
+        if artifact_format == FEATHER_ARTIFACT_FORMAT:
+            import pyarrow.feather as feather
+            return feather.read_table(file_path,memory_map=True).to_pandas()
+        return pd.read_csv(file_path)
+    except Exception as e:
+        raise ThyroidException(sys,e) from e
 
-        #onehot encoding
-        df = pd.get_dummies(df,columns=['referral_source'],drop_first=True)
+def iter_dataframe_chunks(file_path:str,chunk_size:int,columns:list=None):
+    try:
+        #csv is read as text, parquet and feather keep their column types and are read memory-mapped
+        artifact_format = get_artifact_format(file_path=file_path)
+        if artifact_format == CSV_ARTIFACT_FORMAT:
+            yield from pd.read_csv(file_path,chunksize=chunk_size,dtype=str,usecols=columns)
+            return
 
-        return df
+        import pyarrow as pa
+        if artifact_format == PARQUET_ARTIFACT_FORMAT:
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(file_path,memory_map=True).iter_batches(batch_size=chunk_size,columns=columns)
+        else:
+            reader = pa.ipc.open_file(pa.memory_map(file_path))
+            batches = (reader.get_batch(index).slice(offset,chunk_size)
+                       for index in range(reader.num_record_batches)
+                       for offset in range(0,reader.get_batch(index).num_rows,chunk_size))
+        for batch in batches:
+            df = batch.to_pandas()
+            yield df if columns is None or artifact_format == PARQUET_ARTIFACT_FORMAT else df[columns]
     except Exception as e:
-        raise ThyroidException(sys,e) from e
\ No newline at end of file
+        raise ThyroidException(sys,e) from e